@@ -2,25 +2,27 @@ import json
 import time
 from datetime import timedelta
 
-import cv2
 from tqdm import tqdm
 
 from script_generator.constants import UPDATE_PROGRESS_INTERVAL
-from script_generator.constants import CLASS_COLORS
-from script_generator.debug.video_player.overlay_widgets import OverlayWidgets
-from script_generator.gui.messages.messages import ProgressMessage, UpdateGUIState
+from script_generator.debug.live_preview import LivePreviewRenderer, create_tracking_overlay
+from script_generator.gui.messages.messages import ProgressMessage
 from script_generator.object_detection.util.data import load_yolo_data
 from script_generator.object_detection.util.object_detection import make_data_boxes, parse_yolo_data_looking_for_penis
 from script_generator.state.app_state import AppState
 from script_generator.utils.file import get_output_file_path
 from script_generator.debug.logger import log, log_tr
-from script_generator.video.ffmpeg.video_reader import VideoReaderFFmpeg
 from script_generator.video.data_classes.video_info import get_cropped_dimensions
 from utils.lib_ObjectTracker import ObjectTracker
 
 
-def analyze_tracking_results_v1(state: AppState):
-    exists, yolo_data, raw_yolo_path, _ = load_yolo_data(state)
+def analyze_tracking_results_v1(state: AppState, yolo_data=None, save=True):
+    """
+    Turns the tracked YOLO records (loaded from the raw yolo file unless given) into the raw funscript data, save=False
+    skips writing the raw funscript json.
+    """
+    if yolo_data is None:
+        exists, yolo_data, raw_yolo_path, _ = load_yolo_data(state)
     results = make_data_boxes(yolo_data)
     width, height = get_cropped_dimensions(state.video_info)
     list_of_frames = results.get_all_frame_ids()  # Get all frame IDs with detections
@@ -41,10 +43,8 @@ def analyze_tracking_results_v1(state: AppState):
 
     video_info = state.video_info
     fps = video_info.fps
-    reader = None
 
     state.frame_area = width * height
-    debug_window_open = False
     cuts = []
 
     """ discarding the scene detection for now
@@ -85,6 +85,8 @@ def analyze_tracking_results_v1(state: AppState):
     start_time = time.time()
 
     last_ui_update_time = time.time()
+    preview = LivePreviewRenderer(state, "Tracking analysis preview")
+    preview.start()
     live_preview_mode_prev = state.live_preview_mode
 
     for frame_pos in tqdm(
@@ -170,68 +172,9 @@ def analyze_tracking_results_v1(state: AppState):
                     }
                 )
 
-        # Display object detection tracking results in a live preview window
-        window_name = "Tracking analysis preview"
-
-        # Close window and release reader. Also, we don't want to call cv2.getWindowProperty every iteration
-        if debug_window_open and not state.live_preview_mode:
-            if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) >= 1:
-                cv2.destroyWindow(window_name)
-                debug_window_open = False
-            if reader:
-                reader.release()
-                reader = None
-
+        # Display object detection tracking results in a live preview window, the frame is decoded on the preview thread
         if state.live_preview_mode:
-            if not reader:
-                reader = VideoReaderFFmpeg(state, frame_pos)
-                reader.set_frame(frame_pos)
-
-            ret, frame = reader.read()
-            frame = frame.copy()
-
-            for box in tracker.tracked_boxes:
-                frame = OverlayWidgets.draw_bounding_box(
-                    frame,
-                    box[0],
-                    str(box[2]) + ": " + box[1],
-                    CLASS_COLORS[str(box[1])],
-                    state.offset_x
-                )
-
-            if tracker.locked_penis_box is not None and tracker.locked_penis_box.is_active():
-                frame = OverlayWidgets.draw_bounding_box(
-                    frame,
-                    tracker.locked_penis_box.box,
-                    "Locked_Penis",
-                    CLASS_COLORS['penis'],
-                    state.offset_x
-                )
-            else:
-                log_tr.debug("No active locked penis box to draw.")
-
-            if tracker.glans_detected:
-                frame = OverlayWidgets.draw_bounding_box(
-                    frame,
-                    tracker.boxes['glans'],
-                    "Glans",
-                    CLASS_COLORS['glans'],
-                    state.offset_x
-                )
-            if state.funscript_distances:
-                frame = OverlayWidgets.draw_gauge(frame, state.funscript_distances[-1])
-
-            # Reinitialize the window if needed
-            if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1 and state.live_preview_mode:
-                cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-                cv2.resizeWindow(window_name, int(width * 2), int(height * 2))
-                debug_window_open = True
-            cv2.imshow(window_name, frame)
-
-            if not handle_user_input(window_name) or not state.live_preview_mode:
-                if state.update_ui and state.live_preview_mode:
-                    state.update_ui(UpdateGUIState(attr="live_preview_mode", value=False))
-                state.live_preview_mode = False
+            preview.post(frame_pos, create_tracking_overlay(state, tracker))
 
         # Update progress periodically
         if state.update_ui:
@@ -252,6 +195,8 @@ def analyze_tracking_results_v1(state: AppState):
                     eta=time.strftime("%H:%M:%S", time.gmtime(eta)) if eta != float('inf') else "Calculating..."
                 ))
 
+    preview.stop()
+
     # stop processing when the task is force closed
     if state.analyze_task and state.analyze_task.is_stopped:
         return
@@ -269,19 +214,9 @@ def analyze_tracking_results_v1(state: AppState):
     state.funscript_data = list(zip(state.funscript_frames, state.funscript_distances))
 
     # Save the raw funscript data to JSON
-    raw_funscript_path, _ = get_output_file_path(state.video_path, ".json", "rawfunscript")
-    with open(raw_funscript_path, 'w') as f:
-        json.dump(state.funscript_data, f)
+    if save:
+        raw_funscript_path, _ = get_output_file_path(state.video_path, ".json", "rawfunscript")
+        with open(raw_funscript_path, 'w') as f:
+            json.dump(state.funscript_data, f)
 
     return state.funscript_data
-
-def handle_user_input(window_name):
-    key = cv2.waitKey(1) & 0xFF
-
-    # Check if the window has been closed
-    if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1:
-        return False
-
-    if key == ord("q"):
-        return False
-    return True
\ No newline at end of file
@@ -0,0 +1,105 @@
+import os
+import time
+
+from script_generator.benchmark.onnx_benchmark import compare_records, read_frames
+from script_generator.constants import YOLO_BATCH_SIZE, YOLO_CONF
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.cascade_detector import CascadeDetector
+from script_generator.object_detection.util.data import get_static_batch_size, load_yolo_model
+from script_generator.object_detection.util.inference import InputBatchBuffer, detect_batch
+from script_generator.object_detection.util.model_loader import warmup_model
+from script_generator.object_detection.util.tracking import to_detection_records
+from script_generator.utils.thread_budget import apply_thread_budget, create_thread_budget
+
+
+def read_clips(state, video_paths, frames, start=0.5):
+    """
+    frames consecutive frames per video from start (share of the video) on, the cascade compares neighbouring frames.
+    """
+    clips = []
+    for video_path in video_paths:
+        state.video_path = video_path
+        state.reload_video_info()
+        clip = read_frames(state, video_path, frames, int(state.video_info.total_frames * start))
+        log.info(f"Read {len(clip)} frames of {os.path.basename(video_path)}")
+        if clip:
+            clips.append(clip)
+    return clips
+
+
+def run_detector(model, model_path, clips, batch_size):
+    """
+    Runs the clips through the model like the YOLO worker does (frames written into an input buffer, padded to the
+    batch size of static models). The time covers the preprocessing and inference.
+    """
+    static_batch_size = get_static_batch_size(model, model_path)
+    buffer = InputBatchBuffer(max(batch_size, static_batch_size or 0))
+
+    detections = []
+    duration = 0.0
+    for clip in clips:
+        if isinstance(model, CascadeDetector):
+            model.reset()
+        start = time.perf_counter()
+        for offset in range(0, len(clip), batch_size):
+            batch = clip[offset:offset + batch_size]
+            buffer.clear()
+            for frame in batch:
+                buffer.write(frame)
+            size = max(len(batch), static_batch_size or 0)
+            if isinstance(model, CascadeDetector):
+                detections.extend(model.detect_batch(buffer.batch(size), conf=YOLO_CONF, count=len(batch)))
+            else:
+                detections.extend(detect_batch(model, buffer.batch(size), conf=YOLO_CONF)[:len(batch)])
+        duration += time.perf_counter() - start
+
+    records = [record for frame_pos, d in enumerate(detections) for record in to_detection_records(frame_pos, d)]
+    return {
+        "fps": round(len(detections) / duration, 2),
+        "ms_per_frame": round(duration * 1000 / len(detections), 3),
+        "detections": len(records),
+    }, records
+
+
+def benchmark_cascade(state, model_path, fast_model_path, video_paths, frames=600, batch_size=YOLO_BATCH_SIZE, start=0.5):
+    """
+    Runs the same frames through the accurate model, the fast model and the cascade of both. Reports the throughput
+    of all three, how many frames the cascade escalated and how many of the accurate model's detections the fast
+    model and the cascade reproduce.
+    """
+    clips = read_clips(state, video_paths, frames, start)
+    if not clips:
+        raise ValueError("No frames could be read from the videos")
+
+    accurate_model, fast_model = load_yolo_model(model_path), load_yolo_model(fast_model_path)
+    if accurate_model is None or fast_model is None:
+        raise ValueError("Could not load the models")
+
+    budget = create_thread_budget(state.concurrent_jobs)
+    for model, path in ((accurate_model, model_path), (fast_model, fast_model_path)):
+        apply_thread_budget(budget, model)
+        warmup_model(model, path)
+    cascade = CascadeDetector(fast_model, accurate_model, fast_model_path, model_path)
+
+    report = {
+        "model": os.path.basename(model_path),
+        "fast_model": os.path.basename(fast_model_path),
+        "videos": [os.path.basename(video_path) for video_path in video_paths],
+        "frames": sum(len(clip) for clip in clips),
+        "batch_size": batch_size,
+        "inference_threads": budget.inference_threads,
+        "runs": {},
+    }
+
+    records = {}
+    for name, model, path in (("accurate", accurate_model, model_path), ("fast", fast_model, fast_model_path), ("cascade", cascade, model_path)):
+        log.info(f"Benchmarking the {name} model on {report['frames']} frames")
+        report["runs"][name], records[name] = run_detector(model, path, clips, batch_size)
+
+    report["speedup"] = round(report["runs"]["cascade"]["fps"] / report["runs"]["accurate"]["fps"], 2)
+    report["cascade"] = cascade.stats.to_dict()
+    report["agreement"] = {
+        "fast": compare_records(records["accurate"], records["fast"], names=("accurate", "fast")),
+        "cascade": compare_records(records["accurate"], records["cascade"], names=("accurate", "cascade")),
+    }
+    return report
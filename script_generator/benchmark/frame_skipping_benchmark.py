@@ -0,0 +1,118 @@
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from script_generator.analysis.workers.analyze_tracking_results_v1 import analyze_tracking_results_v1
+from script_generator.constants import DUPLICATE_FRAME_MAX_SKIP, DUPLICATE_FRAME_THRESHOLD, YOLO_TRACKER
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.data import load_detection_data
+from script_generator.object_detection.util.frame_similarity import DuplicateFrameFilter
+from script_generator.object_detection.util.tracking import track_detection_records
+from script_generator.video.ffmpeg.video_reader import VideoReaderFFmpeg
+
+MAX_DISTANCE_DIFFERENCE = 5  # Funscript distances (0 - 100) within this of the reference count as unchanged
+
+
+def get_skipped_frames(state, frame_start, frame_end, threshold, max_skip):
+    """
+    Decodes the frames like the pipeline sees them and flags the ones the YOLO worker would skip.
+    """
+    frame_filter = DuplicateFrameFilter(threshold, max_skip)
+    reader = VideoReaderFFmpeg(state)
+    skipped = set()
+    try:
+        if frame_start:
+            reader.set_frame(frame_start)
+        for frame_pos in range(frame_start, frame_end):
+            ret, frame = reader.read()
+            if not ret:
+                break
+            if frame_filter.is_duplicate(frame):
+                skipped.add(frame_pos)
+    finally:
+        reader.release()
+    return skipped, frame_filter.stats
+
+
+def reuse_detections(detection_records, skipped, frame_start, frame_end):
+    """
+    Replaces the detections of the skipped frames with the ones of the last inferred frame.
+    """
+    by_frame = defaultdict(list)
+    for record in detection_records:
+        by_frame[record[0]].append(record)
+
+    records, reference = [], []
+    for frame_pos in range(frame_start, frame_end):
+        if frame_pos in skipped:
+            records.extend([frame_pos, *record[1:]] for record in reference)
+        else:
+            reference = by_frame.get(frame_pos, [])
+            records.extend(reference)
+    return records
+
+
+def compare_funscript_data(reference, candidate):
+    """
+    Compares the raw funscript distances of both runs on every frame of the reference, both interpolated like the
+    actions of a funscript.
+    """
+    if len(reference) < 2 or len(candidate) < 2:
+        return None
+    reference, candidate = np.asarray(reference, dtype=np.float64), np.asarray(candidate, dtype=np.float64)
+    frames = np.arange(reference[0, 0], reference[-1, 0] + 1)
+    expected = np.interp(frames, reference[:, 0], reference[:, 1])
+    actual = np.interp(frames, candidate[:, 0], candidate[:, 1])
+    error = np.abs(actual - expected)
+    correlation = np.corrcoef(expected, actual)[0, 1] if expected.std() and actual.std() else None
+    return {
+        "frames": len(frames),
+        "mean_abs_error": round(float(error.mean()), 3),
+        "max_abs_error": round(float(error.max()), 3),
+        f"within_{MAX_DISTANCE_DIFFERENCE}": round(float(np.mean(error <= MAX_DISTANCE_DIFFERENCE)), 4),
+        "correlation": round(float(correlation), 4) if correlation is not None else None,
+    }
+
+
+def evaluate_frame_skipping(state, video_path, threshold=DUPLICATE_FRAME_THRESHOLD, max_skip=DUPLICATE_FRAME_MAX_SKIP, tracker=YOLO_TRACKER):
+    """
+    Measures the effect of skipping near-duplicate frames on the funscript from the stored raw detections of a video
+    (no inference): the tracking analysis runs once on all detections and once with the skipped frames reusing the
+    detections and tracks of the last inferred frame.
+    """
+    state.video_path = video_path
+    state.reload_video_info()
+    exists, detections, _, _, stored_reused_frames = load_detection_data(state)
+    if not exists:
+        raise ValueError(f"No raw detections found for {video_path}, run the object detection first")
+    if stored_reused_frames:
+        log.warning(f"The object detection already skipped {len(stored_reused_frames)} near-duplicate frames, the reference is not inferred on every frame")
+
+    frame_start = state.frame_start
+    frame_end = state.frame_end or state.video_info.total_frames
+    start = time.perf_counter()
+    skipped, stats = get_skipped_frames(state, frame_start, frame_end, threshold, max_skip)
+    log.info(f"Skipped {stats.skipped} / {stats.frames} frames ({stats.skip_ratio:.1%}) in {time.perf_counter() - start:.1f} s")
+
+    # Both runs are tracked with the same tracker, the analysis neither saves files nor shows a preview
+    state.save_debug_file = False
+    state.live_preview_mode = False
+    funscript_data = {}
+    for name, records, reused_frames in (
+        ("all_frames", detections, stored_reused_frames),
+        ("skipped_frames", reuse_detections(detections, skipped, frame_start, frame_end), skipped | stored_reused_frames),
+    ):
+        log.info(f"Running the tracking analysis on {name}")
+        tracked = track_detection_records(records, tracker, reused_frames)
+        funscript_data[name] = list(analyze_tracking_results_v1(state, tracked, save=False) or [])
+
+    return {
+        "video": os.path.basename(video_path),
+        "threshold": threshold,
+        "max_skip": max_skip,
+        "tracker": tracker,
+        "frame_skipping": stats.to_dict(),
+        "funscript": compare_funscript_data(funscript_data["all_frames"], funscript_data["skipped_frames"]),
+    }
@@ -0,0 +1,147 @@
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+from ultralytics import YOLO
+
+from script_generator.constants import RENDER_RESOLUTION, YOLO_BATCH_SIZE, YOLO_CONF
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.data import get_static_batch_size
+from script_generator.object_detection.util.inference import get_detections
+from script_generator.object_detection.util.onnx_detector import OnnxDetector
+from script_generator.object_detection.util.tracking import to_detection_records
+from script_generator.utils.thread_budget import apply_thread_budget, create_thread_budget
+from script_generator.video.ffmpeg.video_reader import VideoReaderFFmpeg
+
+MATCH_IOU = 0.5  # Detections of both backends with the same class and at least this overlap are considered equal
+
+
+def read_frames(state, video_path, frames, start=0):
+    """
+    Reads consecutive frames of a video (from start on) the way the pipeline sees them (projected / cropped by the
+    FFmpeg reader).
+    """
+    state.video_path = video_path
+    state.reload_video_info()
+    reader = VideoReaderFFmpeg(state)
+    result = []
+    try:
+        if start:
+            reader.set_frame(start)
+        while len(result) < frames:
+            ret, frame = reader.read()
+            if not ret:
+                break
+            result.append(frame)
+    finally:
+        reader.release()
+    return result
+
+
+def run_backend(model, model_path, frames, batch_size):
+    # Untimed warm-up batch, creates the session / predictor
+    model.predict(frames[:batch_size], conf=YOLO_CONF, verbose=False)
+    static_batch_size = get_static_batch_size(model, model_path)
+
+    records = []
+    start = time.perf_counter()
+    for offset in range(0, len(frames), batch_size):
+        batch = frames[offset:offset + batch_size]
+        padding = static_batch_size - len(batch) if static_batch_size else 0
+        padded = batch + [batch[-1]] * padding if padding > 0 else batch
+        results = model.predict(padded, conf=YOLO_CONF, verbose=False)
+        for j, result in enumerate(results[:len(batch)]):
+            records.extend(to_detection_records(offset + j, get_detections(result)))
+    duration = time.perf_counter() - start
+
+    return {
+        "fps": round(len(frames) / duration, 2),
+        "ms_per_frame": round(duration * 1000 / len(frames), 3),
+        "detections": len(records),
+    }, records
+
+
+def box_iou(box, boxes):
+    width = np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0])
+    height = np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1])
+    intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+
+def compare_records(reference, candidate, names=("ultralytics", "onnxruntime")):
+    """
+    Matches the detections of both backends per frame and class. Recall is the share of the reference detections the
+    candidate found as well, precision the share of the candidate detections that are in the reference.
+    """
+    def group(records):
+        grouped = defaultdict(list)
+        for frame_pos, cls, conf, x1, y1, x2, y2 in records:
+            grouped[(frame_pos, cls)].append((x1, y1, x2, y2, conf))
+        return grouped
+
+    reference, candidate = group(reference), group(candidate)
+    matched, ious, conf_differences = 0, [], []
+    for key, reference_boxes in reference.items():
+        remaining = np.array(candidate.get(key, []), dtype=np.float32).reshape(-1, 5)
+        for box in reference_boxes:
+            if len(remaining) == 0:
+                break
+            overlap = box_iou(np.array(box[:4], dtype=np.float32), remaining[:, :4])
+            best = int(overlap.argmax())
+            if overlap[best] >= MATCH_IOU:
+                matched += 1
+                ious.append(float(overlap[best]))
+                conf_differences.append(abs(box[4] - float(remaining[best, 4])))
+                remaining = np.delete(remaining, best, axis=0)
+
+    reference_count = sum(len(boxes) for boxes in reference.values())
+    candidate_count = sum(len(boxes) for boxes in candidate.values())
+    return {
+        "matched": matched,
+        f"only_{names[0]}": reference_count - matched,
+        f"only_{names[1]}": candidate_count - matched,
+        "recall": round(matched / reference_count, 4) if reference_count else None,
+        "precision": round(matched / candidate_count, 4) if candidate_count else None,
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "mean_conf_difference": round(float(np.mean(conf_differences)), 4) if conf_differences else None,
+    }
+
+
+def benchmark_onnx_backends(state, model_path, video_path=None, frames=300, batch_size=YOLO_BATCH_SIZE):
+    """
+    Runs the same frames through Ultralytics' model.predict and the ONNX Runtime detector and reports the throughput
+    of both and how well their detections agree.
+    """
+    if video_path:
+        source = os.path.basename(video_path)
+        frame_list = read_frames(state, video_path, frames)
+    else:
+        # Random frames only measure speed, there is nothing to detect
+        source = "random"
+        frame_list = [np.random.randint(0, 256, (RENDER_RESOLUTION, RENDER_RESOLUTION, 3), dtype=np.uint8) for _ in range(frames)]
+    if not frame_list:
+        raise ValueError(f"No frames could be read from {video_path}")
+
+    budget = create_thread_budget(state.concurrent_jobs, gpu_inference=False)
+    report = {
+        "model": os.path.basename(model_path),
+        "source": source,
+        "frames": len(frame_list),
+        "batch_size": batch_size,
+        "inference_threads": budget.inference_threads,
+        "backends": {},
+    }
+
+    records = {}
+    for name, create_model in (("ultralytics", lambda: YOLO(model_path, task="detect")), ("onnxruntime", lambda: OnnxDetector(model_path))):
+        log.info(f"Benchmarking {name} on {len(frame_list)} frames")
+        model = create_model()
+        apply_thread_budget(budget, model)
+        report["backends"][name], records[name] = run_backend(model, model_path, frame_list, batch_size)
+
+    report["speedup"] = round(report["backends"]["onnxruntime"]["fps"] / report["backends"]["ultralytics"]["fps"], 2)
+    report["agreement"] = compare_records(records["ultralytics"], records["onnxruntime"])
+    return report
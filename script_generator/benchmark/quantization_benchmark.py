@@ -0,0 +1,36 @@
+import os
+
+from script_generator.benchmark.onnx_benchmark import compare_records, run_backend
+from script_generator.constants import QUANTIZATION_MIN_RECALL, YOLO_BATCH_SIZE
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.onnx_detector import OnnxDetector
+from script_generator.utils.thread_budget import apply_thread_budget, create_thread_budget
+
+
+def evaluate_quantized_model(state, fp32_path, int8_path, frames, batch_size=YOLO_BATCH_SIZE):
+    """
+    Runs the validation frames through the FP32 and the INT8 model with ONNX Runtime on the CPU. Reports the throughput
+    of both and how many of the FP32 raw YOLO records the INT8 model reproduces.
+    """
+    budget = create_thread_budget(state.concurrent_jobs, gpu_inference=False)
+    report = {
+        "validation_frames": len(frames),
+        "inference_threads": budget.inference_threads,
+        "models": {},
+    }
+
+    records = {}
+    for name, model_path in (("fp32", fp32_path), ("int8", int8_path)):
+        log.info(f"Benchmarking the {name} model on {len(frames)} frames")
+        model = OnnxDetector(model_path)
+        apply_thread_budget(budget, model)
+        report["models"][name], records[name] = run_backend(model, model_path, frames, batch_size)
+        report["models"][name]["file"] = os.path.basename(model_path)
+        report["models"][name]["size_mb"] = round(os.path.getsize(model_path) / 1024 ** 2, 1)
+
+    report["speedup"] = round(report["models"]["int8"]["fps"] / report["models"]["fp32"]["fps"], 2)
+    report["agreement"] = compare_records(records["fp32"], records["int8"], names=("fp32", "int8"))
+    recall = report["agreement"]["recall"]
+    # None when the FP32 model detected nothing on the validation frames, there is nothing to compare
+    report["accuracy_ok"] = None if recall is None else recall >= QUANTIZATION_MIN_RECALL
+    return report
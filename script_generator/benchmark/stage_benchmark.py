@@ -0,0 +1,229 @@
+import os
+import queue
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import psutil
+
+from script_generator.benchmark.stub_yolo_model import StubYoloModel
+from script_generator.constants import OUTPUT_PATH, RENDER_RESOLUTION, YOLO_BATCH_SIZE
+from script_generator.debug.logger import log
+from script_generator.object_detection.workers.post_process_worker import PostProcessWorker
+from script_generator.object_detection.workers.tracker_worker import TrackerWorker
+from script_generator.object_detection.workers.yolo_worker import YoloWorker
+from script_generator.tasks.data_classes.abstract_task import Task
+from script_generator.utils.file import check_create_output_folder
+from script_generator.utils.system_info import get_machine_info
+from script_generator.video.analyse_frame_task import AnalyzeFrameTask
+from script_generator.video.data_classes.video_info import VideoInfo
+from script_generator.video.workers.ffmpeg_worker import VideoWorker
+
+BENCHMARK_PATH = os.path.join(OUTPUT_PATH, "benchmark")
+LAYOUTS = {
+    # layout: (eye width, eye height, eyes, filename suffix used by get_projection_and_fov_from_filename)
+    "vr": (1920, 1920, 2, "_LR_180"),
+    "2d": (1920, 1080, 1, ""),
+}
+STAGES = ["decode", "projection", "yolo", "tracking", "post_process"]
+FRAME_POOL_SIZE = 8  # Random frames are shared between tasks to keep the memory footprint of the harness itself low
+
+
+@dataclass
+class BenchmarkTask(Task):
+    """Replaces the AnalyzeVideoTask on the state so workers can record their start / end as usual."""
+    is_stopped: bool = False
+
+
+class TimingSink:
+    """
+    Output queue for the stage under test, records when every frame leaves the stage.
+    """
+
+    def __init__(self, keep=False):
+        self.keep = keep
+        self.tasks = []
+        self.timestamps = []
+
+    def put(self, task, block=True, timeout=None):
+        if task is None:
+            return
+        self.timestamps.append(time.perf_counter())
+        if self.keep:
+            self.tasks.append(task)
+
+    def qsize(self):
+        return len(self.timestamps)
+
+
+class PeakRssSampler(threading.Thread):
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.process = psutil.Process()
+        self.baseline = self.process.memory_info().rss
+        self.peak = self.baseline
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def create_synthetic_video(ffmpeg_path, layout, frames, fps=30):
+    """
+    Encodes an ffmpeg lavfi testsrc2 clip in the requested layout, VR clips are side by side (2:1) so they are picked up
+    as VR by get_video_info.
+    """
+    eye_width, eye_height, eyes, suffix = LAYOUTS[layout]
+    path = os.path.join(BENCHMARK_PATH, f"fungen_benchmark_{layout}_{frames}f{suffix}.mp4")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(BENCHMARK_PATH, exist_ok=True)
+    source = f"testsrc2=size={eye_width}x{eye_height}:rate={fps}:duration={frames / fps}"
+    graph = f"{source},split[l][r];[l][r]hstack[v]" if eyes == 2 else f"{source}[v]"
+    cmd = [
+        ffmpeg_path, "-y", "-nostats", "-loglevel", "error",
+        "-filter_complex", graph, "-map", "[v]",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        path
+    ]
+    log.info(f"Creating synthetic {layout} video: {' '.join(cmd)}")
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def create_random_tasks(frames, attr="rendered_frame"):
+    rng = np.random.default_rng(0)
+    pool = [rng.integers(0, 256, (RENDER_RESOLUTION, RENDER_RESOLUTION, 3), dtype=np.uint8) for _ in range(FRAME_POOL_SIZE)]
+    tasks = []
+    for frame_pos in range(frames):
+        task = AnalyzeFrameTask(frame_pos=frame_pos)
+        setattr(task, attr, pool[frame_pos % FRAME_POOL_SIZE])
+        tasks.append(task)
+    return tasks
+
+
+def run_stage(state, worker_cls, tasks=None, keep=False):
+    """
+    Runs a single worker in isolation. The input queue is filled up front so the stage never waits on a producer.
+    Latencies are the intervals between consecutive frames leaving the stage, batching stages (YOLO) therefore show
+    their batch time in the upper percentiles.
+    """
+    input_queue = None
+    if tasks is not None:
+        input_queue = queue.Queue()
+        for task in tasks:
+            input_queue.put(task)
+        input_queue.put(None)
+
+    state.analyze_task = BenchmarkTask()
+    sink = TimingSink(keep=keep)
+    worker = worker_cls(state=state, input_queue=input_queue, output_queue=sink)
+
+    sampler = PeakRssSampler()
+    sampler.start()
+    start = time.perf_counter()
+    worker.start()
+    worker.join()
+    sampler.stop()
+    worker.check_exception()
+
+    timestamps = np.array(sink.timestamps)
+    latencies = np.diff(np.concatenate([[start], timestamps])) * 1000 if len(timestamps) else np.array([0.0])
+    elapsed = (timestamps[-1] - start) if len(timestamps) else 0.0
+
+    report = {
+        "frames": len(timestamps),
+        "fps": round(len(timestamps) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 3),
+            "p90": round(float(np.percentile(latencies, 90)), 3),
+            "p99": round(float(np.percentile(latencies, 99)), 3),
+            "max": round(float(latencies.max()), 3),
+        },
+        "peak_rss_mb": round(sampler.peak / 1024 ** 2, 1),
+        "rss_delta_mb": round((sampler.peak - sampler.baseline) / 1024 ** 2, 1),
+    }
+    return report, sink.tasks
+
+
+def benchmark_stages(state, layout="vr", frames=300, stages=None, stub_model=False, stub_inference_ms=0.0):
+    """
+    Benchmarks every pipeline stage in isolation on synthetic frames and returns the results as a json serializable dict.
+    """
+    stages = stages or STAGES
+    if not stub_model:
+        state.load_yolo()
+    original_reader, original_model = state.video_reader, state.yolo_model
+    results = {}
+
+    if layout in LAYOUTS:
+        state.video_path = create_synthetic_video(state.ffmpeg_path, layout, frames)
+        state.reload_video_info()
+    else:
+        # Random arrays only, there is no video to decode
+        state.video_path = os.path.join(BENCHMARK_PATH, "fungen_benchmark_random.mp4")
+        state.video_info = VideoInfo(state.video_path, "rawvideo", RENDER_RESOLUTION, RENDER_RESOLUTION, frames / 30, frames, 30.0)
+    check_create_output_folder(state.video_path)
+
+    def run(name, *args, **kwargs):
+        log.info(f"Benchmarking stage: {name}")
+        try:
+            results[name], kept = run_stage(state, *args, **kwargs)
+            return kept
+        except Exception as e:
+            log.error(f"Stage {name} failed: {e}")
+            results[name] = {"error": str(e)}
+            return []
+
+    try:
+        if "decode" in stages and layout in LAYOUTS:
+            state.video_reader = "FFmpeg + OpenGL (Windows)" if state.video_info.is_vr else "FFmpeg"
+            run("decode", VideoWorker)
+            if state.video_info.is_vr:
+                # The FFmpeg reader also does the projection (v360)
+                state.video_reader = "FFmpeg"
+                run("decode_v360", VideoWorker)
+
+        if "projection" in stages and (layout == "random" or state.video_info.is_vr):
+            # Imported here as it requires an OpenGL capable environment
+            from script_generator.video.workers.vr_to_2d_worker import VrTo2DWorker
+            state.video_reader = "FFmpeg + OpenGL (Windows)"
+            run("projection_opengl", VrTo2DWorker, tasks=create_random_tasks(frames, "preprocessed_frame"))
+
+        detected = []
+        if "yolo" in stages or "tracking" in stages or "post_process" in stages:
+            state.yolo_model = StubYoloModel(inference_ms=stub_inference_ms) if stub_model or not state.yolo_model else state.yolo_model
+            detected = run("yolo", YoloWorker, tasks=create_random_tasks(frames), keep=True)
+            results["yolo"]["model"] = "stub" if isinstance(state.yolo_model, StubYoloModel) else os.path.basename(state.yolo_model_path)
+            results["yolo"]["batch_size"] = YOLO_BATCH_SIZE
+            if "yolo" not in stages:
+                del results["yolo"]
+
+        tracked = []
+        if "tracking" in stages or "post_process" in stages:
+            tracked = run("tracking", TrackerWorker, tasks=detected, keep=True)
+            if "tracking" not in stages:
+                del results["tracking"]
+
+        if "post_process" in stages:
+            run("post_process", PostProcessWorker, tasks=tracked)
+    finally:
+        state.video_reader, state.yolo_model = original_reader, original_model
+        state.analyze_task = None
+
+    return {
+        "machine": get_machine_info(),
+        "settings": {"layout": layout, "frames": frames, "stub_model": stub_model, "stub_inference_ms": stub_inference_ms},
+        "stages": results,
+    }
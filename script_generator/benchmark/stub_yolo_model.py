@@ -0,0 +1,60 @@
+import time
+
+import torch
+
+from script_generator.object_detection.util.inference import get_detections
+
+
+class StubBoxes:
+    def __init__(self, detections):
+        # detections: [[x_center, y_center, w, h, cls, conf, track_id], ...]
+        data = torch.tensor(detections, dtype=torch.float32).reshape(-1, 7)
+        self.xywh = data[:, 0:4]
+        self.xyxy = torch.cat([self.xywh[:, :2] - self.xywh[:, 2:] / 2, self.xywh[:, :2] + self.xywh[:, 2:] / 2], dim=1)
+        self.cls = data[:, 4]
+        self.conf = data[:, 5]
+        self.id = data[:, 6] if len(detections) > 0 else None
+
+    def __len__(self):
+        return self.xywh.shape[0]
+
+
+class StubResult:
+    def __init__(self, detections):
+        self.boxes = StubBoxes(detections)
+
+
+class StubYoloModel:
+    """
+    Stand-in for the Ultralytics model that returns a fixed set of boxes for every frame. Used to benchmark
+    the pipeline without a model file or GPU, inference_ms emulates the model cost per frame.
+    """
+
+    DEFAULT_DETECTIONS = [
+        [320, 420, 60, 180, 0, 0.8, 1],  # penis
+        [320, 340, 40, 40, 1, 0.7, 2],  # glans
+        [320, 300, 160, 120, 2, 0.6, 3],  # pussy
+        [200, 200, 80, 80, 7, 0.9, 4],  # hand
+        [320, 120, 120, 140, 8, 0.9, 5],  # face
+    ]
+
+    def __init__(self, detections=None, inference_ms=0.0):
+        self.detections = self.DEFAULT_DETECTIONS if detections is None else detections
+        self.inference_ms = inference_ms
+
+    def track(self, frames, persist=True, conf=None, verbose=False, **kwargs):
+        return self.predict(frames)
+
+    def predict(self, frames, **kwargs):
+        if self.inference_ms > 0:
+            time.sleep(self.inference_ms * len(frames) / 1000)
+        return [StubResult(self.detections) for _ in frames]
+
+    def detect_batch(self, batch, **kwargs):
+        if self.inference_ms > 0:
+            time.sleep(self.inference_ms * len(batch) / 1000)
+        detections = get_detections(StubResult(self.detections))
+        return [detections.copy() for _ in range(len(batch))]
+
+    def __call__(self, frames, **kwargs):
+        return self.predict(frames)
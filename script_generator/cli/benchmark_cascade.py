@@ -0,0 +1,48 @@
+import argparse
+import json
+import os
+
+from script_generator.benchmark.cascade_benchmark import benchmark_cascade
+from script_generator.constants import YOLO_BATCH_SIZE
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.data import find_cascade_fast_model
+from script_generator.state.app_state import AppState
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark cascade inference (the fast model on every frame, the accurate model on ambiguous frames) against the accurate model alone, reports fps, the escalated frames and how well the detections agree as json."
+    )
+    parser.add_argument("videos", type=str, nargs="+", help="Videos to take the frames from.")
+    parser.add_argument("--model", type=str, help="The accurate model, defaults to the YOLO model of the settings.")
+    parser.add_argument("--fast-model", type=str, help="The fast model, defaults to the 11n model in the format of the accurate model.")
+    parser.add_argument("--frames", type=int, default=600, help="Number of consecutive frames per video.")
+    parser.add_argument("--start", type=float, default=0.5, help="Position (0 - 1) in the videos the frames are taken from.")
+    parser.add_argument("--batch-size", type=int, default=YOLO_BATCH_SIZE, help="Frames per batch.")
+    parser.add_argument("--output", type=str, help="Write the json report to this file.")
+    args = parser.parse_args()
+
+    state = AppState()
+    state.set_is_cli(True)
+
+    model_path = args.model or state.yolo_model_path
+    if not model_path or not os.path.exists(model_path):
+        parser.error("No model found, pass one with --model")
+    fast_model_path = args.fast_model or find_cascade_fast_model(model_path)
+    if not fast_model_path or not os.path.exists(fast_model_path):
+        parser.error("No fast model found, pass one with --fast-model")
+
+    report = benchmark_cascade(state, model_path, fast_model_path, args.videos, args.frames, args.batch_size, args.start)
+
+    report_json = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json)
+        log.info(f"Benchmark report written to {args.output}")
+    print(report_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+
+from script_generator.benchmark.onnx_benchmark import benchmark_onnx_backends
+from script_generator.constants import YOLO_BATCH_SIZE
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.data import find_model
+from script_generator.state.app_state import AppState
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare CPU inference of an ONNX model through Ultralytics and ONNX Runtime directly, reports fps and how well the detections agree as json."
+    )
+    parser.add_argument("--model", type=str, help="Path to the .onnx model, defaults to the first .onnx model in the models directory.")
+    parser.add_argument("--video", type=str, help="Video to take the frames from, random frames (speed only) when omitted.")
+    parser.add_argument("--frames", type=int, default=300, help="Number of frames to run through each backend.")
+    parser.add_argument("--batch-size", type=int, default=YOLO_BATCH_SIZE, help="Frames per batch.")
+    parser.add_argument("--output", type=str, help="Write the json report to this file.")
+    args = parser.parse_args()
+
+    model_path = args.model or find_model(".onnx")
+    if not model_path or not os.path.exists(model_path):
+        parser.error("No .onnx model found, pass one with --model")
+
+    state = AppState()
+    state.set_is_cli(True)
+    report = benchmark_onnx_backends(state, model_path, args.video, args.frames, args.batch_size)
+
+    report_json = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json)
+        log.info(f"Benchmark report written to {args.output}")
+    print(report_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import json
+import os
+
+from script_generator.benchmark.stage_benchmark import LAYOUTS, STAGES, benchmark_stages
+from script_generator.debug.logger import log
+from script_generator.state.app_state import AppState
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark each pipeline stage in isolation on synthetic frames and report fps, latency percentiles and peak RSS as json."
+    )
+    parser.add_argument(
+        "--layout",
+        choices=[*LAYOUTS.keys(), "random"],
+        default="vr",
+        help="Source of the synthetic frames: ffmpeg testsrc in VR side by side or 2D layout, or random arrays (skips decoding)."
+    )
+    parser.add_argument("--frames", type=int, default=300, help="Number of frames to push through each stage.")
+    parser.add_argument(
+        "--stages",
+        type=str,
+        default=",".join(STAGES),
+        help=f"Comma separated list of stages to benchmark. Valid options: {', '.join(STAGES)}."
+    )
+    parser.add_argument("--stub-model", action="store_true", help="Use a stub YOLO model instead of the configured model.")
+    parser.add_argument("--stub-inference-ms", type=float, default=0.0, help="Emulated inference time per frame for the stub model.")
+    parser.add_argument("--output", type=str, help="Write the json report to this file.")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    invalid = [stage for stage in stages if stage not in STAGES]
+    if invalid:
+        parser.error(f"Invalid stage(s): {', '.join(invalid)}")
+
+    state = AppState()
+    state.set_is_cli(True)
+    report = benchmark_stages(state, args.layout, args.frames, stages, args.stub_model, args.stub_inference_ms)
+
+    report_json = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json)
+        log.info(f"Benchmark report written to {args.output}")
+    print(report_json)
+
+
+if __name__ == "__main__":
+    main()
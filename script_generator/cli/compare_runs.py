@@ -0,0 +1,107 @@
+import argparse
+from collections import OrderedDict
+
+from script_generator.constants import RUN_HISTORY_PATH
+from script_generator.debug.logger import log
+from script_generator.debug.run_history import get_similarity_key, get_video_fingerprint, load_run_history
+
+
+def describe_changes(previous, current):
+    """Lists what differs between two runs (version, commit, machine and settings)."""
+    changes = []
+    for section, keys in (("machine", ["version", "commit", "cuda_device", "cpu_count"]), ("settings", None)):
+        prev, cur = previous.get(section, {}), current.get(section, {})
+        for key in keys or sorted(set(prev) | set(cur)):
+            if prev.get(key) != cur.get(key):
+                changes.append(f"{key}: {prev.get(key)} -> {cur.get(key)}")
+    return ", ".join(changes)
+
+
+def compare_group(title, records, threshold):
+    records = sorted(records, key=lambda r: r["date"])
+    best_fps = max(r["performance"]["fps"] for r in records)
+
+    log.info(f"{'-' * 100}")
+    log.info(f" {title} ({len(records)} run(s))")
+    log.info(f"{'-' * 100}")
+
+    regressions = 0
+    previous = None
+    for record in records:
+        perf = record["performance"]
+        machine = record.get("machine", {})
+        settings = record.get("settings", {})
+        line = (
+            f" {record['date'][:19]} | v{machine.get('version')} ({machine.get('commit') or '-'}) | "
+            f"{settings.get('video_reader')}, hwaccel {settings.get('hwaccel')}, {settings.get('model')}, batch {settings.get('batch_size')} | "
+            f"{perf['fps']:.1f} fps, {perf['wall_time']:.0f} s"
+        )
+
+        if previous:
+            prev_fps = previous["performance"]["fps"]
+            delta = (perf["fps"] - prev_fps) / prev_fps * 100 if prev_fps > 0 else 0.0
+            line += f" | {delta:+.1f} % vs previous"
+            if delta <= -threshold:
+                regressions += 1
+                line += " | REGRESSION"
+            changes = describe_changes(previous, record)
+            if changes:
+                line += f" | changed: {changes}"
+
+        log.info(line)
+        stage_fps = ", ".join(f"{name} {fps:.0f}" for name, fps in perf.get("stage_fps", {}).items())
+        if stage_fps:
+            log.info(f"     stage fps: {stage_fps}")
+        previous = record
+
+    latest = records[-1]["performance"]["fps"]
+    log.info(f" Latest run at {latest / best_fps * 100 if best_fps > 0 else 0:.1f} % of the best run ({best_fps:.1f} fps)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the object detection performance of previous runs (from the local run history) across versions and settings."
+    )
+    parser.add_argument("video_path", type=str, nargs="?", help="Only show runs of this video (matched by content fingerprint, not by path).")
+    parser.add_argument("--similar", action="store_true", help="Group runs by similar videos (resolution, codec, bit depth, VR / 2D) instead of by identical video.")
+    parser.add_argument("--last", type=int, help="Only consider the last N runs of each group.")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Flag a run as regression when its fps dropped more than this percentage compared to the previous run.")
+    parser.add_argument("--history", type=str, default=RUN_HISTORY_PATH, help="Path to the run history file.")
+    args = parser.parse_args()
+
+    records = load_run_history(args.history)
+    if not records:
+        log.info(f"No runs found in {args.history}")
+        return
+
+    groups = OrderedDict()
+    for record in records:
+        key = get_similarity_key(record["video"]) if args.similar else record["video"]["fingerprint"]
+        groups.setdefault(key, []).append(record)
+
+    if args.video_path:
+        fingerprint = get_video_fingerprint(args.video_path)
+        match = next((r for r in records if r["video"]["fingerprint"] == fingerprint), None)
+        if match is None:
+            log.info(f"No runs found for {args.video_path}")
+            return
+        key = get_similarity_key(match["video"]) if args.similar else fingerprint
+        groups = OrderedDict([(key, groups[key])])
+
+    regressions = 0
+    for key, group in groups.items():
+        if args.last:
+            group = sorted(group, key=lambda r: r["date"])[-args.last:]
+        title = key if args.similar else f"{group[-1]['video']['name']} [{key}] {get_similarity_key(group[-1]['video'])}"
+        regressions += compare_group(title, group, args.threshold)
+
+    log.info(f"{'-' * 100}")
+    if regressions:
+        log.warning(f"Found {regressions} run(s) that are more than {args.threshold:.0f} % slower than the previous run")
+    else:
+        log.info("No performance regressions found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+
+from script_generator.benchmark.frame_skipping_benchmark import evaluate_frame_skipping
+from script_generator.constants import DUPLICATE_FRAME_MAX_SKIP, DUPLICATE_FRAME_THRESHOLD, YOLO_TRACKER
+from script_generator.debug.logger import log
+from script_generator.state.app_state import AppState
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure how skipping near-duplicate frames changes the funscript of a video, from its stored raw detections (no inference). Reports the skip ratio and the difference of the funscript distances as json."
+    )
+    parser.add_argument("video_path", type=str, help="Path to the video the object detection was run on.")
+    parser.add_argument("--threshold", type=int, default=DUPLICATE_FRAME_THRESHOLD, help="Largest pixel difference (0 - 255) of the thumbnails of a near-duplicate frame.")
+    parser.add_argument("--max-skip", type=int, default=DUPLICATE_FRAME_MAX_SKIP, help="Near-duplicate frames in a row before a frame is inferred again.")
+    parser.add_argument("--tracker", type=str, default=YOLO_TRACKER, help="Ultralytics tracker config used for both runs.")
+    parser.add_argument("--output", type=str, help="Write the json report to this file.")
+    args = parser.parse_args()
+
+    state = AppState()
+    state.set_is_cli(True)
+
+    try:
+        report = evaluate_frame_skipping(state, args.video_path, args.threshold, args.max_skip, args.tracker)
+    except ValueError as e:
+        log.error(str(e))
+        return
+
+    report_json = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json)
+        log.info(f"Evaluation report written to {args.output}")
+    print(report_json)
+
+
+if __name__ == "__main__":
+    main()
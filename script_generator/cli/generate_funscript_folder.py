@@ -12,11 +12,13 @@ from script_generator.cli.shared.common_args import (
     validate_and_adjust_args,
     build_app_state_from_args,
 )
+from script_generator.cli.shared.generate_funscript import generate_funscripts_queue_cli
 from script_generator.constants import OUTPUT_PATH
 from script_generator.debug.logger import log
 from script_generator.funscript.util.check_existing_funscript import check_existing_funscript
 from script_generator.utils.file import get_video_files
 from script_generator.utils.terminal import open_new_terminal
+from script_generator.utils.thread_budget import create_thread_budget
 
 
 def main():
@@ -48,6 +50,12 @@ def main():
         default=2,
         help="Number of subprocesses to run in parallel. If you have beefy hardware 4 seems to be the sweet spot but technically your VRAM is the limit."
     )
+    parser.add_argument(
+        "--queue-mode",
+        action="store_true",
+        default=False,
+        help="Process all videos in this process with a single loaded YOLO model. The tracking analysis of a video overlaps with the object detection of the next one. --num-workers is ignored."
+    )
     add_shared_generate_funscript_args(parser)
 
     args = parser.parse_args()
@@ -157,9 +165,16 @@ def main():
             log.info("No files need new funscript generation.")
             return
 
+        if args.queue_mode:
+            run_queue_mode(state, to_process)
+            return
+
         tasks = deque(to_process)
 
+        # Every subprocess gets its share of the CPU cores
+        args.concurrent_jobs = min(args.num_workers, len(to_process))
         log.info(f"Starting batch generation with up to {args.num_workers} parallel subprocesses.")
+        log.info(create_thread_budget(args.concurrent_jobs).describe())
 
         # Dictionary to keep track of the submitted tasks
         future_to_video = {}
@@ -228,6 +243,24 @@ def main():
         log.error(f"An error occurred: {e}", exc_info=True)
 
 
+def run_queue_mode(state, video_paths):
+    log.info(f"Starting queue mode generation of {len(video_paths)} video(s) in a single process.")
+    global_start_time = time.time()
+
+    results = generate_funscripts_queue_cli(state, video_paths)
+
+    for video_path in video_paths:
+        if results.get(video_path):
+            log.info(f"[Done] {video_path}")
+        else:
+            log.warning(f"[Failed] {video_path}")
+
+    log.info(
+        f"All funscript generation tasks completed in {str(timedelta(seconds=int(time.time() - global_start_time)))} "
+        f"({sum(1 for ok in results.values() if ok)}/{len(video_paths)} succeeded)."
+    )
+
+
 def run_task(video_path, args):
     """
     Runs the funscript generation for one video in a new terminal window.
@@ -244,7 +277,7 @@ def run_task(video_path, args):
         "video_reader", "save_debug_file", "boost_enabled",
         "boost_up_percent", "boost_down_percent", "threshold_enabled",
         "threshold_low", "threshold_high", "vw_simplification_enabled",
-        "vw_factor", "rounding"
+        "vw_factor", "rounding", "profile_stages", "profile_top_n", "concurrent_jobs"
     }
 
     # Build the command dynamically
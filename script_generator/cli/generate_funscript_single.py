@@ -25,7 +25,7 @@ def main():
     validate_and_adjust_args(args)
 
     provided_args = {
-        arg.lstrip("-").replace("-", "_")
+        arg.split("=")[0].lstrip("-").replace("-", "_")
         for arg in sys.argv[1:]
         if arg.startswith("--")
     }
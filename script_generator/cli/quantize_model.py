@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from script_generator.benchmark.quantization_benchmark import evaluate_quantized_model
+from script_generator.constants import QUANTIZATION_MIN_RECALL, YOLO_BATCH_SIZE
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.data import find_model, get_quantized_model_path
+from script_generator.object_detection.util.quantization import export_dynamic_onnx, quantize_model, sample_frames
+from script_generator.state.app_state import AppState
+from script_generator.utils.file import get_output_file_path, get_video_files
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def get_processed_videos(paths):
+    """
+    Videos passed directly are always used, folders only contribute the videos that were processed before (have raw
+    YOLO output), i.e. the footage the model is used on.
+    """
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos.extend(v for v in get_video_files(path) if os.path.exists(get_output_file_path(v, ".msgpack", "rawyolo")[0]))
+        elif os.path.exists(path):
+            videos.append(path)
+        else:
+            log.warn(f"Skipping {path}, file not found")
+    return videos
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create a static INT8 ONNX model for CPU inference, calibrated on frames of your own videos. Checks the detections against the FP32 model, benchmarks both and reports as json."
+    )
+    parser.add_argument("videos", type=str, nargs="+", help="Videos and / or folders (only the videos that were processed before are used) to sample the frames from.")
+    parser.add_argument("--model", type=str, help="The .pt model (or an FP32 .onnx model with a dynamic batch size) to quantize, defaults to the first .pt model in the models directory.")
+    parser.add_argument("--calibration-frames", type=int, default=300, help="Number of frames to calibrate the activation ranges on.")
+    parser.add_argument("--validation-frames", type=int, default=150, help="Number of other frames to compare the FP32 and INT8 model on.")
+    parser.add_argument("--batch-size", type=int, default=YOLO_BATCH_SIZE, help="Frames per batch in the benchmark.")
+    parser.add_argument("--output", type=str, help="Write the json report to this file.")
+    args = parser.parse_args()
+
+    model_path = args.model or find_model(".pt")
+    if not model_path or not os.path.exists(model_path):
+        parser.error("No model found, pass one with --model")
+    videos = get_processed_videos(args.videos)
+    if not videos:
+        parser.error("No (processed) videos found")
+
+    state = AppState()
+    state.set_is_cli(True)
+
+    int8_path = get_quantized_model_path(model_path)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Only a model that passed the accuracy check ends up in the models directory, where it is picked up
+        fp32_path = export_dynamic_onnx(model_path, tmp_dir)
+        tmp_int8_path = os.path.join(tmp_dir, os.path.basename(int8_path))
+        calibration_frames = sample_frames(state, videos, args.calibration_frames, offset=0.25)
+        quantize_model(fp32_path, calibration_frames, tmp_int8_path)
+        del calibration_frames
+
+        validation_frames = sample_frames(state, videos, args.validation_frames, offset=0.75)
+        report = {
+            "calibration_frames": args.calibration_frames,
+            "videos": [os.path.basename(video) for video in videos],
+            **evaluate_quantized_model(state, fp32_path, tmp_int8_path, validation_frames, args.batch_size),
+        }
+
+        if report["accuracy_ok"] is not False:
+            shutil.move(tmp_int8_path, int8_path)
+            log.info(f"INT8 model saved to {int8_path}")
+
+    if report["accuracy_ok"] is False:
+        log.error(
+            f"The INT8 model only reproduces {report['agreement']['recall']:.1%} of the FP32 detections "
+            f"(required {QUANTIZATION_MIN_RECALL:.0%}), it was not saved. Retry with more calibration frames"
+        )
+
+    report_json = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json)
+        log.info(f"Quantization report written to {args.output}")
+    print(report_json)
+
+    if report["accuracy_ok"] is False:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
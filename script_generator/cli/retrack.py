@@ -0,0 +1,51 @@
+import argparse
+import os
+import time
+
+from script_generator.constants import YOLO_TRACKER
+from script_generator.debug.logger import log
+from script_generator.object_detection.util.data import load_detection_data, save_yolo_data
+from script_generator.object_detection.util.tracking import track_detection_records
+from script_generator.scripts.tracking_analysis import tracking_analysis
+from script_generator.state.app_state import AppState
+
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-assign the track ids of a video from its stored raw detections with a different tracker config, without running the YOLO model again."
+    )
+    parser.add_argument("video_path", type=str, help="Path to the video the object detection was run on.")
+    parser.add_argument(
+        "--tracker",
+        type=str,
+        default=YOLO_TRACKER,
+        help="Ultralytics tracker config: bytetrack.yaml, botsort.yaml or the path to a custom yaml."
+    )
+    parser.add_argument("--generate-funscript", action="store_true", help="Run the tracking analysis and create the funscript afterwards.")
+    args = parser.parse_args()
+
+    state = AppState()
+    state.set_is_cli(True)
+    state.video_path = args.video_path
+
+    exists, detections, path, _, reused_frames = load_detection_data(state)
+    if not exists:
+        log.error(f"No raw detections found for {args.video_path}, run the object detection first")
+        return
+
+    start = time.perf_counter()
+    # Near-duplicate frames get the tracks of the previous frame, like in the pipeline
+    records = track_detection_records(detections, args.tracker, reused_frames)
+    tracks = len({record[7] for record in records})
+    log.info(f"Tracked {len(detections)} detections into {len(records)} records ({tracks} tracks) with {args.tracker} in {time.perf_counter() - start:.2f} s")
+    save_yolo_data(state, records)
+
+    if args.generate_funscript:
+        state.set_video_info()
+        tracking_analysis(state)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import os
 
 from script_generator.constants import VALID_VIDEO_READERS
 from script_generator.debug.logger import log
+from script_generator.debug.stage_profiler import STAGE_PROFILING_SUPPORTED, STAGE_PROFILING_UNSUPPORTED
+from script_generator.object_detection.util.data import find_cascade_fast_model
 from script_generator.state.app_state import AppState
 from ultralytics import settings
 
@@ -44,6 +46,38 @@ def add_shared_generate_funscript_args(parser: argparse.ArgumentParser) -> None:
         action="store_true",
         help="Saves a debug file to disk with all collected metrics."
     )
+    parser.add_argument(
+        "--profile-stages",
+        action="store_true",
+        help="Profiles every pipeline stage with cProfile, writes a .pstats file per stage to the output folder and logs the slowest functions. Needs Python 3.11 or lower."
+    )
+    parser.add_argument(
+        "--profile-top-n",
+        type=int,
+        help="Number of functions (by cumulative time) to log per stage when profiling stages."
+    )
+    parser.add_argument(
+        "--concurrent-jobs",
+        type=int,
+        help="Number of videos processed in parallel on this machine, the CPU cores are split between them (ffmpeg, inference and OpenCV threads)."
+    )
+    parser.add_argument(
+        "--cascade-fast-model",
+        type=str,
+        nargs="?",
+        const="",
+        help="Cascade inference: runs this fast model (without a path the 11n model in the format of the YOLO model) on every frame and the YOLO model only on frames with ambiguous detections."
+    )
+    parser.add_argument(
+        "--roi-inference",
+        action="store_true",
+        help="Once the penis is found, infers a crop around it at a reduced input size with a full frame pass every few frames (needs a .pt model or an .onnx model exported with dynamic=True)."
+    )
+    parser.add_argument(
+        "--skip-duplicate-frames",
+        action="store_true",
+        help="Near-duplicate frames (static shots, paused scenes, intro cards) reuse the detections of the last inferred frame instead of running the YOLO model."
+    )
     parser.add_argument(
         "--boost-enabled",
         action="store_true",
@@ -141,6 +175,22 @@ def build_app_state_from_args(args: argparse.Namespace, provided_args: set) -> A
         state.video_reader = args.video_reader
     if "save_debug_file" in provided_args:
         state.save_debug_file = args.save_debug_file
+    if "profile_stages" in provided_args:
+        state.profile_stages = args.profile_stages and STAGE_PROFILING_SUPPORTED
+        if args.profile_stages and not STAGE_PROFILING_SUPPORTED:
+            log.error(STAGE_PROFILING_UNSUPPORTED)
+    if "profile_top_n" in provided_args:
+        state.profile_top_n = args.profile_top_n
+    if "concurrent_jobs" in provided_args:
+        state.concurrent_jobs = args.concurrent_jobs
+    if "cascade_fast_model" in provided_args:
+        state.cascade_fast_model_path = args.cascade_fast_model or find_cascade_fast_model(state.yolo_model_path)
+        if not state.cascade_fast_model_path:
+            log.warning("No fast model found for the cascade, running the YOLO model on every frame.")
+    if "roi_inference" in provided_args:
+        state.roi_inference = args.roi_inference
+    if "skip_duplicate_frames" in provided_args:
+        state.skip_duplicate_frames = args.skip_duplicate_frames
 
     # Boosting
     if "boost_enabled" in provided_args:
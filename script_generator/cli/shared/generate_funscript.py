@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from script_generator.debug.logger import log
 from script_generator.object_detection.util.data import load_yolo_data
 from script_generator.scripts.analyze_video import analyze_video
@@ -8,28 +10,77 @@ from script_generator.utils.helpers import to_int_or_none
 
 def generate_funscript_cli(state: AppState):
     try:
-        state.load_yolo()
-        configured, msg = state.is_configured()
-        if not configured:
-            log.warn(msg)
-            return
+        if run_object_detection(state):
+            tracking_analysis(state)
+    except Exception as e:
+        log.error(f"Error during video analysis: {e}")
+        import traceback
+        traceback.print_exc()
 
-        state.set_video_info()
-        log_state_settings(state)
 
-        state.frame_start = to_int_or_none(state.frame_start)
-        state.frame_end = to_int_or_none(state.frame_end)
+def generate_funscripts_queue_cli(state: AppState, video_paths):
+    """
+    Processes multiple videos in a single process with one loaded YOLO model. Object detection runs on the calling
+    thread, the tracking analysis and funscript creation of video N run in the background while video N+1 is probed,
+    decoded and inferred, which keeps the inference stage busy across file boundaries.
+    Returns a dict with the success status per video path.
+    """
+    frame_start, frame_end = state.frame_start, state.frame_end
+    results = {}
+    futures = {}
 
-        exists, yolo_data, _, _ = load_yolo_data(state)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="Tracking") as executor:
+        for video_path in video_paths:
+            state.video_path = video_path
+            state.frame_start, state.frame_end = frame_start, frame_end
+            try:
+                if not run_object_detection(state):
+                    results[video_path] = False
+                    continue
+            except Exception as e:
+                log.error(f"Error during video analysis of {video_path}: {e}")
+                import traceback
+                traceback.print_exc()
+                results[video_path] = False
+                continue
 
-        # analyze video if required
-        if not state.use_existing_raw_yolo or not exists:
-            analyze_video(state)
-        else:
-            log.info("Skipping yolo analysis as it was already generated")
+            futures[executor.submit(tracking_analysis, state.detached_copy())] = video_path
 
-        tracking_analysis(state)
-    except Exception as e:
-        log.error(f"Error during video analysis: {e}")
-        import traceback
-        traceback.print_exc()
\ No newline at end of file
+        for future in as_completed(futures):
+            video_path = futures[future]
+            try:
+                future.result()
+                results[video_path] = True
+            except Exception as e:
+                log.error(f"Error during tracking analysis of {video_path}: {e}")
+                results[video_path] = False
+
+    return results
+
+
+def run_object_detection(state: AppState):
+    """
+    Runs (or skips when re-using raw YOLO data) the object detection for state.video_path.
+    Returns False when the state is not configured to process the video.
+    """
+    state.load_yolo()
+    configured, msg = state.is_configured()
+    if not configured:
+        log.warn(msg)
+        return False
+
+    state.set_video_info()
+    log_state_settings(state)
+
+    state.frame_start = to_int_or_none(state.frame_start)
+    state.frame_end = to_int_or_none(state.frame_end)
+
+    exists, yolo_data, _, _ = load_yolo_data(state)
+
+    # analyze video if required
+    if not state.use_existing_raw_yolo or not exists:
+        analyze_video(state)
+    else:
+        log.info("Skipping yolo analysis as it was already generated")
+
+    return True
@@ -16,27 +16,55 @@ CONFIG_VERSION = 1
 RENDER_RESOLUTION = 640
 TEXTURE_RESOLUTION = RENDER_RESOLUTION * 1.3  # Texture size that is used to texture the opengl sphere
 YOLO_BATCH_SIZE = 1 if platform.system() == "Darwin" else 30  # Mac doesn't support batching. Note TensorRT (.engine) and .onnx is compiled for a batch size of 30
-YOLO_PERSIST = True  # Big impact on performance but also improves tracking
+YOLO_BATCH_MAX_WAIT = 0.1  # Seconds a partial batch waits for more frames before it is inferred anyway, keeps the latency (live preview) low when the decoder is the bottleneck
 
 ##################################################################################################
 # ADVANCED
 ##################################################################################################
 
 YOLO_CONF = 0.3
+YOLO_IOU = 0.7  # NMS threshold of the ONNX Runtime detector, Ultralytics' default
+YOLO_MAX_DET = 300
+YOLO_TRACKER = "botsort.yaml"  # Tracker config of the tracking stage (bytetrack.yaml, botsort.yaml or a path), stored detections can be re-tracked with script_generator.cli.retrack
+ONNX_RUNTIME_DETECTOR = True  # Runs .onnx models on the CPU with ONNX Runtime directly instead of through Ultralytics (see script_generator.cli.benchmark_onnx)
+ONNX_INTRA_OP_THREADS = None  # None takes the inference threads of the thread budget
+ONNX_INTER_OP_THREADS = None
+QUANTIZED_MODEL_SUFFIX = ".int8.onnx"  # INT8 models created by script_generator.cli.quantize_model, preferred over the FP32 .onnx model on the CPU
+QUANTIZATION_SEGMENT_FRAMES = 10  # Calibration / validation frames sampled around each seek position of a video
+QUANTIZATION_FRAME_STEP = 15  # Frames between two samples of a segment, neighbouring frames add little information
+QUANTIZATION_MIN_RECALL = 0.9  # Share of the FP32 detections the INT8 model has to find for the accuracy check to pass
+CASCADE_FAST_MODEL_TAG = "-11n-"  # Models (see MODEL_FILENAMES) picked as the fast model of the cascade when no path is given
+CASCADE_AMBIGUOUS_CONF = 0.5  # Penis / glans and contact detections of the fast model below this confidence run the frame through the accurate model
+CASCADE_CONTACT_MARGIN = 0.2  # Contact candidates within this share of the locked penis box height (around the box) count as near
+CASCADE_LOCK_FRAMES = 90  # Frames the locked penis box of the cascade is kept without a confident penis detection (~3 s, like the tracker)
+ROI_INPUT_SIZE = 320  # Model input size of the ROI crops (ROI inference), needs a .pt or an .onnx model exported with dynamic=True
+ROI_CROP_SCALE = 2.0  # Side of the (square) crop relative to the larger side of the locked penis box, at least ROI_INPUT_SIZE
+ROI_REFRESH_FRAMES = 15  # Every this many frames the full frame is inferred, refreshes the lock and the detections outside the ROI
+ROI_LOCK_CONF = 0.5  # Minimum confidence of the penis detection of a full frame pass to lock the ROI on
+DUPLICATE_FRAME_SIZE = 32  # Side of the grayscale thumbnail frames are compared on to skip near-duplicates
+DUPLICATE_FRAME_THRESHOLD = 8  # Largest thumbnail pixel difference (0 - 255) to the last inferred frame that still counts as a duplicate
+DUPLICATE_FRAME_MAX_SKIP = 15  # Consecutive frames that reuse the detections of the last inferred frame at most
 VR_TO_2D_PITCH = -21  # The dataset is trained on -25
+OPENGL_CONTEXT_BACKEND = "auto"  # glfw (hidden window), egl (headless GPU), osmesa (software) or auto, which picks glfw when a display is available
+OPENGL_BATCH_SIZE = 1  # Frames rendered into the tiles of one framebuffer per pass in the OpenGL projection (1 renders frame by frame), capped by the GPU's max framebuffer size
+OPENGL_PBO_COUNT = 3  # Frames (batches) in flight in the OpenGL projection, uploads and readbacks of neighbouring frames overlap with rendering
 UPDATE_PROGRESS_INTERVAL = 0.2  # Updates progress in the console and in gui
 STEP_SIZE = 120  # Define custom colormap based on Lucife's heatmapColors | Speed step size for color transitions
 QUEUE_MAXSIZE = 100  # Bounded queue size to avoid memory blow-up as raw frames consume a lot of memory, does not increase performance
+WATCHDOG_REPORT_INTERVAL = 30  # Seconds between the pipeline bottleneck reports in the log
+RESOURCE_SAMPLE_INTERVAL = 1.0  # Seconds between system resource samples (CPU, RSS, disk, GPU) during object detection
+PIPELINE_THREAD_CORES = 2  # Cores reserved for the pipeline stage threads of a job, the rest of its share goes to ffmpeg and inference threads
+STALL_TIMEOUT = 120  # Seconds without any progress before the pipeline is considered stalled and thread stacks are dumped
 
 ##################################################################################################
 # DEV
 ##################################################################################################
 
-# when enabled the queue will be processed one by one (use it on (QUEUE_MAXSIZE / frame rate) seconds longer videos or less)
-# raw frames take a lot of memory (RAM) so don't set the queue to high
+# when enabled the queue will be processed one by one, frames are never dropped so the queues are unbounded and hold the
+# whole video. Raw frames take a lot of memory (RAM) so only use it on short videos (see also script_generator.cli.benchmark_stages)
 SEQUENTIAL_MODE = False
 if SEQUENTIAL_MODE:
-    QUEUE_MAXSIZE = 3000
+    QUEUE_MAXSIZE = 0
 
 ##################################################################################################
 # DEFAULT CONFIG
@@ -48,6 +76,9 @@ DEFAULT_CONFIG = {
     "ffprobe_path": None,
     "ffmpeg_hwaccel": None,
     "yolo_model_path": None,
+    "cascade_fast_model_path": None,
+    "roi_inference": False,
+    "skip_duplicate_frames": False,
     "copy_funscript_to_movie_dir": True,
     "funscript_output_dir": None,
     "make_funscript_backup": True,
@@ -132,31 +163,38 @@ MODEL_FILENAMES = [
     "FunGen-12s-pov-1.1.0.pt",
     "FunGen-12s-pov-1.1.0.mlpackage",
     "FunGen-12s-pov-1.1.0.onnx",
+    "FunGen-12s-pov-1.1.0.int8.onnx",
     "FunGen-12s-mix-1.1.0.engine",
     "FunGen-12s-mix-1.1.0.mlpackage",
     "FunGen-12s-mix-1.1.0.pt",
     "FunGen-12s-mix-1.1.0.onnx",
+    "FunGen-12s-mix-1.1.0.int8.onnx",
     "FunGen-11n-mix-1.0.0.engine",
     "FunGen-11n-mix-1.0.0.mlpackage",
     "FunGen-11n-mix-1.0.0.onnx",
+    "FunGen-11n-mix-1.0.0.int8.onnx",
     "FunGen-11n-mix-1.0.0.pt",
     "FunGen-11s-mix-1.0.0.engine",
     "FunGen-11s-mix-1.0.0.mlpackage",
     "FunGen-11s-mix-1.0.0.onnx",
+    "FunGen-11s-mix-1.0.0.int8.onnx",
     "FunGen-11s-mix-1.0.0.pt",
     "k00gar-11n-RGB-200ep-best.mlpackage",
     "k00gar-11n-RGB-200ep-best.pt",
-    "k00gar-11n-RGB-200ep-best.onnx"
+    "k00gar-11n-RGB-200ep-best.onnx",
+    "k00gar-11n-RGB-200ep-best.int8.onnx"
 ]
 LOGO = os.path.join(PROJECT_PATH, "resources", "logo.png")
 ICON = os.path.join(PROJECT_PATH, "resources", "icon.ico")
 CONFIG_FILE_PATH = os.path.join(PROJECT_PATH, "config.json")
+RUN_HISTORY_PATH = os.path.join(OUTPUT_PATH, "run_history.jsonl")
 
 ##################################################################################################
 # DEBUG VIDEO
 ##################################################################################################
 
 FUNSCRIPT_BUFFER_SIZE = 500
+PREVIEW_MAX_FPS = 30  # The live preview renders on its own thread and skips frames above this rate, it never slows down processing
 
 ##################################################################################################
 # KEY CODES
@@ -0,0 +1,190 @@
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from script_generator.constants import CLASS_COLORS, PREVIEW_MAX_FPS
+from script_generator.debug.logger import log
+from script_generator.debug.video_player.overlay_widgets import OverlayWidgets
+from script_generator.gui.messages.messages import UpdateGUIState
+from script_generator.video.data_classes.video_info import get_cropped_dimensions
+from script_generator.video.ffmpeg.video_reader import VideoReaderFFmpeg
+
+
+@dataclass
+class PreviewItem:
+    frame_pos: int
+    draw: Callable[[np.ndarray], np.ndarray]  # Draws the overlays on a writable copy of the frame
+    frame: Optional[np.ndarray] = None  # When None the renderer reads the frame from the video itself
+
+
+class PreviewMailbox:
+    """
+    Single slot mailbox. Posting replaces an item that was not rendered yet (drop-oldest) so the producer never waits
+    on the renderer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._item: Optional[PreviewItem] = None
+        self.dropped = 0
+
+    def post(self, item: PreviewItem):
+        with self._lock:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._event.set()
+
+    def take(self, timeout) -> Optional[PreviewItem]:
+        if not self._event.wait(timeout):
+            return None
+        with self._lock:
+            item, self._item = self._item, None
+            self._event.clear()
+            return item
+
+
+class LivePreviewRenderer(threading.Thread):
+    """
+    Renders the live preview on its own thread at a capped fps. Producers (the detection pipeline, the tracking
+    analysis) only post the latest frame and a draw callback, all drawing, copying and GUI event handling happens here
+    so enabling the preview costs the producer almost nothing.
+    """
+
+    def __init__(self, state, window_name, max_fps=PREVIEW_MAX_FPS):
+        super().__init__(daemon=True, name=f"LivePreview-{window_name}")
+        self.state = state
+        self.window_name = window_name
+        self.frame_interval = 1.0 / max(1, min(max_fps, state.max_preview_fps or max_fps))
+        self.mailbox = PreviewMailbox()
+        self.window_open = False
+        self.reader = None
+        self._stop_event = threading.Event()
+
+    def post(self, frame_pos, draw, frame=None):
+        self.mailbox.post(PreviewItem(frame_pos=frame_pos, draw=draw, frame=frame))
+
+    def run(self):
+        last_render = 0.0
+        try:
+            while not self._stop_event.is_set():
+                item = self.mailbox.take(timeout=self.frame_interval)
+
+                if not self.state.live_preview_mode:
+                    self._close()
+                    continue
+
+                if item is None:
+                    if self.window_open:
+                        self._handle_user_input()
+                    continue
+
+                wait = last_render + self.frame_interval - time.perf_counter()
+                if wait > 0:
+                    # Cap the fps, a newer item posted in the meantime replaces this one
+                    time.sleep(wait)
+                    newer = self.mailbox.take(timeout=0)
+                    item = newer or item
+
+                frame = item.frame if item.frame is not None else self._read_frame(item.frame_pos)
+                if frame is None:
+                    continue
+
+                self._show(item.draw(frame.copy()))
+                last_render = time.perf_counter()
+                self._handle_user_input()
+        except Exception as e:
+            log.error(f"Live preview failed: {e}")
+        finally:
+            self._close()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=2)
+
+    def _show(self, frame):
+        if not self.window_open or cv2.getWindowProperty(self.window_name, cv2.WND_PROP_VISIBLE) < 1:
+            width, height = get_cropped_dimensions(self.state.video_info)
+            cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
+            cv2.resizeWindow(self.window_name, int(width * 2), int(height * 2))
+            self.window_open = True
+        cv2.imshow(self.window_name, frame)
+
+    def _handle_user_input(self):
+        key = cv2.waitKey(1) & 0xFF
+
+        # Disable the preview when the window was closed or q was pressed
+        if cv2.getWindowProperty(self.window_name, cv2.WND_PROP_VISIBLE) < 1 or key == ord("q"):
+            if self.state.update_ui and self.state.live_preview_mode:
+                self.state.update_ui(UpdateGUIState(attr="live_preview_mode", value=False))
+            self.state.live_preview_mode = False
+            self._close()
+
+    def _read_frame(self, frame_pos):
+        # Only decode forward, restart the reader at the requested frame when going back or skipping far ahead
+        max_skip = int(self.state.video_info.fps * 2)
+        if self.reader is None or frame_pos < self.reader.current_frame_number or frame_pos - self.reader.current_frame_number > max_skip:
+            if self.reader is None:
+                self.reader = VideoReaderFFmpeg(self.state, frame_pos)
+            self.reader.set_frame(frame_pos)
+
+        frame = None
+        while self.reader.current_frame_number <= frame_pos:
+            ret, frame = self.reader.read()
+            if not ret:
+                return None
+        return frame
+
+    def _close(self):
+        if self.window_open:
+            try:
+                cv2.destroyWindow(self.window_name)
+            except cv2.error:
+                pass
+            self.window_open = False
+        if self.reader:
+            self.reader.release()
+            self.reader = None
+
+
+def create_tracking_overlay(state, tracker):
+    """
+    Snapshots the tracker state of the current frame, the tracker keeps mutating its boxes while the preview renders.
+    """
+    tracked_boxes = [(list(box[0]), box[1], box[2]) for box in tracker.tracked_boxes]
+    locked_penis_box = None
+    if tracker.locked_penis_box is not None and tracker.locked_penis_box.is_active():
+        locked_penis_box = list(tracker.locked_penis_box.box)
+    glans_box = list(tracker.boxes['glans']) if tracker.glans_detected else None
+    distance = state.funscript_distances[-1] if state.funscript_distances else None
+
+    return partial(
+        draw_tracking_overlay,
+        tracked_boxes=tracked_boxes,
+        locked_penis_box=locked_penis_box,
+        glans_box=glans_box,
+        distance=distance,
+        offset_x=state.offset_x
+    )
+
+
+def draw_tracking_overlay(frame, tracked_boxes, locked_penis_box, glans_box, distance, offset_x):
+    for box in tracked_boxes:
+        frame = OverlayWidgets.draw_bounding_box(frame, box[0], str(box[2]) + ": " + box[1], CLASS_COLORS[str(box[1])], offset_x)
+
+    if locked_penis_box is not None:
+        frame = OverlayWidgets.draw_bounding_box(frame, locked_penis_box, "Locked_Penis", CLASS_COLORS['penis'], offset_x)
+
+    if glans_box is not None:
+        frame = OverlayWidgets.draw_bounding_box(frame, glans_box, "Glans", CLASS_COLORS['glans'], offset_x)
+
+    if distance is not None:
+        frame = OverlayWidgets.draw_gauge(frame, distance)
+    return frame
@@ -0,0 +1,120 @@
+import faulthandler
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from script_generator.constants import QUEUE_MAXSIZE, STALL_TIMEOUT, WATCHDOG_REPORT_INTERVAL
+from script_generator.debug.logger import log_od, log_path
+
+if TYPE_CHECKING:
+    from script_generator.tasks.data_classes.analyze_video_task import AnalyzeVideoTask
+
+BOTTLENECK_MIN_BUSY = 0.5  # Below this busy ratio no stage is limiting, the pipeline is waiting on something external
+SAMPLE_INTERVAL = 1.0
+
+
+class PipelineWatchdog(threading.Thread):
+    """
+    Periodically works out which stage limits the pipeline from the per stage busy ratios and queue fill levels, and
+    detects stalls (no frame leaving any stage for STALL_TIMEOUT seconds). On a stall the stacks of all threads are
+    dumped with faulthandler so a hung run can be told apart from a slow one.
+    """
+
+    def __init__(self, analyze_task: "AnalyzeVideoTask", stop_event: threading.Event, report_interval=WATCHDOG_REPORT_INTERVAL, stall_timeout=STALL_TIMEOUT):
+        super().__init__(daemon=True, name="PipelineWatchdog")
+        self.analyze_task = analyze_task
+        self.stop_event = stop_event
+        self.report_interval = report_interval
+        self.stall_timeout = stall_timeout
+        self.stall_reported = False
+
+    def run(self):
+        stages = self.analyze_task.graph.stages
+        previous = last_sample = self._snapshot(stages)
+        last_report = last_progress = time.perf_counter()
+
+        while not self.stop_event.wait(SAMPLE_INTERVAL):
+            if self.analyze_task.is_stopped:
+                return
+
+            now = time.perf_counter()
+            current = self._snapshot(stages)
+
+            if any(current[name]["emitted"] > last_sample[name]["emitted"] for name in current):
+                last_progress = now
+                if self.stall_reported:
+                    log_od.info("Pipeline recovered from stall, frames are being processed again")
+                    self.stall_reported = False
+            elif now - last_progress >= self.stall_timeout and not self.stall_reported:
+                self._report_stall(now - last_progress)
+            last_sample = current
+
+            if now - last_report >= self.report_interval:
+                log_od.info(self.describe(previous, current, now - last_report))
+                previous, last_report = current, now
+
+    def _snapshot(self, stages):
+        snapshot = {}
+        for stage in stages:
+            worker = stage.worker
+            snapshot[stage.name] = {
+                "alive": worker.is_alive(),
+                "started": worker.started_at is not None,
+                "wait": worker.wait_time,
+                "emitted": worker.frames_emitted,
+            }
+        return snapshot
+
+    def busy_ratios(self, previous, current, elapsed):
+        ratios = {}
+        for name, stats in current.items():
+            if not stats["alive"] or not stats["started"] or elapsed <= 0:
+                continue
+            waited = stats["wait"] - previous[name]["wait"]
+            ratios[name] = min(max(1.0 - waited / elapsed, 0.0), 1.0)
+        return ratios
+
+    def describe(self, previous, current, elapsed):
+        """
+        Creates a human-readable bottleneck description, e.g. "yolo-bound at 92% busy; decode idle 60%"
+        """
+        ratios = self.busy_ratios(previous, current, elapsed)
+        if not ratios:
+            return "Pipeline watchdog: no running stages"
+
+        fill = {name: size / QUEUE_MAXSIZE for name, size in self.analyze_task.graph.queue_sizes().items()}
+        last_stage = self.analyze_task.graph.stages[-1].name
+        fps = (current[last_stage]["emitted"] - previous[last_stage]["emitted"]) / elapsed
+        bottleneck = max(ratios, key=ratios.get)
+        others = ", ".join(f"{name} idle {1 - busy:.0%}" for name, busy in ratios.items() if name != bottleneck)
+
+        if ratios[bottleneck] < BOTTLENECK_MIN_BUSY:
+            message = f"No stage bound (max {bottleneck} {ratios[bottleneck]:.0%} busy), the pipeline is waiting on I/O or a lock"
+        else:
+            message = f"{bottleneck}-bound at {ratios[bottleneck]:.0%} busy"
+        if others:
+            message += f"; {others}"
+
+        queues = ", ".join(f"{name} {level:.0%}" for name, level in fill.items())
+        return f"Pipeline watchdog: {message} | queue fill: {queues} | {fps:.1f} fps"
+
+    def _report_stall(self, stalled_for):
+        self.stall_reported = True
+        states = ", ".join(
+            f"{stage.name}: {'alive' if stage.worker.is_alive() else 'finished'} ({stage.worker.frames_emitted} emitted)"
+            for stage in self.analyze_task.graph.stages
+        )
+        queues = ", ".join(f"{name}: {size}" for name, size in self.analyze_task.graph.queue_sizes().items())
+        log_od.error(f"Pipeline stalled: no progress for {stalled_for:.0f} s. Stages: {states}. Queues: {queues}")
+
+        dump_path = os.path.join(log_path, f"stall_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log")
+        try:
+            with open(dump_path, "w", encoding="utf-8") as f:
+                faulthandler.dump_traceback(file=f, all_threads=True)
+            log_od.error(f"Thread stacks dumped to {dump_path}")
+        except OSError as e:
+            log_od.error(f"Could not write thread stacks to {dump_path}: {e}")
+            faulthandler.dump_traceback(file=sys.stderr, all_threads=True)
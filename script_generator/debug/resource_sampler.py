@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+
+import numpy as np
+import psutil
+import torch
+
+from script_generator.constants import RESOURCE_SAMPLE_INTERVAL
+from script_generator.debug.logger import log_od
+from script_generator.utils.file import get_output_file_path
+
+SUMMARY_KEYS = ["cpu_total", "process_cpu", "ffmpeg_cpu", "rss_mb", "disk_read_mb_s", "gpu_util"]
+
+
+def get_read_rate(previous, current, elapsed):
+    """
+    MB/s between two _read_counters results. Only processes present in both count (a child that started or exited in
+    between would skew the sum), None when the counter source changed (ffmpeg started or exited) as the counters of
+    the children and the system can't be compared.
+    """
+    if previous is None or current is None or previous[0] != current[0] or elapsed <= 0:
+        return None
+    read = sum(max(0, current[1][pid] - previous[1][pid]) for pid in current[1].keys() & previous[1].keys())
+    return round(read / 1024 ** 2 / elapsed, 2)
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Samples system resources at a fixed interval while the pipeline runs so it's clear whether a run is CPU, memory,
+    I/O or GPU bound. Disk read throughput is taken from the ffmpeg child processes (the processes reading the video
+    file), with the system wide disk counters as fallback on platforms without per process I/O counters.
+    """
+
+    def __init__(self, interval=RESOURCE_SAMPLE_INTERVAL):
+        super().__init__(daemon=True, name="ResourceSampler")
+        self.interval = interval
+        self.process = psutil.Process()
+        self.samples = []
+        self._children = {}  # pid -> psutil.Process, cpu_percent needs the same object to measure deltas
+        self._gpu_available = torch.cuda.is_available()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        start = time.perf_counter()
+        psutil.cpu_percent(percpu=True)
+        self.process.cpu_percent()
+        previous_read, previous_time = self._read_counters(), start
+
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            read = self._read_counters()
+            cpu_per_core = psutil.cpu_percent(percpu=True)
+
+            self.samples.append({
+                "t": round(now - start, 2),
+                "cpu_per_core": cpu_per_core,
+                "cpu_total": round(sum(cpu_per_core) / len(cpu_per_core), 1) if cpu_per_core else 0.0,
+                "process_cpu": self.process.cpu_percent(),
+                "ffmpeg_cpu": round(sum(self._ffmpeg_cpu()), 1),
+                "rss_mb": round(self.process.memory_info().rss / 1024 ** 2, 1),
+                "disk_read_mb_s": get_read_rate(previous_read, read, now - previous_time),
+                "gpu_util": self._gpu_utilization(),
+            })
+            previous_read, previous_time = read, now
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def _ffmpeg_children(self):
+        try:
+            children = [child for child in self.process.children(recursive=True) if "ffmpeg" in child.name().lower()]
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return []
+
+        pids = {child.pid for child in children}
+        for pid in [pid for pid in self._children if pid not in pids]:
+            del self._children[pid]  # Exited
+        for child in children:
+            if child.pid not in self._children:
+                self._children[child.pid] = child
+                child.cpu_percent()  # first call primes the measurement
+        return [self._children[child.pid] for child in children]
+
+    def _ffmpeg_cpu(self):
+        for child in self._ffmpeg_children():
+            try:
+                yield child.cpu_percent()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+    def _read_counters(self):
+        """
+        (source, {pid: read_bytes}) of the ffmpeg children, or ("system", {None: read_bytes}) of the system wide disk
+        counters when there are none. None when neither can be read.
+        """
+        children = self._ffmpeg_children()
+        if children and hasattr(children[0], "io_counters"):
+            counters = {}
+            for child in children:
+                try:
+                    counters[child.pid] = child.io_counters().read_bytes
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+            return "children", counters
+        disk = psutil.disk_io_counters()
+        return ("system", {None: disk.read_bytes}) if disk else None
+
+    def _gpu_utilization(self):
+        if not self._gpu_available:
+            return None
+        try:
+            return torch.cuda.utilization()
+        except Exception as e:
+            # Requires pynvml, don't retry every sample when it's missing
+            log_od.debug(f"GPU utilization not available: {e}")
+            self._gpu_available = False
+            return None
+
+    def summary(self):
+        """
+        Percentiles per metric, e.g. {"cpu_total": {"p50": .., "p95": .., "max": ..}}
+        """
+        summary = {}
+        for key in SUMMARY_KEYS:
+            values = np.array([sample[key] for sample in self.samples if sample[key] is not None], dtype=np.float64)
+            if len(values) == 0:
+                continue
+            summary[key] = {
+                "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)),
+                "max": float(values.max()),
+            }
+        return summary
+
+    def save(self, state):
+        """
+        Saves the time series next to metadata.json (output/{video}/resources.json).
+        """
+        path, _ = get_output_file_path(state.video_path, ".json", "resources")
+        data = {
+            "interval": self.interval,
+            "cpu_count": psutil.cpu_count(),
+            "memory_total_mb": round(psutil.virtual_memory().total / 1024 ** 2, 1),
+            "summary": self.summary(),
+            "samples": self.samples,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        log_od.info(f"Resource usage saved to {path}")
@@ -0,0 +1,146 @@
+import datetime
+import hashlib
+import json
+import os
+
+from script_generator.constants import RUN_HISTORY_PATH
+from script_generator.debug.logger import log_od
+from script_generator.utils.system_info import get_machine_info
+
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+
+def get_video_fingerprint(video_path):
+    """
+    Cheap content fingerprint (file size + first and last MB) that survives renaming and moving the video.
+    """
+    size = os.path.getsize(video_path)
+    sha1 = hashlib.sha1(str(size).encode())
+    with open(video_path, "rb") as f:
+        sha1.update(f.read(FINGERPRINT_CHUNK_SIZE))
+        if size > FINGERPRINT_CHUNK_SIZE:
+            f.seek(max(size - FINGERPRINT_CHUNK_SIZE, FINGERPRINT_CHUNK_SIZE))
+            sha1.update(f.read(FINGERPRINT_CHUNK_SIZE))
+    return sha1.hexdigest()[:16]
+
+
+def get_similarity_key(video):
+    """Videos with the same key are expected to perform alike."""
+    return f"{video['width']}x{video['height']}|{video['codec']}|{video['bit_depth']}bit|{'vr' if video['is_vr'] else '2d'}{'|fisheye' if video['is_fisheye'] else ''}"
+
+
+def create_run_record(state, result_sink):
+    analyze_task = state.analyze_task
+    video_info = state.video_info
+    wall_time = analyze_task.end_time - analyze_task.start_time
+
+    return {
+        "date": datetime.datetime.now().isoformat(),
+        "machine": get_machine_info(),
+        "video": {
+            "fingerprint": get_video_fingerprint(state.video_path),
+            "name": os.path.basename(state.video_path),
+            "width": video_info.width,
+            "height": video_info.height,
+            "codec": video_info.codec_name,
+            "bit_depth": video_info.bit_depth,
+            "fps": video_info.fps,
+            "is_vr": video_info.is_vr,
+            "is_fisheye": video_info.is_fisheye,
+            "projection": video_info.projection,
+        },
+        "settings": {
+            "video_reader": state.video_reader,
+            "hwaccel": state.ffmpeg_hwaccel,
+            "model": os.path.basename(state.yolo_model_path) if state.yolo_model_path else None,
+            "cascade_fast_model": os.path.basename(state.cascade_fast_model_path) if state.cascade_fast_model_path else None,
+            "roi_inference": state.roi_inference,
+            "skip_duplicate_frames": state.skip_duplicate_frames,
+            **get_batch_settings(state),
+            "frame_start": state.frame_start,
+            "concurrent_jobs": state.concurrent_jobs,
+        },
+        "startup": get_startup_times(state),
+        "detector": get_detector_stats(state),
+        "frame_skipping": get_frame_skipping_stats(state),
+        "performance": {
+            "frames": result_sink.frame_count,
+            "wall_time": round(wall_time, 2),
+            "fps": round(result_sink.frame_count / wall_time, 2) if wall_time > 0 else 0.0,
+            "stage_fps": {stage.name: round(stage.worker.busy_fps(), 2) for stage in analyze_task.graph.stages},
+        },
+    }
+
+
+def get_startup_times(state):
+    """
+    Seconds spent loading and warming up the model (in the background), waiting for it and until the first detections.
+    """
+    loader = state.yolo_model_loader
+    yolo_worker = next((stage.worker for stage in state.analyze_task.graph.stages if stage.name == "yolo"), None)
+    times = {
+        "model_load": loader.load_time if loader else None,
+        "model_warmup": loader.warmup_time if loader else None,
+        "model_wait": loader.wait_time if loader else None,
+        "first_batch": getattr(yolo_worker, "first_batch_latency", None),
+    }
+    return {key: round(value, 2) if value is not None else None for key, value in times.items()}
+
+
+def get_batch_settings(state):
+    """
+    Batch size the YOLO worker actually ran with, lowered to the static batch size of exported models.
+    """
+    yolo_worker = next((stage.worker for stage in state.analyze_task.graph.stages if stage.name == "yolo"), None)
+    return {
+        "batch_size": getattr(yolo_worker, "max_batch_size", None),
+        "static_batch_size": getattr(yolo_worker, "static_batch_size", None),
+        "batch_max_wait": getattr(yolo_worker, "max_wait", None),
+    }
+
+
+def get_detector_stats(state):
+    """
+    Escalations of the cascade / frames inferred on the ROI (None when neither is used).
+    """
+    yolo_worker = next((stage.worker for stage in state.analyze_task.graph.stages if stage.name == "yolo"), None)
+    return getattr(yolo_worker, "detector_stats", None)
+
+
+def get_frame_skipping_stats(state):
+    """
+    Near-duplicate frames that reused the detections of the last inferred frame (None when disabled).
+    """
+    yolo_worker = next((stage.worker for stage in state.analyze_task.graph.stages if stage.name == "yolo"), None)
+    frame_filter = getattr(yolo_worker, "frame_filter", None)
+    return frame_filter.stats.to_dict() if frame_filter else None
+
+
+def append_run_record(state, result_sink):
+    """
+    Appends the performance record of the finished object detection run to the local run history (json lines).
+    """
+    try:
+        record = create_run_record(state, result_sink)
+        os.makedirs(os.path.dirname(RUN_HISTORY_PATH), exist_ok=True)
+        with open(RUN_HISTORY_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except Exception as e:
+        # The history is a diagnostic aid, it should never fail the run
+        log_od.warning(f"Could not append run to the run history: {e}")
+
+
+def load_run_history(path=RUN_HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                log_od.warning(f"Skipping corrupt run history line {line_number} in {path}")
+    return records
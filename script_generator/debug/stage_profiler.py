@@ -0,0 +1,41 @@
+import io
+import pstats
+import re
+import sys
+
+from script_generator.debug.logger import log_od
+from script_generator.utils.file import get_output_file_path
+
+# The stages run in parallel threads with a profiler each. From Python 3.12 on cProfile is built on sys.monitoring,
+# which allows a single active profiler per process, the second stage would fail with "Another profiling tool is
+# already active"
+STAGE_PROFILING_SUPPORTED = sys.version_info < (3, 12)
+STAGE_PROFILING_UNSUPPORTED = (
+    f"--profile-stages needs Python 3.11 or lower (cProfile allows a single profiler per process from 3.12 on), "
+    f"running on {sys.version_info.major}.{sys.version_info.minor} without profiling"
+)
+
+
+def save_stage_profiles(state, stages):
+    """
+    Writes the cProfile results of every profiled pipeline stage to output/{video}/profile_{stage}.pstats and logs
+    the top functions by cumulative time per stage. Inspect a file with e.g. `python -m pstats <file>` or snakeviz.
+    """
+    for stage in stages:
+        profiler = stage.worker.profiler
+        if profiler is None:
+            continue
+
+        stage_slug = re.sub(r"[^a-z0-9]+", "_", stage.name.lower()).strip("_")
+        path, _ = get_output_file_path(state.video_path, ".pstats", f"profile_{stage_slug}")
+        profiler.dump_stats(path)
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(state.profile_top_n)
+
+        log_od.info(f"{'-' * 60}")
+        log_od.info(f" Profile of stage {stage.name} ({stage.worker.process_type}), saved to {path}")
+        for line in stream.getvalue().splitlines():
+            if line.strip():
+                log_od.info(line)
@@ -1,6 +1,9 @@
 import ctypes
 import os
+import time
 import tkinter as tk
+
+import psutil
 from ultralytics import settings
 
 from script_generator.constants import LOGO, ICON
@@ -72,6 +75,8 @@ class App(tk.Tk):
         self.state = state if state else AppState()
         self.state.set_is_cli(False)
         self.state.set_root(self)
+        # Loads (and warms up) in the background while the GUI is used, a video is usually processed next
+        self.state.load_yolo()
 
         # Dictionary to store pages
         self.frames = {}
@@ -137,7 +142,16 @@ class PageNames:
     HELP_DEBUG_VIDEO = "Help: Debug video"
 
 
+def log_startup_time(state: AppState):
+    startup_time = time.time() - psutil.Process().create_time()
+    loader = state.yolo_model_loader
+    model_status = "not loading" if loader is None else "loaded" if loader.is_loaded() else "still loading in the background"
+    log.info(f"GUI ready {startup_time:.2f} s after the start of the process (YOLO model {model_status})")
+
+
 def start_app(state: AppState= None):
     app = App(state)
     app.show_frame(PageNames.FUNSCRIPT_GENERATOR)
+    # Runs once the window is drawn and the event loop is idle
+    app.after_idle(log_startup_time, app.state)
     app.mainloop()
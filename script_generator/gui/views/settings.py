@@ -66,6 +66,41 @@ class SettingsPage(tk.Frame):
             row=0
         )
 
+        Widgets.file_selection(
+            attr="cascade_fast_model_path",
+            parent=ffmpeg_settings,
+            label_text="Cascade fast model",
+            button_text="Browse",
+            file_selector_title="Select the fast model of the cascade",
+            file_types=[("YOLO Model Files", "*.onnx *.pt *.engine *.mlmodel"), ("All Files", "*.*")],
+            state=self.state,
+            tooltip_text="Optional fast model (e.g. the 11n) that runs on every frame, the YOLO model above then only\nruns on frames where the fast model's detections are ambiguous. Leave empty to disable.",
+            command=lambda val: c.save(),
+            row=1
+        )
+
+        Widgets.checkbox(
+            ffmpeg_settings,
+            "ROI inference",
+            state=self.state,
+            attr="roi_inference",
+            default_value=False,
+            tooltip_text="Once the penis is found, a crop around it is inferred at a reduced input size with a full frame\npass every few frames. Needs a .pt model or an .onnx model exported with dynamic=True.",
+            command=lambda val: c.save(),
+            row=2
+        )
+
+        Widgets.checkbox(
+            ffmpeg_settings,
+            "Skip near-duplicate frames",
+            state=self.state,
+            attr="skip_duplicate_frames",
+            default_value=False,
+            tooltip_text="Frames that barely differ from the last inferred frame (static shots, paused scenes, intro cards)\nreuse its detections instead of running the YOLO model.",
+            command=lambda val: c.save(),
+            row=3
+        )
+
         ffmpeg_settings = Widgets.frame(self, title="FFmpeg", main_section=True, row=2)
 
         Widgets.file_selection(
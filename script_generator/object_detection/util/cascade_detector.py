@@ -0,0 +1,172 @@
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import torch
+
+from script_generator.constants import CASCADE_AMBIGUOUS_CONF, CASCADE_CONTACT_MARGIN, CASCADE_LOCK_FRAMES, CLASS_REVERSE_MATCH, YOLO_CONF
+from script_generator.object_detection.util.data import get_static_batch_size
+from script_generator.object_detection.util.inference import detect_batch
+
+CLASS_IDS = {name: cls for cls, name in CLASS_REVERSE_MATCH.items()}
+PENIS_CLASSES = np.array([CLASS_IDS["penis"], CLASS_IDS["glans"]])
+# Classes the tracker counts as touching when they overlap the locked penis box
+CONTACT_CLASSES = np.array([CLASS_IDS[name] for name in ("pussy", "butt", "hand", "face", "foot", "breast")])
+
+
+@dataclass
+class CascadeStats:
+    frames: int = 0
+    escalated: int = 0
+    reasons: Counter = field(default_factory=Counter)  # First reason per escalated frame
+    fast_time: float = 0.0
+    accurate_time: float = 0.0
+
+    @property
+    def escalation_rate(self):
+        return self.escalated / self.frames if self.frames else 0.0
+
+    def to_dict(self):
+        return {
+            "frames": self.frames,
+            "escalated": self.escalated,
+            "escalation_rate": round(self.escalation_rate, 4),
+            "reasons": dict(self.reasons),
+            "fast_time": round(self.fast_time, 2),
+            "accurate_time": round(self.accurate_time, 2),
+        }
+
+    def describe(self):
+        return (
+            f"Cascade escalated {self.escalated} / {self.frames} frames ({self.escalation_rate:.1%}) to the accurate "
+            f"model, reasons {dict(self.reasons)}, fast model {self.fast_time:.1f} s, accurate model {self.accurate_time:.1f} s"
+        )
+
+
+class CascadeDetector:
+    """
+    Runs the fast model (e.g. the 11n) on every frame and the accurate model (e.g. the 12s) only on the frames where
+    the fast detections are ambiguous: a low confidence penis / glans, a low confidence contact candidate near the
+    locked penis box or other classes than in the previous frame. The detections of an escalated frame are the ones
+    of the accurate model (mixing both models' boxes would duplicate objects), in the same (n, 6) format.
+    The decisions only depend on the fast detections, the frames of a batch are escalated with a single batch of the
+    accurate model. Call reset() before every video.
+    """
+
+    name = "cascade"
+
+    def __init__(self, fast_model, accurate_model, fast_model_path=None, accurate_model_path=None):
+        self.fast_model = fast_model
+        self.accurate_model = accurate_model
+        self.fast_model_path = fast_model_path
+        self.accurate_model_path = accurate_model_path
+        self.stats = CascadeStats()
+
+        self.previous_classes: Optional[frozenset] = None
+        self.locked_box: Optional[np.ndarray] = None
+        self.frames_since_lock = 0
+
+    def reset(self):
+        """
+        Forgets the previous frame and the locked box, the stats are kept (see reset_stats).
+        """
+        self.previous_classes = None
+        self.locked_box = None
+        self.frames_since_lock = 0
+
+    def reset_stats(self):
+        self.stats = CascadeStats()
+
+    def get_static_batch_size(self):
+        # Every frame of the batch goes through the fast model
+        return get_static_batch_size(self.fast_model, self.fast_model_path)
+
+    def set_num_threads(self, intra_op_threads, inter_op_threads=None):
+        for model in (self.fast_model, self.accurate_model):
+            if hasattr(model, "set_num_threads"):
+                model.set_num_threads(intra_op_threads, inter_op_threads)
+
+    def detect_batch(self, batch: torch.Tensor, conf=YOLO_CONF, count=None) -> List[np.ndarray]:
+        """
+        count is the number of real frames at the start of the batch, the padding of static models is not in sequence
+        with them and never escalated.
+        """
+        count = len(batch) if count is None else count
+        start = time.perf_counter()
+        detections = detect_batch(self.fast_model, batch, conf=conf)[:count]
+        self.stats.fast_time += time.perf_counter() - start
+
+        escalate = []
+        for i, d in enumerate(detections):
+            reason = self.get_escalation_reason(d)
+            if reason:
+                escalate.append(i)
+                self.stats.reasons[reason] += 1
+        self.stats.frames += len(detections)
+        self.stats.escalated += len(escalate)
+
+        if escalate:
+            start = time.perf_counter()
+            for i, d in zip(escalate, self.detect_accurate(batch, escalate, conf)):
+                detections[i] = d
+            self.stats.accurate_time += time.perf_counter() - start
+        return detections
+
+    def detect_accurate(self, batch, indices, conf):
+        """
+        Runs the accurate model on the given frames of the batch, gathered into a new batch. Models compiled for a
+        fixed batch size get the gathered frames in chunks of that size, padded by repeating the last frame.
+        """
+        static_batch_size = get_static_batch_size(self.accurate_model, self.accurate_model_path)
+        chunk_size = static_batch_size or len(indices)
+
+        detections = []
+        for start in range(0, len(indices), chunk_size):
+            chunk = indices[start:start + chunk_size]
+            padded = chunk + [chunk[-1]] * (chunk_size - len(chunk))
+            detections.extend(detect_batch(self.accurate_model, batch[padded], conf=conf)[:len(chunk)])
+        return detections
+
+    def get_escalation_reason(self, detections: np.ndarray) -> Optional[str]:
+        """
+        Why the frame needs the accurate model (None when the fast detections are clear), updates the previous classes
+        and the locked penis box with the fast detections of the frame.
+        """
+        classes = detections[:, 5].astype(np.int32)
+        confs = detections[:, 4]
+        ambiguous = confs < CASCADE_AMBIGUOUS_CONF
+
+        reason = None
+        if np.any(ambiguous & np.isin(classes, PENIS_CLASSES)):
+            reason = "low_confidence"
+        elif self.locked_box is not None and np.any(ambiguous & np.isin(classes, CONTACT_CLASSES) & self.is_near_locked_box(detections[:, :4])):
+            reason = "contact"
+
+        frame_classes = frozenset(classes.tolist())
+        if reason is None and self.previous_classes is not None and frame_classes != self.previous_classes:
+            reason = "class_change"
+        self.previous_classes = frame_classes
+
+        self.update_locked_box(detections, classes)
+        return reason
+
+    def is_near_locked_box(self, boxes: np.ndarray) -> np.ndarray:
+        x1, y1, x2, y2 = self.locked_box
+        margin = (y2 - y1) * CASCADE_CONTACT_MARGIN
+        return (
+            (boxes[:, 0] <= x2 + margin) & (boxes[:, 2] >= x1 - margin) &
+            (boxes[:, 1] <= y2 + margin) & (boxes[:, 3] >= y1 - margin)
+        )
+
+    def update_locked_box(self, detections, classes):
+        # Simplified lock of the tracker: the last confident penis box, released after CASCADE_LOCK_FRAMES without one
+        penis = detections[(classes == CLASS_IDS["penis"]) & (detections[:, 4] >= CASCADE_AMBIGUOUS_CONF)]
+        if len(penis):
+            self.locked_box = penis[penis[:, 4].argmax(), :4].copy()
+            self.frames_since_lock = 0
+        elif self.locked_box is not None:
+            self.frames_since_lock += 1
+            if self.frames_since_lock > CASCADE_LOCK_FRAMES:
+                self.locked_box = None
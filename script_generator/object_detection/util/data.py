@@ -3,8 +3,9 @@ import os
 import torch
 from ultralytics import YOLO
 
-from script_generator.constants import MODELS_PATH, MODEL_FILENAMES, OBJECT_DETECTION_VERSION, YOLO_BATCH_SIZE
+from script_generator.constants import MODELS_PATH, MODEL_FILENAMES, OBJECT_DETECTION_VERSION, YOLO_BATCH_SIZE, ONNX_RUNTIME_DETECTOR, YOLO_TRACKER, QUANTIZED_MODEL_SUFFIX, CASCADE_FAST_MODEL_TAG
 from script_generator.debug.logger import log
+from script_generator.object_detection.util.onnx_detector import OnnxDetector, is_onnx_runtime_available
 from script_generator.utils.file import get_output_file_path
 from script_generator.utils.helpers import is_mac
 from script_generator.utils.json_utils import get_data_file_info
@@ -12,15 +13,50 @@ from script_generator.utils.msgpack_utils import save_msgpack_json, load_msgpack
 
 
 def find_model(extension):
-    """Finds and returns the first model that matches the given file extension."""
+    """Finds and returns the first model that matches the given file extension (.onnx excludes the INT8 models)."""
     for filename in MODEL_FILENAMES:
-        if filename.endswith(extension):
+        if get_model_extension(filename) == extension:
             model_path = os.path.join(MODELS_PATH, filename)
             if os.path.exists(model_path):
                 return model_path
     return None
 
 
+def get_model_extension(model_path):
+    return QUANTIZED_MODEL_SUFFIX if model_path.endswith(QUANTIZED_MODEL_SUFFIX) else os.path.splitext(model_path)[1]
+
+
+def get_quantized_model_path(model_path):
+    return os.path.splitext(model_path)[0] + QUANTIZED_MODEL_SUFFIX
+
+
+def find_cpu_model():
+    """
+    The INT8 model (see quantize_model) created from the FP32 .onnx model is preferred over it, other INT8 models
+    are only used when there is no FP32 .onnx model.
+    """
+    fp32_path = find_model(".onnx")
+    if fp32_path is None:
+        return find_model(QUANTIZED_MODEL_SUFFIX)
+    int8_path = get_quantized_model_path(fp32_path)
+    return int8_path if os.path.exists(int8_path) else fp32_path
+
+
+def find_cascade_fast_model(model_path):
+    """
+    Fast model of the cascade for the given (accurate) model, the first one tagged with CASCADE_FAST_MODEL_TAG in the
+    same format.
+    """
+    if not model_path:
+        return None
+    extension = get_model_extension(model_path)
+    for filename in MODEL_FILENAMES:
+        fast_model_path = os.path.join(MODELS_PATH, filename)
+        if CASCADE_FAST_MODEL_TAG in filename and get_model_extension(filename) == extension and os.path.exists(fast_model_path):
+            return fast_model_path
+    return None
+
+
 def get_yolo_model_path():
     """Selects the appropriate YOLO model based on platform and hardware capabilities."""
 
@@ -28,16 +64,19 @@ def get_yolo_model_path():
         (".mlpackage", is_mac(), "Apple device detected, using MPS inference."),
         (".engine", torch.cuda.is_available(), "CUDA available and compatible, using GPU inference with TensorRT."),
         (".pt", torch.cuda.is_available(), "CUDA available, using GPU inference (TensorRT model not found or not compatible with Compute capability)."),
-        (".onnx", True, "CUDA not available, using ONNX model for CPU inference.")
     ]
 
     for ext, condition, message in model_checks:
         if condition and (model_path := find_model(ext)):
             log.info(f"{message} Loading {model_path}.")
-            if ext == ".onnx":
-                log.info("WARNING: CPU inference may be slow on some devices.")
             return model_path
 
+    if model_path := find_cpu_model():
+        quantized = model_path.endswith(QUANTIZED_MODEL_SUFFIX)
+        log.info(f"CUDA not available, using the {'INT8 quantized ' if quantized else ''}ONNX model for CPU inference. Loading {model_path}.")
+        log.info("WARNING: CPU inference may be slow on some devices.")
+        return model_path
+
     log.error("No suitable model found. Please make sure to download one of our models and place it in the models directory.")
     return None
 
@@ -49,10 +88,37 @@ def load_yolo_model(yolo_model_path):
             log.warn("The YOLO model is missing. Please download and place the appropriate YOLO model in the models directory.")
         return None
 
+    if yolo_model_path.endswith(".onnx") and ONNX_RUNTIME_DETECTOR and not torch.cuda.is_available():
+        if is_onnx_runtime_available():
+            log.info(f"Loading YOLO model with ONNX Runtime: {yolo_model_path}")
+            return OnnxDetector(yolo_model_path)
+        log.warn("onnxruntime is not installed, running the ONNX model through Ultralytics")
+
     log.info(f"Loading YOLO model: {yolo_model_path}")
     return YOLO(yolo_model_path, task="detect")
 
 
+STATIC_BATCH_MODEL_FORMATS = (".engine", ".onnx", ".mlpackage")
+
+
+def get_static_batch_size(model, model_path):
+    """
+    Batch size a compiled model only accepts, None when any batch size can be inferred. TensorRT engines and ONNX
+    models are exported for a fixed batch size (see generate_tensorrt.py) unless they were exported with dynamic=True.
+    """
+    if hasattr(model, "get_static_batch_size"):
+        # Cascade / ROI detector
+        return model.get_static_batch_size()
+    if not model_path or os.path.splitext(model_path)[1].lower() not in STATIC_BATCH_MODEL_FORMATS:
+        return None
+    # Ultralytics reads the exported shape once the model ran (the backend is created on the first inference), the
+    # ONNX Runtime detector once its session was created
+    backend = model if isinstance(model, OnnxDetector) else getattr(getattr(model, "predictor", None), "model", None)
+    if getattr(backend, "dynamic", False):
+        return None
+    return getattr(backend, "batch", None) or YOLO_BATCH_SIZE
+
+
 def get_raw_yolo_file_info(state):
     result_msgpack = get_data_file_info(state.video_path, ".msgpack", "rawyolo")
     if result_msgpack[0]:
@@ -67,6 +133,28 @@ def save_yolo_data(state, data):
     save_msgpack_json(path, json_data)
 
 
+def save_detection_data(state, data, tracker=YOLO_TRACKER, reused_frames=()):
+    """
+    reused_frames are the near-duplicate frames that reused the detections of the previous frame, re-tracking gives
+    them the previous tracks as well (see track_detection_records).
+    """
+    path, _ = get_output_file_path(state.video_path, ".msgpack", "rawdetections")
+    json_data = {"version": OBJECT_DETECTION_VERSION, "tracker": tracker, "data": data, "reused_frames": sorted(reused_frames)}
+    save_msgpack_json(path, json_data)
+
+
+def load_detection_data(state):
+    """
+    Untracked detections, [frame_pos, cls, conf, x1, y1, x2, y2] per detection, and the reused frames.
+    """
+    exists, path, filename = get_data_file_info(state.video_path, ".msgpack", "rawdetections")
+    if not exists:
+        return False, None, path, filename, set()
+
+    json = load_msgpack_json(path)
+    return True, json["data"], path, filename, set(json.get("reused_frames", []))
+
+
 def load_yolo_data(state):
     exists, path, filename = get_raw_yolo_file_info(state)
     if not exists:
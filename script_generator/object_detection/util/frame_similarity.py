@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from script_generator.constants import DUPLICATE_FRAME_MAX_SKIP, DUPLICATE_FRAME_SIZE, DUPLICATE_FRAME_THRESHOLD
+
+
+def get_thumbnail(frame: np.ndarray) -> np.ndarray:
+    """
+    Grayscale thumbnail, every pixel is the average of a block of the frame so noise and compression artifacts cancel
+    out while local motion still changes its block.
+    """
+    small = cv2.resize(frame, (DUPLICATE_FRAME_SIZE, DUPLICATE_FRAME_SIZE), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+@dataclass
+class FrameSkipStats:
+    frames: int = 0
+    skipped: int = 0
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def to_dict(self):
+        return {"frames": self.frames, "skipped": self.skipped, "skip_ratio": round(self.skip_ratio, 4)}
+
+
+class DuplicateFrameFilter:
+    """
+    Flags frames that are near-duplicates of the last inferred (not duplicate) frame: static shots, paused scenes,
+    intro cards. The largest block difference is compared rather than the mean, so motion in a small part of the frame
+    (the action in a VR frame) is not averaged away. After max_skip duplicates in a row the next frame is inferred.
+    """
+
+    def __init__(self, threshold=DUPLICATE_FRAME_THRESHOLD, max_skip=DUPLICATE_FRAME_MAX_SKIP):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.stats = FrameSkipStats()
+        self.reference: Optional[np.ndarray] = None
+        self.skipped_in_row = 0
+
+    def is_duplicate(self, frame: np.ndarray) -> bool:
+        thumbnail = get_thumbnail(frame)
+        self.stats.frames += 1
+        if (
+            self.reference is not None
+            and self.skipped_in_row < self.max_skip
+            and int(cv2.absdiff(thumbnail, self.reference).max()) <= self.threshold
+        ):
+            self.skipped_in_row += 1
+            self.stats.skipped += 1
+            return True
+
+        self.reference = thumbnail
+        self.skipped_in_row = 0
+        return False
@@ -0,0 +1,78 @@
+from typing import List
+
+import numpy as np
+import torch
+
+from script_generator.constants import RENDER_RESOLUTION, YOLO_CONF
+
+
+class InputBatchBuffer:
+    """
+    Preallocated (B, 3, H, W) float input of the model. Every frame is written into its slot once, when it arrives,
+    with the BGR -> RGB swap, the HWC -> CHW transpose and the normalization fused into a single pass. The memory is
+    page-locked (pinned) when CUDA is available so the upload to the GPU is a single asynchronous copy.
+    """
+
+    def __init__(self, capacity, height=RENDER_RESOLUTION, width=RENDER_RESOLUTION):
+        # Zeroed, slots that are never written (padding of static models) must not hold garbage like NaNs
+        self.tensor = torch.zeros((capacity, 3, height, width), dtype=torch.float32, pin_memory=torch.cuda.is_available())
+        self.array = self.tensor.numpy()  # Same memory
+        self.scale = np.float32(1 / 255)
+        self.size = 0
+
+    @property
+    def capacity(self):
+        return len(self.array)
+
+    def write(self, frame: np.ndarray):
+        np.multiply(frame.transpose(2, 0, 1)[::-1], self.scale, out=self.array[self.size])
+        self.size += 1
+
+    def batch(self, size, offset=0) -> torch.Tensor:
+        """
+        size slots from offset on. When they run past the end of the buffer the frames from offset on are moved to the
+        front first (the slots before offset were inferred already), the slots after them are the padding.
+        """
+        if offset + size > self.capacity:
+            self.tensor[:self.size - offset] = self.tensor[offset:self.size].clone()
+            offset = 0
+        return self.tensor[offset:offset + size]
+
+    def clear(self):
+        self.size = 0
+
+
+def detect_batch(model, batch: torch.Tensor, conf=YOLO_CONF) -> List[np.ndarray]:
+    """
+    Runs the model on an InputBatchBuffer batch, returns the detections per frame as (n, 6) arrays of
+    x1, y1, x2, y2, conf, cls. Ultralytics models get the batch handed to their backend directly, skipping the per
+    image preprocessing and the results objects (which convert the batch back to images).
+    """
+    if hasattr(model, "detect_batch"):
+        # ONNX Runtime detector / stub model
+        return model.detect_batch(batch, conf=conf)
+
+    from ultralytics.utils import ops
+
+    if model.predictor is None:
+        # The first batch goes through predict to create the predictor (backend, warm-up)
+        return [get_detections(result) for result in model.predict(batch, conf=conf, verbose=False)]
+
+    predictor = model.predictor
+    backend = predictor.model
+    images = batch.to(backend.device, non_blocking=True)
+    images = images.half() if backend.fp16 else images
+    with torch.inference_mode():
+        predictions = backend(images)
+        detections = ops.non_max_suppression(predictions, conf, predictor.args.iou, max_det=predictor.args.max_det)
+        for d in detections:
+            ops.clip_boxes(d[:, :4], batch.shape[2:])
+    return [d.cpu().numpy() for d in detections]
+
+
+def get_detections(result) -> np.ndarray:
+    """
+    (n, 6) array of x1, y1, x2, y2, conf, cls, drops the results object (which holds a copy of the frame) early.
+    """
+    boxes = result.boxes
+    return np.column_stack([boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy()]).astype(np.float32, copy=False)
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from typing import Optional
+
+import torch
+
+from script_generator.constants import RENDER_RESOLUTION, ROI_INPUT_SIZE, YOLO_BATCH_SIZE, YOLO_CONF
+from script_generator.debug.logger import log_od
+from script_generator.object_detection.util.cascade_detector import CascadeDetector
+from script_generator.object_detection.util.data import get_static_batch_size, load_yolo_model
+from script_generator.object_detection.util.inference import InputBatchBuffer, detect_batch
+from script_generator.object_detection.util.onnx_detector import OnnxDetector
+from script_generator.object_detection.util.roi_detector import RoiDetector, supports_roi_inference
+from script_generator.utils.thread_budget import ThreadBudget, apply_thread_budget
+
+
+def get_warmup_batch_size(model, model_path):
+    """
+    Models compiled for a fixed batch size only accept that one. With CUDA the batch size of the pipeline is warmed up
+    (kernels are picked per input shape), on the CPU a single frame creates the session / predictor.
+    """
+    if isinstance(model, OnnxDetector):
+        # The exported batch size is read from the session
+        model.load()
+    static_batch_size = get_static_batch_size(model, model_path)
+    if static_batch_size:
+        return static_batch_size
+    return YOLO_BATCH_SIZE if torch.cuda.is_available() else 1
+
+
+def warmup_model(model, model_path, size=RENDER_RESOLUTION):
+    # Black frames, the buffer starts out zeroed
+    batch_size = get_warmup_batch_size(model, model_path)
+    detect_batch(model, InputBatchBuffer(batch_size, size, size).batch(batch_size), conf=YOLO_CONF)
+
+
+class YoloModelLoader:
+    """
+    Loads the YOLO model in a background thread and runs a warm-up batch of dummy frames, so neither the start of the
+    app nor the first batch of the pipeline pays for loading the model, building the predictor / session and the first
+    (slow) inference. wait() blocks until the model is ready.
+    With a fast_model_path both models are loaded and combined into a CascadeDetector, with roi_inference the model is
+    wrapped in a RoiDetector (when it takes other input sizes).
+    """
+
+    def __init__(self, model_path, thread_budget: Optional[ThreadBudget] = None, warmup=True, fast_model_path=None, roi_inference=False):
+        self.model_path = model_path
+        self.fast_model_path = fast_model_path
+        self.roi_inference = roi_inference
+        self.thread_budget = thread_budget
+        self.warmup = warmup
+        self.model = None
+
+        self.load_time: Optional[float] = None
+        self.warmup_time: Optional[float] = None
+        self.wait_time: Optional[float] = None  # Time the pipeline waited for the model (last wait)
+
+        self._loaded = threading.Event()
+        self._thread = threading.Thread(target=self._load, name="YoloModelLoader", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            model = load_yolo_model(self.model_path)
+            if model is None:
+                self.load_time = time.perf_counter() - start
+                return
+            fast_model = load_yolo_model(self.fast_model_path) if self.fast_model_path else None
+            if self.fast_model_path and fast_model is None:
+                log_od.warn(f"Could not load the fast model {self.fast_model_path}, running without the cascade")
+            self.load_time = time.perf_counter() - start
+
+            cascade = CascadeDetector(fast_model, model, self.fast_model_path, self.model_path) if fast_model else None
+            if self.thread_budget:
+                # Sized before the warm-up, a different thread count later recreates the ONNX Runtime session
+                apply_thread_budget(self.thread_budget, cascade or model)
+            roi = self.create_roi_detector(model) if self.roi_inference and not cascade else None
+            if self.roi_inference and cascade:
+                log_od.warn("ROI inference is not combined with the cascade, running the cascade on full frames")
+            if self.warmup:
+                warmup_start = time.perf_counter()
+                try:
+                    if cascade:
+                        warmup_model(fast_model, self.fast_model_path)
+                    warmup_model(model, self.model_path)
+                    if roi:
+                        warmup_model(model, self.model_path, ROI_INPUT_SIZE)
+                    self.warmup_time = time.perf_counter() - warmup_start
+                except Exception as e:
+                    # The model may still work in the pipeline (which reports the error when it doesn't)
+                    log_od.warn(f"Warm-up of the YOLO model failed: {e}")
+
+            self.model = cascade or roi or model
+            log_od.info(
+                f"YOLO model{' and cascade fast model' if cascade else ''} loaded in the background in {self.load_time:.2f} s"
+                + (f", warm-up {self.warmup_time:.2f} s" if self.warmup_time is not None else "")
+            )
+        except Exception as e:
+            log_od.error(f"Could not load the YOLO model {self.model_path}: {e}")
+        finally:
+            self._loaded.set()
+
+    def create_roi_detector(self, model):
+        if supports_roi_inference(model, self.model_path):
+            return RoiDetector(model, self.model_path)
+        log_od.warn(
+            f"ROI inference needs a .pt model or an .onnx model exported with dynamic=True, running "
+            f"{os.path.basename(self.model_path)} on full frames"
+        )
+        return None
+
+    def is_loaded(self):
+        return self._loaded.is_set()
+
+    def wait(self):
+        start = time.perf_counter()
+        self._loaded.wait()
+        self.wait_time = time.perf_counter() - start
+        return self.model
@@ -0,0 +1,235 @@
+from dataclasses import dataclass
+
+import numpy as np
+import torch
+
+from script_generator.constants import ONNX_INTER_OP_THREADS, ONNX_INTRA_OP_THREADS, RENDER_RESOLUTION, YOLO_BATCH_SIZE, YOLO_CONF, YOLO_IOU, YOLO_MAX_DET
+from script_generator.debug.logger import log_od
+
+MAX_NMS_CANDIDATES = 30000
+MAX_BOX_SIZE = 7680  # Offset per class so boxes of different classes never overlap in the NMS
+
+
+def is_onnx_runtime_available():
+    try:
+        import onnxruntime  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+@dataclass
+class DetectionResult:
+    """
+    Stands in for the Ultralytics Results, without the copy of the image.
+    """
+    boxes: "Boxes"
+
+
+def non_max_suppression(boxes, scores, iou_threshold, max_det):
+    """
+    Greedy NMS on xyxy boxes, every round suppresses all boxes overlapping the best remaining box at once.
+    Returns the indices of the kept boxes by descending score.
+    """
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0 and len(keep) < max_det:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+
+        width = np.minimum(boxes[best, 2], boxes[rest, 2]) - np.maximum(boxes[best, 0], boxes[rest, 0])
+        height = np.minimum(boxes[best, 3], boxes[rest, 3]) - np.maximum(boxes[best, 1], boxes[rest, 1])
+        intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+        iou = intersection / (areas[best] + areas[rest] - intersection + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_predictions(predictions, image_shape, conf_threshold=YOLO_CONF, iou_threshold=YOLO_IOU, max_det=YOLO_MAX_DET):
+    """
+    Turns the raw output of one image, (4 + classes, anchors), into an (n, 6) array of x1, y1, x2, y2, conf, cls.
+    Same filtering as Ultralytics' non_max_suppression (best class per anchor, class aware NMS).
+    """
+    predictions = predictions.T.astype(np.float32, copy=False)
+    class_scores = predictions[:, 4:]
+    cls = class_scores.argmax(axis=1)
+    conf = class_scores[np.arange(len(cls)), cls]
+
+    candidates = np.flatnonzero(conf > conf_threshold)
+    if len(candidates) > MAX_NMS_CANDIDATES:
+        candidates = candidates[conf[candidates].argsort()[::-1][:MAX_NMS_CANDIDATES]]
+    if len(candidates) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+
+    xywh = predictions[candidates, :4]
+    boxes = np.empty_like(xywh)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+    conf, cls = conf[candidates], cls[candidates].astype(np.float32)
+
+    keep = non_max_suppression(boxes + cls[:, None] * MAX_BOX_SIZE, conf, iou_threshold, max_det)
+
+    height, width = image_shape
+    detections = np.column_stack([boxes[keep], conf[keep], cls[keep]])
+    detections[:, [0, 2]] = np.clip(detections[:, [0, 2]], 0, width)
+    detections[:, [1, 3]] = np.clip(detections[:, [1, 3]], 0, height)
+    return detections
+
+
+class OnnxDetector:
+    """
+    Runs the exported FunGen ONNX model with ONNX Runtime directly instead of through Ultralytics. The frames are
+    written straight into a preallocated input tensor that stays bound to the session (IO binding) and the NMS runs
+    vectorized in numpy. Drop-in replacement for the Ultralytics model in the YOLO worker: detect_batch() binds the
+    worker's input buffer as is, predict() returns results with the same boxes.
+    """
+
+    def __init__(self, model_path, intra_op_threads=ONNX_INTRA_OP_THREADS, inter_op_threads=ONNX_INTER_OP_THREADS):
+        self.model_path = model_path
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.session = None
+        self.binding = None
+        self.inputs = None
+        self.outputs = None
+        self.bound_input = None
+        self.static_batch = False
+        self.dynamic_size = False
+
+    def set_num_threads(self, intra_op_threads, inter_op_threads):
+        """
+        Thread counts from the thread budget, the constants take precedence when they are set.
+        """
+        intra_op_threads = ONNX_INTRA_OP_THREADS or intra_op_threads
+        inter_op_threads = ONNX_INTER_OP_THREADS or inter_op_threads
+        if (intra_op_threads, inter_op_threads) != (self.intra_op_threads, self.inter_op_threads):
+            self.intra_op_threads, self.inter_op_threads = intra_op_threads, inter_op_threads
+            self.session = None  # Recreated with the new thread pools on the next batch
+
+    def load(self):
+        """
+        Creates the session, otherwise done by the first batch.
+        """
+        if self.session is None:
+            self._create_session()
+
+    def _create_session(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.intra_op_threads or 0  # 0 lets ONNX Runtime use all cores
+        options.inter_op_num_threads = self.inter_op_threads or 0
+        if (self.inter_op_threads or 0) > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        # Idle threads don't spin, the cores are shared with ffmpeg and the other pipeline stages
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        self.session = ort.InferenceSession(self.model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+        model_input, model_output = self.session.get_inputs()[0], self.session.get_outputs()[0]
+        batch_size, _, height, width = model_input.shape
+        self.static_batch = isinstance(batch_size, int)
+        self.dynamic_size = not isinstance(height, int) or not isinstance(width, int)
+        if self.dynamic_size:
+            # Exported with dynamic=True, the frames are rendered at this size (detect_batch() takes other sizes too)
+            height = width = RENDER_RESOLUTION
+        input_dtype = np.float16 if model_input.type == "tensor(float16)" else np.float32
+        self.inputs = np.zeros((batch_size if self.static_batch else YOLO_BATCH_SIZE, 3, height, width), dtype=input_dtype)
+
+        self.binding = self.session.io_binding()
+        self.bound_input = None
+        self.outputs = None
+        if all(isinstance(dim, int) for dim in model_output.shape):
+            # Static model, the output is written into a preallocated array as well
+            output_dtype = np.float16 if model_output.type == "tensor(float16)" else np.float32
+            self.outputs = np.empty(model_output.shape, dtype=output_dtype)
+            self.binding.bind_output(model_output.name, "cpu", 0, output_dtype, self.outputs.shape, self.outputs.ctypes.data)
+        else:
+            self.binding.bind_output(model_output.name, "cpu")
+
+        log_od.info(
+            f"ONNX Runtime {ort.__version__} session: input {model_input.shape} ({model_input.type}), "
+            f"intra-op threads {self.intra_op_threads or 'auto'}, inter-op threads {self.inter_op_threads or 'auto'}"
+        )
+
+    @property
+    def dynamic(self):
+        # Same attributes as the Ultralytics backend, read by get_static_batch_size
+        return self.session is not None and not self.static_batch
+
+    @property
+    def batch(self):
+        return len(self.inputs) if self.session is not None and self.static_batch else None
+
+    def _bind_input(self, inputs):
+        # The binding points at the memory of the array, it only changes with another array or shape
+        key = (inputs.ctypes.data, inputs.shape)
+        if key != self.bound_input:
+            self.binding.bind_cpu_input(self.session.get_inputs()[0].name, inputs)
+            if self.outputs is None:
+                # ONNX Runtime keeps the output it allocated for the previous batch size, which no longer fits
+                self.binding.bind_output(self.session.get_outputs()[0].name, "cpu")
+            self.bound_input = key
+
+    def _run(self, inputs, count, conf, iou):
+        self._bind_input(inputs)
+        self.session.run_with_iobinding(self.binding)
+
+        outputs = self.outputs if self.outputs is not None else self.binding.copy_outputs_to_cpu()[0]
+        return [decode_predictions(outputs[i], inputs.shape[2:], conf, iou) for i in range(count)]
+
+    def detect(self, frames, conf=YOLO_CONF, iou=YOLO_IOU):
+        """
+        Detections per frame as (n, 6) arrays of x1, y1, x2, y2, conf, cls.
+        """
+        self.load()
+
+        detections = []
+        for start in range(0, len(frames), len(self.inputs)):
+            chunk = frames[start:start + len(self.inputs)]
+            self._preprocess(chunk)
+            # Dynamic models get a view on the first rows of the input (still contiguous), static ones the full tensor
+            detections.extend(self._run(self.inputs if self.static_batch else self.inputs[:len(chunk)], len(chunk), conf, iou))
+        return detections
+
+    def detect_batch(self, batch, conf=YOLO_CONF, iou=YOLO_IOU):
+        """
+        Like detect() for an already preprocessed (B, 3, H, W) RGB [0, 1] batch (InputBatchBuffer), which is bound to
+        the session without a copy. Models with a dynamic input size take batches of any size (e.g. ROI crops).
+        """
+        self.load()
+
+        inputs = batch.numpy() if isinstance(batch, torch.Tensor) else batch
+        same_size = self.dynamic_size or inputs.shape[2:] == self.inputs.shape[2:]
+        if inputs.dtype == self.inputs.dtype and same_size and (not self.static_batch or len(inputs) == len(self.inputs)):
+            return self._run(inputs, len(inputs), conf, iou)
+        if self.dynamic_size and not self.static_batch:
+            # Half precision model
+            return self._run(np.ascontiguousarray(inputs, dtype=self.inputs.dtype), len(inputs), conf, iou)
+
+        # Half precision model or a batch size the model was not exported for, copied into the own input
+        if inputs.shape[2:] != self.inputs.shape[2:]:
+            raise ValueError(f"Batch of {inputs.shape[3]}x{inputs.shape[2]} does not match the model input of {self.inputs.shape[3]}x{self.inputs.shape[2]}")
+        detections = []
+        for start in range(0, len(inputs), len(self.inputs)):
+            chunk = inputs[start:start + len(self.inputs)]
+            self.inputs[:len(chunk)] = chunk
+            detections.extend(self._run(self.inputs if self.static_batch else self.inputs[:len(chunk)], len(chunk), conf, iou))
+        return detections
+
+    def _preprocess(self, frames):
+        height, width = self.inputs.shape[2:]
+        scale = self.inputs.dtype.type(1 / 255)
+        for i, frame in enumerate(frames):
+            if frame.shape[:2] != (height, width):
+                raise ValueError(f"Frame of {frame.shape[1]}x{frame.shape[0]} does not match the model input of {width}x{height}")
+            # BGR HWC uint8 -> RGB CHW [0, 1], written in place into the bound input tensor
+            np.multiply(frame.transpose(2, 0, 1)[::-1], scale, out=self.inputs[i])
+
+    def predict(self, frames, conf=YOLO_CONF, verbose=False, **kwargs):
+        from ultralytics.engine.results import Boxes
+        return [DetectionResult(Boxes(torch.from_numpy(detections), frame.shape[:2])) for frame, detections in zip(frames, self.detect(frames, conf=conf))]
+
+    def __call__(self, frames, **kwargs):
+        return self.predict(frames, **kwargs)
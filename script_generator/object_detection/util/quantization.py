@@ -0,0 +1,171 @@
+import math
+import os
+import re
+import shutil
+import tempfile
+
+import onnx
+from ultralytics import YOLO
+
+from script_generator.constants import QUANTIZATION_FRAME_STEP, QUANTIZATION_SEGMENT_FRAMES, QUANTIZED_MODEL_SUFFIX
+from script_generator.debug.logger import log_od
+from script_generator.object_detection.util.data import get_quantized_model_path
+from script_generator.object_detection.util.inference import InputBatchBuffer
+from script_generator.video.ffmpeg.video_reader import VideoReaderFFmpeg
+
+QUANTIZATION_OPSET = 17
+
+
+def get_input_shape(model_path):
+    """
+    Input shape of an ONNX model, dynamic dimensions are None.
+    """
+    dims = onnx.load(model_path, load_external_data=False).graph.input[0].type.tensor_type.shape.dim
+    return [dim.dim_value if dim.HasField("dim_value") else None for dim in dims]
+
+
+def export_dynamic_onnx(model_path, output_dir):
+    """
+    FP32 ONNX model with a dynamic batch size to calibrate and quantize. The calibration outputs every activation of
+    the model, with the fixed batch of 30 of our exports that takes more memory than most machines have.
+    A .pt model is exported into output_dir (the .onnx model next to it stays untouched), ONNX models are used as they
+    are if their batch size is dynamic or 1.
+    """
+    if model_path.endswith(QUANTIZED_MODEL_SUFFIX):
+        raise ValueError(f"{model_path} is already quantized, pass the .pt or FP32 .onnx model")
+
+    if model_path.endswith(".onnx"):
+        batch_size = get_input_shape(model_path)[0]
+        if batch_size not in (None, 1):
+            raise ValueError(f"{model_path} was exported for a fixed batch size of {batch_size}, pass the .pt model (or an .onnx model exported with dynamic=True)")
+        return model_path
+
+    log_od.info(f"Exporting {model_path} to ONNX with a dynamic batch size")
+    export_path = os.path.join(output_dir, os.path.basename(model_path))
+    shutil.copy(model_path, export_path)
+    # Per channel QDQ quantization needs opset 13 or newer
+    return YOLO(export_path).export(format="onnx", dynamic=True, simplify=True, half=False, opset=QUANTIZATION_OPSET)
+
+
+def sample_video_frames(state, video_path, count, offset=0.0):
+    """
+    Samples count rendered frames (projected / cropped like the pipeline sees them) spread over the whole video. The
+    frames are taken in short segments around evenly spaced seek positions, offset (0 - 1) shifts the positions within
+    their spacing so calibration and validation frames don't overlap.
+    """
+    state.video_path = video_path
+    state.reload_video_info()
+    segments = max(1, math.ceil(count / QUANTIZATION_SEGMENT_FRAMES))
+    spacing = state.video_info.total_frames / segments
+
+    frames = []
+    reader = VideoReaderFFmpeg(state)
+    try:
+        for segment in range(segments):
+            reader.set_frame(int((segment + offset) * spacing))
+            samples = min(QUANTIZATION_SEGMENT_FRAMES, count - len(frames))
+            for i in range(samples * QUANTIZATION_FRAME_STEP):
+                ret, frame = reader.read()
+                if not ret:
+                    break
+                if i % QUANTIZATION_FRAME_STEP == 0:
+                    frames.append(frame)
+    finally:
+        reader.release()
+    return frames
+
+
+def sample_frames(state, video_paths, count, offset=0.0):
+    """
+    Samples count frames spread over the given videos.
+    """
+    frames = []
+    for i, video_path in enumerate(video_paths):
+        # The remainder is spread over the remaining videos, a short video doesn't reduce the total
+        video_count = math.ceil((count - len(frames)) / (len(video_paths) - i))
+        frames.extend(sample_video_frames(state, video_path, video_count, offset))
+        log_od.info(f"Sampled {len(frames)} / {count} frames ({os.path.basename(video_path)})")
+    return frames
+
+
+class CalibrationFrameReader:
+    """
+    Calibration data reader for ONNX Runtime, feeds the frames one by one preprocessed like the YOLO worker does. The
+    activation ranges don't depend on the batch size and single frames keep the memory of the calibration low.
+    """
+
+    def __init__(self, input_name, frames):
+        self.input_name = input_name
+        self.frames = frames
+        self.buffer = InputBatchBuffer(1)
+        self.position = 0
+
+    def get_next(self):
+        if self.position >= len(self.frames):
+            return None
+        self.buffer.clear()
+        self.buffer.write(self.frames[self.position])
+        self.position += 1
+        return {self.input_name: self.buffer.array}
+
+    def rewind(self):
+        self.position = 0
+
+
+def get_head_nodes_to_exclude(model: onnx.ModelProto):
+    """
+    Nodes of the detection head that decode the boxes (DFL, anchors, concatenation of the box and class outputs).
+    They stay in FP32, quantizing them costs box precision for next to no speed. The convolutions of the head are
+    quantized.
+    """
+    pattern = re.compile(r"/model\.(\d+)/")
+    indices = [int(match.group(1)) for node in model.graph.node if (match := pattern.match(node.name))]
+    if not indices:
+        return []
+    head = f"/model.{max(indices)}/"
+    return [
+        node.name for node in model.graph.node
+        if node.name.startswith(head) and not node.name.startswith((f"{head}cv2", f"{head}cv3"))
+    ]
+
+
+def quantize_model(model_path, frames, output_path=None):
+    """
+    Creates a static INT8 (QDQ, per channel weights) model of the FP32 ONNX model calibrated on the given frames.
+    The activation ranges are the min / max over the frames, the histogram based calibration methods of ONNX Runtime
+    keep every activation of every frame in memory. Returns the path of the quantized model.
+    """
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if not frames:
+        raise ValueError("No calibration frames")
+
+    output_path = output_path or get_quantized_model_path(model_path)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Shape inference and graph optimizations (e.g. folded batch norms) recommended before quantizing. The
+        # symbolic shape inference (aimed at transformers) can't resolve the dynamic input size, ONNX' own is enough
+        preprocessed_path = os.path.join(tmp_dir, "preprocessed.onnx")
+        quant_pre_process(model_path, preprocessed_path, skip_symbolic_shape=True)
+
+        model = onnx.load(preprocessed_path)
+        nodes_to_exclude = get_head_nodes_to_exclude(model)
+        log_od.info(
+            f"Quantizing {os.path.basename(model_path)} on {len(frames)} frames ({len(nodes_to_exclude)} head nodes kept "
+            f"in FP32)"
+        )
+        quantize_static(
+            preprocessed_path,
+            output_path,
+            CalibrationFrameReader(model.graph.input[0].name, frames),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=nodes_to_exclude,
+        )
+
+    log_od.info(f"INT8 model written to {output_path}")
+    return output_path
@@ -0,0 +1,181 @@
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from script_generator.constants import RENDER_RESOLUTION, ROI_CROP_SCALE, ROI_INPUT_SIZE, ROI_LOCK_CONF, ROI_REFRESH_FRAMES, YOLO_CONF
+from script_generator.object_detection.util.cascade_detector import CLASS_IDS, PENIS_CLASSES
+from script_generator.object_detection.util.inference import detect_batch
+from script_generator.object_detection.util.onnx_detector import OnnxDetector
+
+
+@dataclass
+class RoiStats:
+    frames: int = 0
+    roi_frames: int = 0
+    full_frames: int = 0
+    fallbacks: int = 0  # ROI frames without a penis / glans detection, inferred again on the full frame
+    roi_time: float = 0.0
+    full_time: float = 0.0
+
+    @property
+    def roi_rate(self):
+        return self.roi_frames / self.frames if self.frames else 0.0
+
+    def to_dict(self):
+        return {
+            "frames": self.frames,
+            "roi_frames": self.roi_frames,
+            "roi_rate": round(self.roi_rate, 4),
+            "full_frames": self.full_frames,
+            "fallbacks": self.fallbacks,
+            "roi_time": round(self.roi_time, 2),
+            "full_time": round(self.full_time, 2),
+        }
+
+    def describe(self):
+        return (
+            f"ROI inference on {self.roi_frames} / {self.frames} frames ({self.roi_rate:.1%}), {self.full_frames} full "
+            f"frames ({self.fallbacks} ROI fallbacks), ROI {self.roi_time:.1f} s, full frames {self.full_time:.1f} s"
+        )
+
+
+def supports_roi_inference(model, model_path):
+    """
+    The crops need a model that takes other input sizes than the rendered frames: .pt models and .onnx models exported
+    with dynamic=True (run with ONNX Runtime). TensorRT engines and our .onnx exports are fixed to 640x640.
+    """
+    if isinstance(model, OnnxDetector):
+        model.load()
+        return model.dynamic_size and not model.static_batch
+    return bool(model_path) and model_path.endswith(".pt")
+
+
+def get_crop(box, frame_size=RENDER_RESOLUTION):
+    """
+    Square crop (x, y, side) centered on the box, clamped into the frame.
+    """
+    x1, y1, x2, y2 = box
+    side = int(min(frame_size, max(ROI_INPUT_SIZE, max(x2 - x1, y2 - y1) * ROI_CROP_SCALE)))
+    x = int(np.clip((x1 + x2 - side) / 2, 0, frame_size - side))
+    y = int(np.clip((y1 + y2 - side) / 2, 0, frame_size - side))
+    return x, y, side
+
+
+def get_lock(detections: np.ndarray) -> Optional[np.ndarray]:
+    penis = detections[(detections[:, 5] == CLASS_IDS["penis"]) & (detections[:, 4] >= ROI_LOCK_CONF)]
+    return penis[penis[:, 4].argmax(), :4].copy() if len(penis) else None
+
+
+class RoiDetector:
+    """
+    Once a full frame pass found the penis, the following frames are inferred on a crop around it at ROI_INPUT_SIZE
+    (a quarter of the pixels at 320). Every ROI_REFRESH_FRAMES frames the full frame is inferred, which moves the lock
+    along (or releases it), ROI frames without a penis / glans detection are inferred again on the full frame. The
+    boxes are mapped back to frame coordinates, objects outside the crop are only detected on the full frames.
+    Call reset() before every video.
+    """
+
+    name = "roi"
+
+    def __init__(self, model, model_path=None):
+        self.model = model
+        self.model_path = model_path
+        self.stats = RoiStats()
+
+        self.locked_box: Optional[np.ndarray] = None
+        self.frames_since_full = 0
+
+    def reset(self):
+        """
+        Releases the lock, the stats are kept (see reset_stats).
+        """
+        self.locked_box = None
+        self.frames_since_full = 0
+
+    def reset_stats(self):
+        self.stats = RoiStats()
+
+    def get_static_batch_size(self):
+        # Only models with a dynamic batch (and input) size are wrapped
+        return None
+
+    def set_num_threads(self, intra_op_threads, inter_op_threads=None):
+        if hasattr(self.model, "set_num_threads"):
+            self.model.set_num_threads(intra_op_threads, inter_op_threads)
+
+    def detect_batch(self, batch: torch.Tensor, conf=YOLO_CONF, count=None) -> List[np.ndarray]:
+        count = len(batch) if count is None else count
+        detections: List[Optional[np.ndarray]] = [None] * count
+
+        # The refresh frames go first, the ROI frames after them crop around their lock
+        planned, since = [], self.frames_since_full
+        for i in range(count):
+            if since >= ROI_REFRESH_FRAMES or (i == 0 and self.locked_box is None):
+                planned.append(i)
+                since = 0
+            else:
+                since += 1
+        self.detect_full(batch, planned, detections, conf)
+
+        roi, unlocked = [], []
+        lock = self.locked_box
+        for i in range(count):
+            if detections[i] is not None:
+                lock = get_lock(detections[i])
+            elif lock is None:
+                unlocked.append(i)
+            else:
+                roi.append((i, get_crop(lock, batch.shape[-1])))
+        fallbacks = self.detect_roi(batch, roi, detections, conf)
+        self.detect_full(batch, sorted(unlocked + fallbacks), detections, conf)
+
+        full = sorted(planned + unlocked + fallbacks)
+        if full:
+            self.locked_box = get_lock(detections[full[-1]])
+            self.frames_since_full = count - 1 - full[-1]
+        else:
+            self.frames_since_full += count
+
+        self.stats.frames += count
+        self.stats.roi_frames += len(roi) - len(fallbacks)
+        self.stats.full_frames += len(full)
+        self.stats.fallbacks += len(fallbacks)
+        return detections
+
+    def detect_full(self, batch, indices, detections, conf):
+        if not indices:
+            return
+        start = time.perf_counter()
+        # Consecutive frames from the start of the batch are a view, others are gathered
+        frames = batch[:len(indices)] if indices[-1] == len(indices) - 1 else batch[indices]
+        for i, d in zip(indices, detect_batch(self.model, frames, conf=conf)):
+            detections[i] = d
+        self.stats.full_time += time.perf_counter() - start
+
+    def detect_roi(self, batch, roi, detections, conf):
+        """
+        Infers the crops, returns the frames that lost the penis / glans.
+        """
+        if not roi:
+            return []
+        start = time.perf_counter()
+        crops = torch.empty((len(roi), 3, ROI_INPUT_SIZE, ROI_INPUT_SIZE), dtype=batch.dtype)
+        for j, (i, (x, y, side)) in enumerate(roi):
+            crop = batch[i:i + 1, :, y:y + side, x:x + side]
+            if side != ROI_INPUT_SIZE:
+                crop = F.interpolate(crop, size=(ROI_INPUT_SIZE, ROI_INPUT_SIZE), mode="bilinear", align_corners=False, antialias=True)
+            crops[j] = crop[0]
+
+        fallbacks = []
+        for (i, (x, y, side)), d in zip(roi, detect_batch(self.model, crops, conf=conf)):
+            if not np.isin(d[:, 5], PENIS_CLASSES).any():
+                fallbacks.append(i)
+                continue
+            d[:, :4] = d[:, :4] * (side / ROI_INPUT_SIZE) + np.array([x, y, x, y], dtype=np.float32)
+            detections[i] = d
+        self.stats.roi_time += time.perf_counter() - start
+        return fallbacks
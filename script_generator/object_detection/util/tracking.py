@@ -0,0 +1,189 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from script_generator.constants import YOLO_TRACKER
+
+DETECTION_BOX_DECIMALS = 2
+DETECTION_CONF_DECIMALS = 3
+
+# Columns of the raw detection and raw YOLO records, the stored lists have the same order
+DETECTION_RECORD_DTYPE = np.dtype([
+    ("frame", np.int64), ("cls", np.int32), ("conf", np.float32),
+    ("x1", np.float32), ("y1", np.float32), ("x2", np.float32), ("y2", np.float32),
+])
+TRACKED_RECORD_DTYPE = np.dtype([
+    ("frame", np.int64), ("cls", np.int32), ("conf", np.float64),
+    ("x1", np.int32), ("y1", np.int32), ("x2", np.int32), ("y2", np.int32), ("track_id", np.int32),
+])
+
+
+@dataclass
+class TrackerInput:
+    """
+    Detections of one frame in the format the Ultralytics trackers read (numpy Boxes).
+    """
+    xywh: np.ndarray
+    conf: np.ndarray
+    cls: np.ndarray
+
+    def __len__(self):
+        return len(self.conf)
+
+
+def xyxy_to_xywh(boxes):
+    xywh = np.empty_like(boxes)
+    xywh[:, 0] = (boxes[:, 0] + boxes[:, 2]) / 2
+    xywh[:, 1] = (boxes[:, 1] + boxes[:, 3]) / 2
+    xywh[:, 2] = boxes[:, 2] - boxes[:, 0]
+    xywh[:, 3] = boxes[:, 3] - boxes[:, 1]
+    return xywh
+
+
+def create_tracker(config=YOLO_TRACKER):
+    """
+    Ultralytics tracker (bytetrack.yaml, botsort.yaml or the path to a custom config). Camera motion compensation is
+    disabled as it needs the frames, which are not available when re-tracking stored detections.
+    """
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import IterableSimpleNamespace, yaml_load
+    from ultralytics.utils.checks import check_yaml
+
+    settings = yaml_load(check_yaml(config))
+    if settings.get("tracker_type") not in TRACKER_MAP:
+        raise ValueError(f"Only bytetrack and botsort are supported, got {settings.get('tracker_type')} in {config}")
+    settings["gmc_method"] = None
+    return TRACKER_MAP[settings["tracker_type"]](args=IterableSimpleNamespace(**settings), frame_rate=30)
+
+
+def quantize_detections(detections):
+    """
+    Rounds the (n, 6) x1, y1, x2, y2, conf, cls detections to the precision they are stored with, so tracking them
+    again from the raw detections file gives the same track ids as the tracker stage of the pipeline.
+    """
+    detections = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+    quantized = np.empty_like(detections)
+    quantized[:, :4] = np.round(detections[:, :4], DETECTION_BOX_DECIMALS)
+    quantized[:, 4] = np.round(detections[:, 4], DETECTION_CONF_DECIMALS)
+    quantized[:, 5] = detections[:, 5]
+    return quantized
+
+
+def update_tracker(tracker, detections):
+    """
+    Associates the detections of the next frame, returns an (n, 7) array of x1, y1, x2, y2, track id, conf, cls.
+    Like model.track the tracker is only updated for frames with detections.
+    """
+    if len(detections) == 0:
+        return np.zeros((0, 7), dtype=np.float32)
+    tracks = tracker.update(TrackerInput(xyxy_to_xywh(detections[:, :4]), detections[:, 4], detections[:, 5]))
+    return np.asarray(tracks, dtype=np.float32).reshape(-1, 8)[:, :7]
+
+
+def to_detection_array(frame_positions, detections):
+    """
+    Raw (untracked) detection records of several frames as one DETECTION_RECORD_DTYPE array, detections holds the
+    (n, 6) detections of every frame in frame_positions.
+    """
+    counts = [len(d) for d in detections]
+    data = np.concatenate([np.asarray(d, dtype=np.float32).reshape(-1, 6) for d in detections]) if detections else np.zeros((0, 6), dtype=np.float32)
+    records = np.empty(len(data), dtype=DETECTION_RECORD_DTYPE)
+    records["frame"] = np.repeat(np.asarray(frame_positions, dtype=np.int64), counts)
+    records["cls"] = data[:, 5]
+    records["conf"] = data[:, 4]
+    for i, name in enumerate(("x1", "y1", "x2", "y2")):
+        records[name] = data[:, i]
+    return records
+
+
+def to_tracked_array(frame_positions, tracks):
+    """
+    Raw YOLO records of several frames as one TRACKED_RECORD_DTYPE array, tracks holds the (n, 7) tracks of every
+    frame in frame_positions. The box is rebuilt from its (truncated) center and size.
+    """
+    counts = [len(t) for t in tracks]
+    data = np.concatenate([np.asarray(t, dtype=np.float32).reshape(-1, 7) for t in tracks]) if tracks else np.zeros((0, 7), dtype=np.float32)
+    x, y, w, h = xyxy_to_xywh(data[:, :4]).astype(np.int32).T
+    records = np.empty(len(data), dtype=TRACKED_RECORD_DTYPE)
+    records["frame"] = np.repeat(np.asarray(frame_positions, dtype=np.int64), counts)
+    records["cls"] = data[:, 6]
+    records["conf"] = np.round(data[:, 5].astype(np.float64), 1)
+    records["x1"], records["y1"] = x - w // 2, y - h // 2
+    records["x2"], records["y2"] = x + w // 2, y + h // 2
+    records["track_id"] = data[:, 4]
+    return records
+
+
+def to_record_lists(records):
+    """
+    Structured records back to lists of Python numbers, the format of the msgpack files.
+    """
+    return [list(row) for row in zip(*(records[name].tolist() for name in records.dtype.names))]
+
+
+def to_detection_records(frame_pos, detections):
+    """
+    Raw (untracked) detection records, [frame_pos, cls, conf, x1, y1, x2, y2].
+    """
+    return to_record_lists(to_detection_array([frame_pos], [detections]))
+
+
+def to_tracked_records(frame_pos, tracks):
+    """
+    Raw YOLO records, [frame_pos, cls, conf, x1, y1, x2, y2, track_id].
+    """
+    return to_record_lists(to_tracked_array([frame_pos], [tracks]))
+
+
+class RecordBuffer:
+    """
+    Growing columnar buffer of structured records, appending a batch copies it once (the capacity doubles when full).
+    """
+
+    def __init__(self, dtype, capacity=4096):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, records: np.ndarray):
+        end = self.size + len(records)
+        if end > len(self.data):
+            data = np.empty(max(end, 2 * len(self.data)), dtype=self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:end] = records
+        self.size = end
+
+    @property
+    def records(self) -> np.ndarray:
+        return self.data[:self.size]
+
+    def to_list(self):
+        return to_record_lists(self.records)
+
+
+def track_detection_records(detection_records, config=YOLO_TRACKER, reused_frames=()):
+    """
+    Assigns track ids to stored detection records (sorted by frame) without running the model again. The frames in
+    reused_frames repeat the detections of the previous frame and get its tracks, like in the tracker worker.
+    """
+    tracker = create_tracker(config)
+    records = []
+    data = np.asarray(detection_records, dtype=np.float64).reshape(-1, 7)
+    if len(data) == 0:
+        return records
+
+    frame_positions = data[:, 0].astype(np.int64)
+    detections = data.astype(np.float32)
+    starts = np.flatnonzero(np.r_[True, frame_positions[1:] != frame_positions[:-1]])
+    tracks = None
+    for start, end in zip(starts, np.r_[starts[1:], len(detections)]):
+        frame_pos = int(frame_positions[start])
+        if tracks is None or frame_pos not in reused_frames:
+            # Back to the x1, y1, x2, y2, conf, cls layout of the pipeline
+            frame = detections[start:end]
+            tracks = update_tracker(tracker, frame[:, [3, 4, 5, 6, 2, 1]])
+        records.extend(to_tracked_records(frame_pos, tracks))
+    return records
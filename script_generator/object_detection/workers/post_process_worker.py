@@ -1,70 +1,77 @@
 import time
+from functools import partial
 
 import cv2
+import numpy as np
 
-from script_generator.constants import RUN_POSE_MODEL
+from script_generator.constants import RUN_POSE_MODEL, YOLO_BATCH_MAX_WAIT, YOLO_BATCH_SIZE
 from script_generator.constants import CLASS_REVERSE_MATCH, CLASS_COLORS
 from script_generator.debug.logger import log
-from script_generator.gui.messages.messages import UpdateGUIState
+from script_generator.debug.live_preview import LivePreviewRenderer
 from script_generator.object_detection.data_classes.object_detection_result import ObjectDetectionResult
-from script_generator.object_detection.util.data import save_yolo_data
+from script_generator.object_detection.util.data import save_detection_data, save_yolo_data
+from script_generator.object_detection.util.tracking import DETECTION_RECORD_DTYPE, TRACKED_RECORD_DTYPE, RecordBuffer, to_detection_array, to_tracked_array
 from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
 from script_generator.utils.file import get_output_file_path
 from script_generator.utils.msgpack_utils import save_msgpack_json
-from script_generator.video.data_classes.video_info import get_cropped_dimensions
 
 
 class PostProcessWorker(AbstractTaskProcessor):
     process_type = TaskProcessorTypes.YOLO_ANALYSIS
-    records = []
+    records = RecordBuffer(TRACKED_RECORD_DTYPE)
+    detection_records = RecordBuffer(DETECTION_RECORD_DTYPE)
+    reused_frames = []  # Near-duplicate frames that reused the detections of the previous frame
     test_result = ObjectDetectionResult()  # Test result object for debugging
+    preview = None
 
     def task_logic(self):
-        self.records = []
+        self.records = RecordBuffer(TRACKED_RECORD_DTYPE)
+        self.detection_records = RecordBuffer(DETECTION_RECORD_DTYPE)
+        self.reused_frames = []
         self.test_result = ObjectDetectionResult()
+        self.preview = LivePreviewRenderer(self.state, "Object detection tracking preview")
+        self.preview.start()
+
+        # The tracks of a whole batch are converted at once, the tracker stage emits them in bursts anyway
+        for tasks in self.get_task_batches(YOLO_BATCH_SIZE, YOLO_BATCH_MAX_WAIT):
+            self.process_batch(tasks)
+
+        self.preview.stop()
+
+    def process_batch(self, tasks):
         state = self.state
-        width, height = get_cropped_dimensions(state.video_info)
+        frame_positions = [task.frame_pos for task in tasks]
+
+        # Untracked detections are stored as well so they can be re-tracked without running the model again
+        self.detection_records.append(to_detection_array(frame_positions, [task.detections for task in tasks]))
+        self.reused_frames.extend(task.frame_pos for task in tasks if task.reused_detections)
 
-        debug_window_open = False
-        for task in self.get_task():
+        ### DETECTION of BODY PARTS
+        tracked = to_tracked_array(frame_positions, [task.tracks for task in tasks])
+        self.records.append(tracked)
+        ends = np.cumsum([len(task.tracks) for task in tasks])
 
+        for task, end in zip(tasks, ends):
             frame_pos = task.frame_pos
-            det_results = task.yolo_results
             frame = task.rendered_frame
             pose_results = None # TODO pose support
 
-            # Skip if no boxes are detected or no tracks are found
-            if  det_results.boxes.id is None or (len(det_results.boxes) == 0 and not state.live_preview_mode):
+            # Skip if no tracks are found
+            if len(task.tracks) == 0:
                 task.rendered_frame = None # Clear memory
-                task.yolo_results = None  # Clear memory
+                task.detections = task.tracks = None  # Clear memory
                 self.finish_task(task)
                 continue
 
-            ### DETECTION of BODY PARTS
-            # Extract track IDs, boxes, classes, and confidence scores
-            track_ids = det_results.boxes.id.cpu().tolist()
-            boxes = det_results.boxes.xywh.cpu()
-            classes = det_results.boxes.cls.cpu().tolist()
-            confs = det_results.boxes.conf.cpu().tolist()
-
-            # Process each detection
-            for track_id, cls, conf, box in zip(track_ids, classes, confs, boxes):
-                track_id = int(track_id)
-                x, y, w, h = box.int().tolist()
-                x1 = x - w // 2
-                y1 = y - h // 2
-                x2 = x + w // 2
-                y2 = y + h // 2
-                # Create a detection record
-                record = [frame_pos, int(cls), round(conf, 1), x1, y1, x2, y2, track_id]
-                self.records.append(record)
-                if state.live_preview_mode:
-                    test_box = [[x1, y1, x2, y2], round(conf, 1), int(cls), CLASS_REVERSE_MATCH.get(int(cls), 'unknown'), track_id]
+            if state.live_preview_mode:
+                for record in tracked[end - len(task.tracks):end].tolist():
+                    _, cls, conf, x1, y1, x2, y2, track_id = record
+                    test_box = [[x1, y1, x2, y2], conf, cls, CLASS_REVERSE_MATCH.get(cls, 'unknown'), track_id]
                     self.test_result.add_record(frame_pos, test_box)
 
                     # print and test the record
                     log.debug(f"Record : {record}")
-                    log.debug(f"For class id: {int(cls)}, getting: {CLASS_REVERSE_MATCH.get(int(cls), 'unknown')}")
+                    log.debug(f"For class id: {cls}, getting: {CLASS_REVERSE_MATCH.get(cls, 'unknown')}")
                     log.debug(f"Test box: {test_box}")
 
             if RUN_POSE_MODEL:
@@ -97,8 +104,8 @@ class PostProcessWorker(AbstractTaskProcessor):
                         # logger.debug(f"pose_confs: {pose_confs}")
                         conf = pose_confs[0]
 
-                        record = [frame_pos, 10, round(conf, 1), x1, y1, x2, y2, 0]
-                        self.records.append(record)
+                        record = (frame_pos, 10, round(conf, 1), x1, y1, x2, y2, 0)
+                        self.records.append(np.array([record], dtype=TRACKED_RECORD_DTYPE))
                         if state.live_preview_mode:
                             # Print and test the record
                             log.debug(f"Record : {record}")
@@ -108,51 +115,14 @@ class PostProcessWorker(AbstractTaskProcessor):
                             log.debug(f"Test box: {test_box}")
                             self.test_result.add_record(frame_pos, test_box)
 
-            window_name = "Object detection tracking preview"
-
-            # we don't want to call cv2.getWindowProperty every iteration
-            if debug_window_open and not state.live_preview_mode:
-                if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) >= 1:
-                    cv2.destroyWindow(window_name)
-                    debug_window_open = False
-
             if state.live_preview_mode:
-                # Display the YOLO results for testing
-                # det_results.plot()
-                # cv2.imshow("YOLO11", det_results.plot())
-                # cv2.waitKey(1)
-                # Verify the sorted boxes
+                # Only hands over references, drawing and copying happens on the preview thread
                 sorted_boxes = self.test_result.get_boxes(frame_pos)
-                # logger.debug(f"Sorted boxes : {sorted_boxes}")
-
-                frame = frame.copy()
-
-                for box in sorted_boxes:
-                    color = CLASS_COLORS.get(box[3])
-                    cv2.rectangle(frame, (box[0][0], box[0][1]), (box[0][2], box[0][3]), color, 2)
-                    cv2.putText(frame, f"{box[4]}: {box[3]}", (box[0][0], box[0][1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                # Draw the frame ID at the top-left corner
-                cv2.putText(frame, f"Frame: {task.frame_pos}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 3)
-
-
-                # Reinitialize the window if needed
-                if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1 and state.live_preview_mode:
-                    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-                    cv2.resizeWindow(window_name, int(width * 2), int(height * 2))
-                    debug_window_open = True
-                cv2.imshow(window_name, frame)
-
-                if not state.live_preview_mode or not handle_user_input(window_name):
-                    if state.update_ui and state.live_preview_mode:
-                        state.update_ui(UpdateGUIState(attr="live_preview_mode", value=False))
-
-                    state.live_preview_mode = False
+                self.preview.post(frame_pos, partial(draw_detections, boxes=sorted_boxes, frame_pos=frame_pos), frame)
 
             task.rendered_frame = None # Clear memory
-            task.yolo_results = None # Clear memory (yolo results contains a copy of the image)
+            task.detections = task.tracks = None # Clear memory
             self.finish_task(task)
-            
 
     def on_last_item(self):
         # stop processing when the task is force closed
@@ -161,15 +131,21 @@ class PostProcessWorker(AbstractTaskProcessor):
 
         self.state.analyze_task.end_time = time.time()
 
-        save_yolo_data(self.state, self.records)
+        save_yolo_data(self.state, self.records.to_list())
+        save_detection_data(self.state, self.detection_records.to_list(), reused_frames=self.reused_frames)
+
+    def release(self):
+        super().release()
+        if self.preview:
+            self.preview.stop()
 
-def handle_user_input(window_name):
-    key = cv2.waitKey(1) & 0xFF
 
-    # Check if the window has been closed
-    if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) < 1:
-        return False
+def draw_detections(frame, boxes, frame_pos):
+    for box in boxes:
+        color = CLASS_COLORS.get(box[3])
+        cv2.rectangle(frame, (box[0][0], box[0][1]), (box[0][2], box[0][3]), color, 2)
+        cv2.putText(frame, f"{box[4]}: {box[3]}", (box[0][0], box[0][1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
 
-    if key == ord("q"):
-        return False
-    return True
\ No newline at end of file
+    # Draw the frame ID at the top-left corner
+    cv2.putText(frame, f"Frame: {frame_pos}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 3)
+    return frame
@@ -0,0 +1,32 @@
+from script_generator.constants import YOLO_TRACKER
+from script_generator.object_detection.util.tracking import create_tracker, quantize_detections, update_tracker
+from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
+
+
+class TrackerWorker(AbstractTaskProcessor):
+    """
+    Assigns track ids to the detections of the YOLO stage on the CPU, frame by frame in order. The detections are
+    rounded to the precision they are stored with first, so script_generator.cli.retrack reproduces the same tracks.
+    Near-duplicate frames (see DuplicateFrameFilter) keep the tracks of the previous frame.
+    """
+    process_type = TaskProcessorTypes.TRACKING
+
+    def __init__(self, *args, tracker_config=YOLO_TRACKER, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tracker_config = tracker_config
+
+    def task_logic(self):
+        tracker = create_tracker(self.tracker_config)
+        previous_tracks = None
+
+        for task in self.get_task():
+            task.start(str(self.process_type))
+            task.detections = quantize_detections(task.detections)
+            if task.reused_detections and previous_tracks is not None:
+                # Same detections as the previous frame, same ids without advancing the tracker
+                task.tracks = previous_tracks
+            else:
+                task.tracks = update_tracker(tracker, task.detections)
+            previous_tracks = task.tracks
+            task.end(str(self.process_type))
+            self.finish_task(task)
@@ -1,9 +1,20 @@
 import time
+from typing import Optional
 
-from script_generator.constants import YOLO_CONF, YOLO_BATCH_SIZE, YOLO_PERSIST
+import numpy as np
+
+from script_generator.constants import YOLO_CONF, YOLO_BATCH_SIZE, YOLO_BATCH_MAX_WAIT
 from script_generator.debug.logger import log_od
+from script_generator.object_detection.util.cascade_detector import CascadeDetector
+from script_generator.object_detection.util.roi_detector import RoiDetector
+from script_generator.object_detection.util.data import get_static_batch_size
+from script_generator.object_detection.util.frame_similarity import DuplicateFrameFilter
+from script_generator.object_detection.util.inference import InputBatchBuffer, detect_batch
 from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
 
+# Detectors that decide per frame based on the previous frames of the video
+SEQUENCE_DETECTORS = (CascadeDetector, RoiDetector)
+
 
 class YoloWorker(AbstractTaskProcessor):
     process_type = TaskProcessorTypes.YOLO
@@ -12,41 +23,132 @@ class YoloWorker(AbstractTaskProcessor):
     # if run_pose_model:
     #     yolo_pose_results = pose_model.track(frame, persist=True, conf=YOLO_CONF, verbose=False)
 
+    def __init__(self, *args, max_batch_size=YOLO_BATCH_SIZE, max_wait=YOLO_BATCH_MAX_WAIT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.static_batch_size = None
+        self.buffer: Optional[InputBatchBuffer] = None
+
+        # Batching stats
+        self.batches = 0
+        self.padded_frames = 0
+        self.first_batch_latency: Optional[float] = None  # Seconds from the start of the stage to the first detections
+        self.detector_stats: Optional[dict] = None  # Stats of the cascade / ROI detector
+
+        self.frame_filter: Optional[DuplicateFrameFilter] = None
+        self.last_detections: Optional[np.ndarray] = None  # Of the last inferred frame, reused by near-duplicates
+
     def task_logic(self):
-        batch = []
-        tasks = []
-
-        for task in self.get_task():
-            if task.rendered_frame is not None:
-                batch.append(task.rendered_frame)
-                tasks.append(task)
-
-                # If batch is ready, process it
-                if len(batch) >= YOLO_BATCH_SIZE:
-                    self.process_batch(batch, tasks)
-                    batch = []
-                    tasks = []
+        model = self.state.yolo_model
+        if isinstance(model, SEQUENCE_DETECTORS):
+            # The decisions depend on the previous frames of this video
+            model.reset()
+            model.reset_stats()
+        self.update_static_batch_size()
+        self.buffer = InputBatchBuffer(max(self.max_batch_size, self.static_batch_size or 0))
+        self.frame_filter = DuplicateFrameFilter() if self.state.skip_duplicate_frames else None
+
+        # Batches are flushed when full or after max_wait, a slow decoder (or the last frames) doesn't hold back inference.
+        # Every frame is written into the input buffer as it arrives, the slots follow the order of the ready tasks.
+        # The batch size is read again for every batch, it drops to the exported batch size once the model ran
+        for tasks in self.get_task_batches(lambda: self.max_batch_size, self.max_wait, on_task=self.write_frame):
+            ready = []
+            for task in tasks:
+                if task.rendered_frame is not None:
+                    ready.append(task)
+                else:
+                    log_od.warn(f"Rendered frame missing on Yolo task")
+                    self.drop_task(task, "rendered frame missing")
+
+            if ready:
+                self.process_batch(ready)
+            self.buffer.clear()
+
+        if self.batches:
+            # Skipped near-duplicates are emitted but were never inferred
+            inferred_frames = self.frames_emitted - (self.frame_filter.stats.skipped if self.frame_filter else 0)
+            log_od.info(
+                f"YOLO inferred {self.batches} batches, avg {inferred_frames / self.batches:.1f} frames per batch "
+                f"(max {self.max_batch_size}, {self.padded_frames} padding frames)"
+            )
+        if isinstance(model, SEQUENCE_DETECTORS):
+            self.detector_stats = {"type": model.name, **model.stats.to_dict()}
+            log_od.info(model.stats.describe())
+        if self.frame_filter:
+            stats = self.frame_filter.stats
+            log_od.info(f"Skipped {stats.skipped} / {stats.frames} near-duplicate frames ({stats.skip_ratio:.1%}), their detections were reused")
+
+    def write_frame(self, task):
+        if task.rendered_frame is None:
+            return
+        if self.frame_filter and self.frame_filter.is_duplicate(task.rendered_frame):
+            # Gets no slot in the input buffer
+            task.reused_detections = True
+            return
+        self.buffer.write(task.rendered_frame)
+
+    def update_static_batch_size(self):
+        self.static_batch_size = get_static_batch_size(self.state.yolo_model, self.state.yolo_model_path)
+        if self.static_batch_size:
+            self.max_batch_size = min(self.max_batch_size, self.static_batch_size)
+
+    def process_batch(self, tasks):
+        inferred = [t for t in tasks if not t.reused_detections]
+        if inferred:
+            self.infer(inferred)
+
+        for t in tasks:
+            if t.reused_detections:
+                # The last inferred frame is earlier in this batch or in an earlier one
+                t.detections = self.last_detections
+                t.duration(str(self.process_type), 0)
             else:
-                log_od.warn(f"Rendered frame missing on Yolo task")
+                self.last_detections = t.detections
+            self.finish_task(t)
 
-        # Process any remaining tasks in the batch with padding
-        if batch:
-            # Pad the batch with the last frame to reach YOLO_BATCH_SIZE
-            last_frame = batch[-1]
-            while len(batch) < YOLO_BATCH_SIZE:
-                batch.append(last_frame.copy())
+    def infer(self, tasks):
+        """
+        Models compiled for a fixed batch size get chunks of that size (a batch collected before the exported size
+        was known can be larger), the tasks fill the buffer slots in order.
+        """
+        offset = 0
+        while offset < len(tasks):
+            chunk = tasks[offset:offset + (self.static_batch_size or len(tasks))]
+            self.infer_chunk(chunk, offset)
+            offset += len(chunk)
 
-            self.process_batch(batch, tasks)
+    def infer_chunk(self, tasks, offset):
+        # Models compiled for a fixed batch size get the full buffer, the unused slots (zeros or frames of an earlier
+        # batch) are the padding and nothing is copied. Variable batch sizes are inferred as they are
+        size = max(len(tasks), self.static_batch_size or 0)
+        self.padded_frames += size - len(tasks)
+        batch = self.buffer.batch(size, offset)
 
-    def process_batch(self, frames, tasks):
         start_time = time.time()
-        # Yolo expects bgr images when using numpy frames
-        # yolo_results = self.state.yolo_model(frames, conf=YOLO_CONF, verbose=False) # replace with this line for pipeline speed testing
-        yolo_results = self.state.yolo_model.track(frames, persist=YOLO_PERSIST, conf=YOLO_CONF, verbose=False) # , tracker="bytetrack.yaml") # , iou=0.5, show=True
+        # Plain detection, the track ids are assigned by the tracker stage so the tracker can be tuned (and re-run on
+        # the stored detections) without running the model again
+        model = self.state.yolo_model
+        if isinstance(model, SEQUENCE_DETECTORS):
+            # The padding is not in sequence with the frames, it must not take part in the decisions
+            detections = model.detect_batch(batch, conf=YOLO_CONF, count=len(tasks))
+        else:
+            detections = detect_batch(model, batch, conf=YOLO_CONF)
         avg_time = (time.time() - start_time) / len(tasks)  # Use original tasks length, not padded
 
+        if self.batches == 0:
+            self.first_batch_latency = time.perf_counter() - self.started_at
+            log_od.info(
+                f"First YOLO batch done {self.first_batch_latency:.2f} s after the start of the stage "
+                f"({len(tasks) * avg_time:.2f} s inference)"
+            )
+            # The exported batch shape is only known once the model ran
+            self.update_static_batch_size()
+            if self.static_batch_size and self.static_batch_size > self.buffer.capacity:
+                self.buffer = InputBatchBuffer(self.static_batch_size)
+        self.batches += 1
+
         # Only process the actual tasks, ignore padded results
-        for t, result in zip(tasks, yolo_results[:len(tasks)]):
-            t.yolo_results = result
+        for t, d in zip(tasks, detections[:len(tasks)]):
+            t.detections = d.astype(np.float32, copy=False)
             t.duration(str(self.process_type), avg_time)
-            self.finish_task(t)
@@ -6,12 +6,16 @@ from tqdm import tqdm
 
 from script_generator.constants import SEQUENTIAL_MODE, UPDATE_PROGRESS_INTERVAL
 from script_generator.debug.logger import log_od
+from script_generator.debug.pipeline_watchdog import PipelineWatchdog
+from script_generator.debug.resource_sampler import ResourceSampler
+from script_generator.debug.run_history import append_run_record, get_startup_times
+from script_generator.debug.stage_profiler import save_stage_profiles
 from script_generator.gui.messages.messages import ProgressMessage
 from script_generator.state.app_state import AppState
 from script_generator.tasks.data_classes.analyze_video_task import AnalyzeVideoTask
-from script_generator.tasks.workers.abstract_task_processor import TaskProcessorTypes
 from script_generator.utils.data_classes.meta_data import MetaData
 from script_generator.utils.file import check_create_output_folder
+from script_generator.utils.thread_budget import apply_thread_budget, create_thread_budget
 
 if TYPE_CHECKING:
     pass
@@ -22,6 +26,7 @@ def analyze_video(state: AppState):
 
     log_thread_stop_event = threading.Event()
     threads = []
+    resource_sampler = ResourceSampler()
 
     try:
         # make sure the output folder exists for this video
@@ -37,12 +42,19 @@ def analyze_video(state: AppState):
                 log_od.warn("Disabled OpenGL in the pipeline as it's not needed for 2D videos")
                 state.video_reader = "FFmpeg"
 
-            if state.video_info.is_fisheye:
-                log_od.warn("Disabled OpenGL as fisheye is not yet supported with the opengl feature")
-                state.video_reader = "FFmpeg"
-
         use_open_gl = state.video_reader == "FFmpeg + OpenGL (Windows)"
 
+        # Object detection is needed from here on, waits for the background load and warm-up of the model
+        yolo_model = state.yolo_model
+        if yolo_model is None:
+            raise ValueError("The YOLO model is not loaded, make sure a valid model is selected in the settings")
+        if state.yolo_model_loader and state.yolo_model_loader.wait_time is not None:
+            log_od.info(f"Waited {state.yolo_model_loader.wait_time:.2f} s for the YOLO model")
+
+        # Explicit thread counts for ffmpeg, torch and OpenCV so parallel jobs do not oversubscribe the CPU
+        state.thread_budget = create_thread_budget(state.concurrent_jobs)
+        apply_thread_budget(state.thread_budget, yolo_model)
+
         # Create the task
         a = AnalyzeVideoTask(state, use_open_gl)
 
@@ -54,41 +66,38 @@ def analyze_video(state: AppState):
         )
         queue_logging_thread.start()
 
+        # Bottleneck and stall detection, stages are expected to idle while waiting on each other in sequential mode
+        if not SEQUENTIAL_MODE:
+            PipelineWatchdog(a, log_thread_stop_event).start()
+
+        resource_sampler.start()
+
         # Sequential mode can be used to determine performance bottlenecks on very short videos
+        threads = a.graph.workers
         if SEQUENTIAL_MODE:
-            def run_thread(thread, thread_name, out_queue):
-                start_time = time.time()
-                thread.start()
-                thread.join()
-                out_queue.put(None)
-                log_od.info(f"[OBJECT DETECTION] {thread_name} thread done in {time.time() - start_time} s")
-
-            run_thread(a.decode_thread, TaskProcessorTypes.VIDEO, a.opengl_q)
-            if use_open_gl:
-                run_thread(a.opengl_thread, TaskProcessorTypes.OPENGL, a.yolo_q)
-            run_thread(a.yolo_thread, TaskProcessorTypes.YOLO, a.analysis_q)
-            run_thread(a.yolo_analysis_thread, TaskProcessorTypes.YOLO_ANALYSIS, a.result_q)
+            a.graph.run_sequential()
         else:
-            threads = [a.decode_thread, a.opengl_thread, a.yolo_thread, a.yolo_analysis_thread] if use_open_gl else [a.decode_thread, a.yolo_thread, a.yolo_analysis_thread]
-            for thread in threads:
-                thread.start()
-            for thread in threads:
-                thread.join()
+            a.graph.start()
+            a.graph.join()
 
             # Check for exceptions in threads
-            for thread in threads:
-                if thread is not None:
-                    thread.check_exception()
+            a.graph.check_exceptions()
 
         if state.analyze_task:
             state.analyze_task.end_time = time.time()
 
         log_thread_stop_event.set()
+        resource_sampler.stop()
 
         if a.is_stopped:
-            return []
+            return None
+
+        log_performance(state=state, result_sink=a.result_q, resource_sampler=resource_sampler)
+        resource_sampler.save(state)
+        append_run_record(state, a.result_q)
 
-        log_performance(state=state, results_queue=a.result_q)
+        if state.profile_stages:
+            save_stage_profiles(state, a.graph.stages)
 
         if state.update_ui:
             state.update_ui(ProgressMessage(
@@ -100,12 +109,13 @@ def analyze_video(state: AppState):
 
         meta.finish_analyze_video(state)
 
-        return a.result_q.queue
+        return a.result_q
 
     except Exception as e:
         log_od.error(f"An error occurred during video analysis: {e}")
         # Signal all threads to stop and perform cleanup
         log_thread_stop_event.set()
+        resource_sampler.stop()
         for thread in threads:
             if thread is not None and thread.is_alive():
                 thread.join(timeout=1)
@@ -131,15 +141,12 @@ def log_progress(state, analyze_task, stop_event):
             if analyze_task.is_stopped:
                 stop_event.set()
 
-            opengl_size = analyze_task.opengl_q.qsize()
-            yolo_size = analyze_task.yolo_q.qsize()
-            analysis_size = analyze_task.analysis_q.qsize()
+            queue_sizes = analyze_task.graph.queue_sizes()
             frames_processed = analyze_task.result_q.qsize()
 
             progress_bar.n = frames_processed
-            open_gl = f"OpenGL: {opengl_size:>3}, " if state.video_reader == "FFmpeg + OpenGL (Windows)" else ""
             progress_bar.set_postfix_str(
-                f"Q's: {open_gl}YOLO: {yolo_size:>3}, Analysis: {analysis_size:>3}"
+                "Q's: " + ", ".join(f"{name}: {size:>3}" for name, size in queue_sizes.items())
             )
             progress_bar.refresh()
 
@@ -163,10 +170,9 @@ def log_progress(state, analyze_task, stop_event):
 
             time.sleep(UPDATE_PROGRESS_INTERVAL)
 
-def log_performance(state, results_queue):
+def log_performance(state, result_sink, resource_sampler=None):
     analyze_task = state.analyze_task
-    tasks = [task for task in results_queue.queue if hasattr(task, 'profile')]
-    total_frames = len(tasks)
+    total_frames = result_sink.frame_count
 
     total_pipeline_time = analyze_task.end_time - analyze_task.start_time
     video_duration = total_frames / state.video_info.fps
@@ -202,14 +208,7 @@ def log_performance(state, results_queue):
         )
         log_message += f"\n Task Average Times (while running in parallel)\n"
 
-        aggregated_times = {}
-        for task in tasks:
-            for key, total_time in task.profile.items():
-                if key.endswith("_duration"):
-                    if key not in aggregated_times:
-                        aggregated_times[key] = {"total_time": 0, "task_count": 0}
-                    aggregated_times[key]["total_time"] += total_time
-                    aggregated_times[key]["task_count"] += 1
+        aggregated_times = result_sink.get_durations()
 
         # Calculate and format averages for each key
         for key, data in aggregated_times.items():
@@ -220,7 +219,70 @@ def log_performance(state, results_queue):
                 f"{(1 / avg_time if avg_time > 0 else 0):.0f} fps\n"
             )
 
+    log_message += get_startup_summary(state)
+    log_message += get_frame_accounting(state, result_sink)
+    if resource_sampler:
+        log_message += get_resource_summary(resource_sampler)
     log_message += f"{'-' * 60}\n"
 
     for line in log_message.splitlines():
-        log_od.info(line)
\ No newline at end of file
+        log_od.info(line)
+
+
+def get_startup_summary(state):
+    labels = {
+        "model_load": "Model load (background)",
+        "model_warmup": "Model warm-up (background)",
+        "model_wait": "Waited for the model",
+        "first_batch": "First YOLO batch after",
+    }
+    message = f"\n Startup\n"
+    for key, seconds in get_startup_times(state).items():
+        if seconds is not None:
+            message += f"  - {labels[key]:<27}: {seconds:.2f} s\n"
+    return message
+
+
+def get_frame_accounting(state, result_sink):
+    """
+    Compares the frames received, emitted and dropped by every stage with the number of frames in the video so
+    throughput numbers and detection coverage can be trusted.
+    """
+    expected_frames = max(state.video_info.total_frames - (state.frame_start or 0), 0)
+    coverage = (result_sink.frame_count / expected_frames * 100.0) if expected_frames > 0 else 0.0
+
+    message = f"\n Frame accounting (expected {expected_frames} frames)\n"
+    total_dropped = 0
+    for stage in state.analyze_task.graph.stages:
+        worker = stage.worker
+        total_dropped += worker.frames_dropped
+        message += (
+            f"  - {stage.name:<27}: received {worker.frames_received} | "
+            f"emitted {worker.frames_emitted} | dropped {worker.frames_dropped}\n"
+        )
+    message += f"  - {'Detection coverage':<27}: {coverage:.2f} %\n"
+
+    if total_dropped > 0:
+        log_od.warning(f"{total_dropped} frame(s) were dropped during object detection, see the frame accounting below")
+    if result_sink.frame_count != expected_frames:
+        log_od.warning(f"Processed {result_sink.frame_count} frames while the video reports {expected_frames} frames")
+
+    return message
+
+
+
+def get_resource_summary(resource_sampler):
+    labels = {
+        "cpu_total": ("CPU (all cores)", "%"),
+        "process_cpu": ("CPU (this process)", "%"),
+        "ffmpeg_cpu": ("CPU (ffmpeg)", "%"),
+        "rss_mb": ("Memory (RSS)", "MB"),
+        "disk_read_mb_s": ("Disk read", "MB/s"),
+        "gpu_util": ("GPU utilization", "%"),
+    }
+
+    message = f"\n Resource usage (p50 | p95 | max)\n"
+    for key, stats in resource_sampler.summary().items():
+        label, unit = labels[key]
+        message += f"  - {label:<27}: {stats['p50']:.1f} | {stats['p95']:.1f} | {stats['max']:.1f} {unit}\n"
+    return message
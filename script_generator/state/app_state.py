@@ -8,11 +8,14 @@ from script_generator.config.config_manager import ConfigManager
 from script_generator.debug.debug_data import DebugData, get_metrics_file_info
 from script_generator.debug.logger import log
 from script_generator.funscript.util.check_existing_funscript import check_existing_funscript
-from script_generator.object_detection.util.data import load_yolo_model, get_raw_yolo_file_info
+from script_generator.object_detection.util.data import get_raw_yolo_file_info
+from script_generator.object_detection.util.model_loader import YoloModelLoader
+from script_generator.utils.thread_budget import create_thread_budget
 from script_generator.video.data_classes.video_info import VideoInfo, get_video_info
 
 if TYPE_CHECKING:
     from script_generator.tasks.data_classes.analyze_video_task import AnalyzeVideoTask
+    from script_generator.utils.thread_budget import ThreadBudget
 
 class AppState:
     _instance: Optional["AppState"] = None
@@ -45,6 +48,9 @@ class AppState:
         self.ffmpeg_path = c.get("ffmpeg_path")
         self.ffprobe_path = c.get("ffprobe_path")
         self.yolo_model_path = c.get("yolo_model_path")
+        self.cascade_fast_model_path = c.get("cascade_fast_model_path")  # Runs on every frame, the YOLO model only on ambiguous ones (None disables the cascade)
+        self.roi_inference = c.get("roi_inference")  # Infers a crop around the locked penis box between full frame passes
+        self.skip_duplicate_frames = c.get("skip_duplicate_frames")  # Near-duplicate frames reuse the detections of the last inferred frame
 
         # Gui/settings debug
         self.log_level = c.get("log_level")
@@ -53,6 +59,8 @@ class AppState:
         self.live_preview_mode: bool = False
         self.reference_script: string = None
         self.max_preview_fps = 60
+        self.concurrent_jobs: int = 1  # Pipelines running in parallel on this machine, used to split the CPU cores
+        self.thread_budget: Optional["ThreadBudget"] = None
         self.static_debug_frame = None
         self.debug_mode: Literal["funscript", "detection"] = "funscript"
         self.debug_positions: bool = True
@@ -82,6 +90,8 @@ class AppState:
 
         # Cli
         self.use_existing_raw_yolo = False
+        self.profile_stages = False
+        self.profile_top_n = 20
 
         # State
         self.video_info: VideoInfo | None = None
@@ -94,7 +104,22 @@ class AppState:
         self.debug_data = DebugData(self)
         self.update_ui = None
         self.ffmpeg_hwaccel = c.get("ffmpeg_hwaccel")
-        self.yolo_model = load_yolo_model(self.yolo_model_path)
+        self._yolo_model = None
+        self.yolo_model_loader: Optional[YoloModelLoader] = None  # Started by load_yolo (GUI start, object detection)
+
+    @property
+    def yolo_model(self):
+        """
+        The YOLO model, waits for the background load (and warm-up) when it is still running. Only access it when
+        object detection is actually needed.
+        """
+        if self._yolo_model is None and self.yolo_model_loader is not None:
+            self._yolo_model = self.yolo_model_loader.wait()
+        return self._yolo_model
+
+    @yolo_model.setter
+    def yolo_model(self, model):
+        self._yolo_model = model
 
     def set_is_cli(self, cli):
         self.is_cli = cli
@@ -103,8 +128,42 @@ class AppState:
         self.root = root
 
     def load_yolo(self):
-        if self.yolo_model_path and not self.yolo_model:
-            self.yolo_model = load_yolo_model(self.yolo_model_path)
+        """
+        Starts loading the YOLO model in the background unless it is loaded or loading already.
+        """
+        if not self.yolo_model_path or self._yolo_model is not None:
+            return
+        loader = self.yolo_model_loader
+        fast_model_path = self.cascade_fast_model_path if self.cascade_fast_model_path not in ("", self.yolo_model_path) else None
+        if (
+            loader is None
+            or (loader.model_path, loader.fast_model_path, loader.roi_inference) != (self.yolo_model_path, fast_model_path, bool(self.roi_inference))
+            or (loader.is_loaded() and loader.model is None)
+        ):
+            self.yolo_model_loader = YoloModelLoader(
+                self.yolo_model_path, create_thread_budget(self.concurrent_jobs), fast_model_path=fast_model_path,
+                roi_inference=bool(self.roi_inference)
+            ).start()
+
+    def is_yolo_model_available(self):
+        """
+        Whether the YOLO model is loaded or still loading, does not wait for the background load.
+        """
+        loader = self.yolo_model_loader
+        return self._yolo_model is not None or (loader is not None and (not loader.is_loaded() or loader.model is not None))
+
+    def detached_copy(self) -> "AppState":
+        """
+        Creates a copy of the state for the current video that is not registered as the singleton, so the tracking
+        analysis of this video can run in the background while the singleton moves on to the next video.
+        """
+        clone = object.__new__(AppState)
+        clone.__dict__.update(self.__dict__)
+        clone.funscript_data = []
+        clone.funscript_frames = []
+        clone.funscript_distances = []
+        clone.debug_data = DebugData(clone)
+        return clone
 
     def is_configured(self):
         message_prefix = "Cannot process the video."
@@ -113,7 +172,7 @@ class AppState:
             (self.ffprobe_path, f"{message_prefix} FFprobe is missing. Please provide the correct path."),
             (self.ffmpeg_path, f"{message_prefix} FFMPEG is missing. Please provide the correct path."),
             (self.yolo_model_path, f"{message_prefix} YOLO model path not set. Please make sure to download the YOLO model to the models directory and that the path under settings is correct."),
-            (self.yolo_model, f"{message_prefix} YOLO model is not loaded. Please make sure to download the YOLO model to the models directory."),
+            (self.is_yolo_model_available(), f"{message_prefix} YOLO model is not loaded. Please make sure to download the YOLO model to the models directory."),
         ]
 
         for path, error_message in checks:
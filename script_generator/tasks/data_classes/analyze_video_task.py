@@ -1,16 +1,16 @@
-import queue
 import time
 from dataclasses import dataclass, field
 from threading import Lock
 from typing import List, TYPE_CHECKING
 
-from script_generator.constants import QUEUE_MAXSIZE
 from script_generator.tasks.data_classes.abstract_task import Task
+from script_generator.tasks.data_classes.pipeline_graph import PipelineGraph
+from script_generator.tasks.data_classes.result_sink import ResultSink
 
 from script_generator.object_detection.workers.post_process_worker import PostProcessWorker
+from script_generator.object_detection.workers.tracker_worker import TrackerWorker
 from script_generator.object_detection.workers.yolo_worker import YoloWorker
 from script_generator.video.workers.ffmpeg_worker import VideoWorker
-from script_generator.video.workers.vr_to_2d_worker import VrTo2DWorker
 
 if TYPE_CHECKING:
     from script_generator.state.app_state import AppState
@@ -26,18 +26,23 @@ class AnalyzeVideoTask(Task):
         self._lock = Lock()
         self.profile = {}
         self.start_time = time.time()
-        self.opengl_q = queue.Queue(maxsize=QUEUE_MAXSIZE)
-        self.yolo_q = queue.Queue(maxsize=QUEUE_MAXSIZE)
-        self.analysis_q = queue.Queue(maxsize=QUEUE_MAXSIZE)
-        self.result_q = queue.Queue(maxsize=0)
+        self.result_q = ResultSink()  # Aggregates statistics only, finished tasks are not retained
         self.use_open_gl = use_open_gl
         self.is_stopped = False
 
-        # Create threads
-        self.decode_thread = VideoWorker(state=state, output_queue=self.opengl_q if use_open_gl else self.yolo_q)
-        self.opengl_thread = VrTo2DWorker(state=state, input_queue=self.opengl_q, output_queue=self.yolo_q) if use_open_gl else None
-        self.yolo_thread = YoloWorker(state=state, input_queue=self.yolo_q, output_queue=self.analysis_q)
-        self.yolo_analysis_thread = PostProcessWorker(state=state, input_queue=self.analysis_q, output_queue=self.result_q)
+        # Declare the pipeline, additional consumers of the rendered frames (e.g. pose, scene cuts) can be added as
+        # extra stages reading from "rendered", their outputs are joined by frame_pos when listed as post-process inputs
+        graph = PipelineGraph(state)
+        graph.add_channel("results", self.result_q)
+        graph.add_stage("decode", VideoWorker, outputs=["decoded" if use_open_gl else "rendered"])
+        if use_open_gl:
+            # Imports OpenGL, which binds to a platform on import and can't be loaded on every machine
+            from script_generator.video.workers.vr_to_2d_worker import VrTo2DWorker
+            graph.add_stage("opengl", VrTo2DWorker, inputs=["decoded"], outputs=["rendered"])
+        graph.add_stage("yolo", YoloWorker, inputs=["rendered"], outputs=["detections"])
+        graph.add_stage("tracking", TrackerWorker, inputs=["detections"], outputs=["tracks"])
+        graph.add_stage("post_process", PostProcessWorker, inputs=["tracks"], outputs=["results"])
+        self.graph = graph.build()
 
         state.analyze_task = self
 
@@ -52,11 +57,4 @@ class AnalyzeVideoTask(Task):
 
     def stop(self):
         self.is_stopped = True
-        if self.decode_thread:
-            self.decode_thread.release()
-        if self.opengl_thread and self.use_open_gl:
-            self.opengl_thread.stop_process()
-        if self.yolo_thread:
-            self.yolo_thread.stop_process()
-        if self.yolo_analysis_thread:
-            self.yolo_analysis_thread.stop_process()
\ No newline at end of file
+        self.graph.stop()
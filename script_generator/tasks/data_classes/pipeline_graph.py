@@ -0,0 +1,181 @@
+import queue
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Type, TYPE_CHECKING
+
+from script_generator.constants import QUEUE_MAXSIZE
+from script_generator.debug.logger import log_od
+from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor
+from script_generator.tasks.workers.frame_join_worker import FrameJoinWorker, JoinInput
+
+if TYPE_CHECKING:
+    from script_generator.state.app_state import AppState
+
+
+@dataclass
+class Stage:
+    name: str
+    worker_cls: Type[AbstractTaskProcessor]
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    worker: Optional[AbstractTaskProcessor] = None
+
+
+class BroadcastQueue:
+    """
+    Fans a task out to every consumer of a channel. Tasks are shared by reference so a decoded / rendered frame is
+    never copied or decoded twice, consumers must treat the frame as read-only.
+    """
+
+    def __init__(self, queues: List[Any], is_stopped: Callable[[], bool] = lambda: False):
+        self.queues = queues
+        self.is_stopped = is_stopped
+
+    def put(self, item, block=True, timeout=None):
+        # Only the first put may time out, once a consumer has the task every other consumer must receive it as well.
+        # A stalled consumer must not block the producer forever though, the other puts give up once the run stopped
+        self.queues[0].put(item, block, timeout)
+        for q in self.queues[1:]:
+            while True:
+                try:
+                    q.put(item, timeout=1)
+                    break
+                except queue.Full:
+                    if self.is_stopped():
+                        log_od.debug(f"Broadcast to a stalled consumer dropped, the run was stopped")
+                        break
+
+    def qsize(self):
+        return max(q.qsize() for q in self.queues)
+
+
+class PipelineGraph:
+    """
+    Declarative description of the analysis pipeline. Stages declare the channels they read from and write to, the
+    graph creates the queues and wires them together:
+      - a channel read by multiple stages fans out (BroadcastQueue)
+      - a stage reading from multiple channels gets a FrameJoinWorker that joins the branches by frame_pos
+    Stages must be added in topological order (producers before consumers).
+    """
+
+    def __init__(self, state: "AppState"):
+        self.state = state
+        self.stages: List[Stage] = []
+        self.channels: Dict[str, Any] = {}  # channel name -> object the producer writes into
+        self._sinks: Dict[str, Any] = {}
+        self._built = False
+
+    def add_channel(self, name: str, sink):
+        """
+        Registers a terminal channel backed by a custom sink object (anything with put / qsize).
+        """
+        self._sinks[name] = sink
+        return self
+
+    def add_stage(self, name: str, worker_cls: Type[AbstractTaskProcessor], inputs: List[str] = None, outputs: List[str] = None, **kwargs):
+        if self._built:
+            raise RuntimeError("Cannot add stages after the pipeline graph has been built")
+
+        produced = {channel for stage in self.stages for channel in stage.outputs}
+        for channel in inputs or []:
+            if channel not in produced:
+                raise ValueError(f"Stage '{name}' reads from channel '{channel}' which is not produced by an earlier stage")
+
+        self.stages.append(Stage(name=name, worker_cls=worker_cls, inputs=list(inputs or []), outputs=list(outputs or []), kwargs=kwargs))
+        return self
+
+    def build(self):
+        consumers = {}
+        for stage in self.stages:
+            for channel in stage.inputs:
+                consumers.setdefault(channel, []).append(stage)
+
+        # Input queue for every (channel, consumer) edge
+        edges: Dict[str, List[Any]] = {}
+        stage_inputs: Dict[str, queue.Queue] = {}
+        joins: Dict[str, Stage] = {}
+
+        for stage in self.stages:
+            if not stage.inputs:
+                continue
+
+            stage_inputs[stage.name] = queue.Queue(maxsize=QUEUE_MAXSIZE)
+            if len(stage.inputs) == 1:
+                edges.setdefault(stage.inputs[0], []).append(stage_inputs[stage.name])
+            else:
+                join_queue = queue.Queue(maxsize=QUEUE_MAXSIZE)
+                for branch, channel in enumerate(stage.inputs):
+                    edges.setdefault(channel, []).append(JoinInput(join_queue, branch))
+                join = Stage(name=f"{stage.name}_join", worker_cls=FrameJoinWorker, inputs=list(stage.inputs), kwargs={"branches": len(stage.inputs)})
+                join.worker = FrameJoinWorker(state=self.state, input_queue=join_queue, output_queue=stage_inputs[stage.name], branches=len(stage.inputs))
+                joins[stage.name] = join
+
+        # What a producer writes into for each channel
+        for channel in {channel for stage in self.stages for channel in stage.outputs}:
+            targets = edges.get(channel, [])
+            if channel in self._sinks:
+                targets = targets + [self._sinks[channel]]
+            if not targets:
+                raise ValueError(f"Channel '{channel}' has no consumers")
+            self.channels[channel] = targets[0] if len(targets) == 1 else BroadcastQueue(targets, self.is_stopped)
+
+        # Instantiate workers, joins are placed right before the stage they feed
+        ordered = []
+        for stage in self.stages:
+            if not stage.outputs:
+                raise ValueError(f"Stage '{stage.name}' has no output channel")
+            outputs = [self.channels[channel] for channel in stage.outputs]
+            output_queue = outputs[0] if len(outputs) == 1 else BroadcastQueue(outputs, self.is_stopped)
+            stage.worker = stage.worker_cls(state=self.state, input_queue=stage_inputs.get(stage.name), output_queue=output_queue, **stage.kwargs)
+
+            if stage.name in joins:
+                ordered.append(joins[stage.name])
+            ordered.append(stage)
+
+        self.stages = ordered
+        self._built = True
+        return self
+
+    @property
+    def workers(self) -> List[AbstractTaskProcessor]:
+        return [stage.worker for stage in self.stages]
+
+    def get_worker(self, name: str) -> Optional[AbstractTaskProcessor]:
+        return next((stage.worker for stage in self.stages if stage.name == name), None)
+
+    def queue_sizes(self) -> Dict[str, int]:
+        """
+        Current fill level of every channel that is consumed by another stage (excludes terminal sinks).
+        """
+        return {name: channel.qsize() for name, channel in self.channels.items() if name not in self._sinks}
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def join(self, timeout=None):
+        for worker in self.workers:
+            worker.join(timeout)
+
+    def run_sequential(self):
+        """
+        Runs one stage at a time, can be used to determine performance bottlenecks on very short videos.
+        """
+        for stage in self.stages:
+            start_time = time.time()
+            stage.worker.start()
+            stage.worker.join()
+            stage.worker.output_queue.put(None)
+            log_od.info(f"[OBJECT DETECTION] {stage.worker.process_type} thread done in {time.time() - start_time} s")
+
+    def is_stopped(self):
+        return self.state.analyze_task is not None and self.state.analyze_task.is_stopped
+
+    def check_exceptions(self):
+        for worker in self.workers:
+            worker.check_exception()
+
+    def stop(self):
+        for worker in self.workers:
+            worker.release()
@@ -0,0 +1,38 @@
+from threading import Lock
+from typing import Dict, Optional
+
+from script_generator.tasks.data_classes.abstract_task import Task
+
+
+class ResultSink:
+    """
+    Final stage of the analysis pipeline. Mimics the parts of queue.Queue the workers use (put / qsize) but instead of
+    retaining every finished task it only keeps the frame count and running totals of the per stage durations, so
+    memory stays constant regardless of the video length.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.frame_count = 0
+        self.durations: Dict[str, Dict[str, float]] = {}  # {"<stage>_duration": {"total_time": .., "task_count": ..}}
+
+    def put(self, task: Optional[Task], block=True, timeout=None):
+        # Sentinels (None) mark the end of the stream and carry no statistics
+        if task is None:
+            return
+
+        with self._lock:
+            self.frame_count += 1
+            for key, value in task.profile.items():
+                if key.endswith("_duration"):
+                    if key not in self.durations:
+                        self.durations[key] = {"total_time": 0.0, "task_count": 0}
+                    self.durations[key]["total_time"] += value
+                    self.durations[key]["task_count"] += 1
+
+    def qsize(self) -> int:
+        return self.frame_count
+
+    def get_durations(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {key: dict(data) for key, data in self.durations.items()}
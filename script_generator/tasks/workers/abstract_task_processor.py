@@ -1,8 +1,11 @@
+import cProfile
 import queue
 import threading
-from typing import Generator, Optional, TYPE_CHECKING
+import time
+from typing import Callable, Generator, List, Optional, TYPE_CHECKING, Union
 from enum import Enum
 from script_generator.debug.logger import log
+from script_generator.debug.stage_profiler import STAGE_PROFILING_SUPPORTED
 
 if TYPE_CHECKING:
     from script_generator.video.analyse_frame_task import AnalyzeFrameTask
@@ -25,6 +28,17 @@ class AbstractTaskProcessor(threading.Thread):
         self.output_queue = output_queue
         self._stop_event = threading.Event()
         self.exception = None  # Store the exception that occurs in the thread
+        self.profiler: Optional[cProfile.Profile] = None  # Only set when profiling stages (--profile-stages)
+
+        # Accounting used by the pipeline watchdog, busy time = wall time - time spent waiting on the queues
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.wait_time = 0.0
+
+        # Frame accounting, frames are only dropped when the run is stopped (or the task is unusable)
+        self.frames_received = 0
+        self.frames_emitted = 0
+        self.frames_dropped = 0
 
     def log(self, message):
         """
@@ -43,9 +57,13 @@ class AbstractTaskProcessor(threading.Thread):
         if self.input_queue is None:
             raise ValueError("Input queue is None. An input queue must be provided to use get_task().")
 
-        while not self._stop_event.is_set():
+        while not self.is_run_stopped():
             try:
-                task = self.input_queue.get(timeout=1)
+                wait_start = time.perf_counter()
+                try:
+                    task = self.input_queue.get(timeout=1)
+                finally:
+                    self.wait_time += time.perf_counter() - wait_start
 
                 if task is None:
                     self.input_queue.task_done()  # Remove sentinel
@@ -53,42 +71,150 @@ class AbstractTaskProcessor(threading.Thread):
                     self.on_last_item()
                     self.finish_task(None)
                     break
+                self.frames_received += 1
                 yield task
             except queue.Empty:
                 continue
 
+    def get_task_batches(
+            self, max_size: Union[int, Callable[[], int]], max_wait, on_task: Optional[Callable[["AnalyzeFrameTask"], None]] = None
+    ) -> Generator[List["AnalyzeFrameTask"], None, None]:
+        """
+        Like get_task() but yields lists of up to max_size tasks. A batch is flushed as soon as it is full or max_wait
+        seconds after its first task arrived, whichever comes first. The last (partial) batch is yielded before the
+        sentinel is passed on. on_task is called for every task as it arrives, while the batch is still being collected.
+        max_size can be a callable, it is read again for every task (e.g. when the batch size is only known once the
+        model ran).
+        """
+        if self.input_queue is None:
+            raise ValueError("Input queue is None. An input queue must be provided to use get_task_batches().")
+
+        batch = []
+        deadline = None
+        while not self.is_run_stopped():
+            timeout = 1 if deadline is None else deadline - time.perf_counter()
+            wait_start = time.perf_counter()
+            try:
+                task = self.input_queue.get(timeout=timeout) if timeout > 0 else self.input_queue.get_nowait()
+            except queue.Empty:
+                if batch and time.perf_counter() >= deadline:
+                    yield batch
+                    batch, deadline = [], None
+                continue
+            finally:
+                self.wait_time += time.perf_counter() - wait_start
+
+            if task is None:
+                self.input_queue.task_done()  # Remove sentinel
+                if batch:
+                    yield batch
+                    batch = []
+                self.state.analyze_task.end(self.process_type)
+                self.on_last_item()
+                self.finish_task(None)
+                break
+
+            self.frames_received += 1
+            if on_task is not None:
+                on_task(task)
+            batch.append(task)
+            if deadline is None:
+                deadline = time.perf_counter() + max_wait
+            if len(batch) >= (max_size() if callable(max_size) else max_size) or time.perf_counter() >= deadline:
+                yield batch
+                batch, deadline = [], None
+
+        # Stopped while a batch was being collected
+        for task in batch:
+            self.drop_task(task, "the run was stopped")
+
+    def is_run_stopped(self):
+        """
+        This thread was stopped, or the whole run (stopped by the user or failed in any stage).
+        """
+        analyze_task = self.state.analyze_task
+        return self._stop_event.is_set() or (analyze_task is not None and analyze_task.is_stopped)
+
+    def put_output(self, item) -> bool:
+        """
+        Places the item in the output queue, waiting while it is full (backpressure) until the thread or the run is
+        stopped. A stopped run still gets a single non-blocking attempt, so the sentinel reaches consumers with room.
+        """
+        while not self.is_run_stopped():
+            wait_start = time.perf_counter()
+            try:
+                self.output_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+            finally:
+                self.wait_time += time.perf_counter() - wait_start
+
+        try:
+            self.output_queue.put(item, block=False)
+            return True
+        except queue.Full:
+            return False
+
     def finish_task(self, task):
         """
         Finalizes the task by placing it in the output queue.
-        If the queue is full, waits until a spot is available.
+        If the queue is full, waits until a spot is available (backpressure). The task is only dropped when the
+        thread or the run is stopped.
 
         :param task: The task to place in the output queue.
         """
-        while not self._stop_event.is_set():
-            try:
-                self.output_queue.put(task, timeout=1)
-                break
-            except queue.Full:
-                return
+        if task is None:
+            self.put_output(None)
+        elif not self.is_run_stopped() and self.put_output(task):
+            self.frames_emitted += 1
+        else:
+            self.drop_task(task, "the run was stopped")
+
+    def drop_task(self, task, reason):
+        """
+        Accounts for a task that will not be passed on to the next stage.
+        """
+        self.frames_dropped += 1
+        log.debug(f"[{self.process_type}] Dropped frame {getattr(task, 'frame_pos', None)}: {reason}")
 
     def run(self):
         """
         Main thread entry point. Executes the `task_logic` method.
         Catches any exceptions and stores them for the caller.
         """
+        self.started_at = time.perf_counter()
         try:
             self.state.analyze_task.start(self.process_type)
-            self.task_logic()
+            if self.state.profile_stages and STAGE_PROFILING_SUPPORTED:
+                # cProfile only sees the thread it's enabled on so every stage gets its own profiler
+                self.profiler = cProfile.Profile()
+                self.profiler.runcall(self.task_logic)
+            else:
+                self.task_logic()
         except Exception as e:
             self.exception = e  # Capture the exception
+            # Fails the run, otherwise the producers of this stage wait on its full input queue forever
+            if self.state.analyze_task is not None:
+                self.state.analyze_task.is_stopped = True
             # Propagate sentinel to the output queue
-            self.output_queue.put(None)
+            self.put_output(None)
             log.error(f"An error occurred during task execution on thread {self.process_type}: {e}")
             import traceback
             traceback.print_exc()
         finally:
+            self.finished_at = time.perf_counter()
             self._stop_event.set()
 
+    def busy_fps(self) -> float:
+        """
+        Throughput of this stage while it was not waiting on its queues, i.e. the rate it could sustain on its own.
+        """
+        if self.started_at is None:
+            return 0.0
+        busy_time = (self.finished_at or time.perf_counter()) - self.started_at - self.wait_time
+        return self.frames_emitted / busy_time if busy_time > 0 else 0.0
+
     def task_logic(self):
         """
         Abstract method for setup, task processing, and cleanup.
@@ -100,7 +226,14 @@ class AbstractTaskProcessor(threading.Thread):
         self.state.analyze_task.end(self.process_type)
         self.on_last_item()
         # Propagate sentinel to the output queue
-        self.output_queue.put(None)
+        self.put_output(None)
+
+    def release(self):
+        """
+        Stops the worker from the outside (e.g. when the user stops the analysis).
+        Workers holding external resources (processes, contexts) override this.
+        """
+        self.stop_process()
 
     def on_last_item(self):
         return
@@ -118,7 +251,9 @@ class TaskProcessorTypes(Enum):
     OPENGL = "3D to 2D"
     METAL = "3D to 2D (MPS)"
     YOLO = "YOLO inference"
+    TRACKING = "Tracking"
     YOLO_ANALYSIS = "YOLO analysis"
+    JOIN = "Frame join"
 
     def __str__(self):
         return self.value
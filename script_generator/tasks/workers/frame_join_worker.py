@@ -0,0 +1,65 @@
+import queue
+import time
+
+from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
+
+
+class FrameJoinWorker(AbstractTaskProcessor):
+    """
+    Joins the outputs of parallel (fan-out) stages by frame_pos. Every branch writes (branch, task) tuples into the
+    shared input queue, a task is only passed on once all branches have processed it.
+    """
+    process_type = TaskProcessorTypes.JOIN
+
+    def __init__(self, state, output_queue, input_queue=None, branches=2):
+        super().__init__(state=state, output_queue=output_queue, input_queue=input_queue)
+        self.branches = branches
+
+    def task_logic(self):
+        pending = {}  # frame_pos -> [task, arrivals]
+        finished_branches = set()
+
+        while not self.is_run_stopped() and len(finished_branches) < self.branches:
+            wait_start = time.perf_counter()
+            try:
+                branch, task = self.input_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            finally:
+                self.wait_time += time.perf_counter() - wait_start
+
+            # A branch only sends its sentinel once, after its last task
+            if task is None:
+                finished_branches.add(branch)
+                continue
+
+            if task.frame_pos not in pending:
+                self.frames_received += 1
+            entry = pending.setdefault(task.frame_pos, [task, 0])
+            entry[1] += 1
+            if entry[1] >= self.branches:
+                del pending[task.frame_pos]
+                self.finish_task(entry[0])
+
+        # Frames that did not make it through every branch
+        for task, _ in pending.values():
+            self.drop_task(task, "missing from at least one branch")
+
+        self.state.analyze_task.end(self.process_type)
+        self.finish_task(None)
+
+
+class JoinInput:
+    """
+    Queue facade handed to a branch as its output queue, tags every item with the branch index for FrameJoinWorker.
+    """
+
+    def __init__(self, join_queue: queue.Queue, branch: int):
+        self.join_queue = join_queue
+        self.branch = branch
+
+    def put(self, item, block=True, timeout=None):
+        self.join_queue.put((self.branch, item), block, timeout)
+
+    def qsize(self):
+        return self.join_queue.qsize()
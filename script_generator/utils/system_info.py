@@ -0,0 +1,22 @@
+import os
+import platform
+
+import psutil
+import torch
+
+from script_generator.constants import VERSION
+from script_generator.utils.version import get_git_commit
+
+
+def get_machine_info():
+    """Describes the app version and hardware so performance numbers of different machines and commits can be compared."""
+    return {
+        "version": VERSION,
+        "commit": get_git_commit(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "memory_gb": round(psutil.virtual_memory().total / 1024 ** 3, 1),
+        "torch": torch.__version__,
+        "cuda_device": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
+    }
@@ -0,0 +1,91 @@
+import os
+from dataclasses import dataclass
+
+import cv2
+import torch
+
+from script_generator.constants import PIPELINE_THREAD_CORES
+from script_generator.debug.logger import log
+
+
+@dataclass
+class ThreadBudget:
+    """
+    Number of threads every CPU consuming component of one pipeline is allowed to use. The cores are split evenly
+    between the concurrent jobs (folder CLI workers) so parallel pipelines do not oversubscribe the CPU.
+    """
+    cpu_count: int
+    concurrent_jobs: int
+    cores_per_job: int
+    gpu_inference: bool
+    ffmpeg_decode_threads: int
+    ffmpeg_filter_threads: int
+    inference_threads: int  # torch / ONNX Runtime intra-op threads
+    inference_interop_threads: int
+    opencv_threads: int
+
+    def describe(self):
+        return (
+            f"Thread budget: {self.cpu_count} core(s) / {self.concurrent_jobs} job(s) = {self.cores_per_job} per job | "
+            f"ffmpeg decode {self.ffmpeg_decode_threads}, ffmpeg filters {self.ffmpeg_filter_threads}, "
+            f"inference {self.inference_threads} ({'GPU' if self.gpu_inference else 'CPU'}, inter-op {self.inference_interop_threads}), "
+            f"opencv {self.opencv_threads}, pipeline stages {PIPELINE_THREAD_CORES}"
+        )
+
+
+def is_gpu_inference_available():
+    return torch.cuda.is_available() or torch.backends.mps.is_available()
+
+
+def create_thread_budget(concurrent_jobs=1, gpu_inference=None, cpu_count=None) -> ThreadBudget:
+    cpu_count = cpu_count or os.cpu_count() or 1
+    concurrent_jobs = max(1, concurrent_jobs or 1)
+    gpu_inference = is_gpu_inference_available() if gpu_inference is None else gpu_inference
+
+    if concurrent_jobs > cpu_count:
+        log.warning(f"Running {concurrent_jobs} jobs on {cpu_count} core(s), every job gets a single thread per component")
+
+    cores_per_job = max(1, cpu_count // concurrent_jobs)
+
+    # The stage threads themselves (GIL bound python, OpenGL projection, post-processing) get a fixed share
+    available = max(1, cores_per_job - PIPELINE_THREAD_CORES)
+
+    if gpu_inference:
+        # Only pre- and post-processing of the batches runs on the CPU
+        inference_threads = 1 if available < 4 else 2
+    else:
+        inference_threads = max(1, available // 2)
+
+    # Decoding is heavier than the scale / crop / v360 filters
+    media_threads = max(1, available - inference_threads)
+    decode_threads = max(1, round(media_threads * 2 / 3))
+    filter_threads = max(1, media_threads - decode_threads)
+
+    return ThreadBudget(
+        cpu_count=cpu_count,
+        concurrent_jobs=concurrent_jobs,
+        cores_per_job=cores_per_job,
+        gpu_inference=gpu_inference,
+        ffmpeg_decode_threads=decode_threads,
+        ffmpeg_filter_threads=filter_threads,
+        inference_threads=inference_threads,
+        inference_interop_threads=1,
+        opencv_threads=1,
+    )
+
+
+def apply_thread_budget(budget: ThreadBudget, yolo_model=None):
+    """
+    Sizes the thread pools of torch, OpenCV and the ONNX Runtime detector, ffmpeg reads its thread counts from the
+    budget when it is started.
+    """
+    torch.set_num_threads(budget.inference_threads)
+    try:
+        torch.set_num_interop_threads(budget.inference_interop_threads)
+    except RuntimeError:
+        # Can only be set once, before torch ran any parallel work (e.g. the second video in queue mode)
+        pass
+    cv2.setNumThreads(budget.opencv_threads)
+    if hasattr(yolo_model, "set_num_threads"):
+        yolo_model.set_num_threads(budget.inference_threads, budget.inference_interop_threads)
+    log.info(budget.describe())
@@ -1,4 +1,7 @@
 import re
+import subprocess
+
+from script_generator.constants import PROJECT_PATH
 from script_generator.debug.logger import log_fun
 
 
@@ -27,4 +30,14 @@ def version_is_less_than(version_a: str, version_b: str) -> bool:
     parts_a = [int(x) for x in sanitized_a.split('.')]
     parts_b = [int(x) for x in sanitized_b.split('.')]
 
-    return parts_a < parts_b
\ No newline at end of file
+    return parts_a < parts_b
+
+
+def get_git_commit() -> str | None:
+    """
+    Returns the short hash of the checked out commit, or None when not running from a git checkout.
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_PATH, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
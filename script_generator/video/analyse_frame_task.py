@@ -11,5 +11,6 @@ class AnalyzeFrameTask(Task):
     frame_pos: int = -1
     preprocessed_frame: Optional[np.ndarray] = None  # Cropped frame from video stream
     rendered_frame: Optional[np.ndarray] = None  # The final 2D image from OpenGL
-    yolo_results = None
-    # detections: List[Detection] = field(default_factory=list) # YOLO detection results
\ No newline at end of file
+    detections: Optional[np.ndarray] = None  # YOLO detections (x1, y1, x2, y2, conf, cls)
+    tracks: Optional[np.ndarray] = None  # Tracked detections (x1, y1, x2, y2, track id, conf, cls)
+    reused_detections: bool = False  # Near-duplicate of the last inferred frame, its detections and tracks are reused
@@ -23,15 +23,21 @@ def get_ffmpeg_read_cmd(state: AppState, frame_start: int | None, output="-", di
 
     frame_size = width * height * 3  # Size of one frame in bytes
 
+    # Explicit thread counts from the thread budget, all threads when no budget was allocated (e.g. the debug player)
+    budget = state.thread_budget
+    decode_threads = ["-threads", str(budget.ffmpeg_decode_threads)] if budget else ["-threads", "0"]
+    filter_threads = ["-filter_threads", str(budget.ffmpeg_filter_threads)] if budget else []
+
     return [
         state.ffmpeg_path,
         *hwaccel_read,
         '-nostats', '-loglevel', 'warning',
+        *filter_threads,
         "-ss", str(start_time / 1000),  # Seek to start time in seconds
+        *decode_threads,  # Decoder threads (input option)
         "-i", video.path,
         "-an",  # Disable audio processing
         *video_filter,
         "-f", "rawvideo", "-pix_fmt", "bgr24",  # cv2 requires bgr (over rgb) and Yolo expects bgr images when using numpy frames (converts them internally)
-        "-threads", "0", # all threads
         output
     ], frame_size, width, height
\ No newline at end of file
@@ -0,0 +1,188 @@
+import ctypes
+import ctypes.util
+import glob
+import os
+import platform
+import sys
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from script_generator.constants import OPENGL_CONTEXT_BACKEND
+from script_generator.debug.logger import log_vid
+
+VALID_OPENGL_BACKENDS = ["glfw", "egl", "osmesa"]
+
+
+def get_opengl_backend():
+    """
+    Resolves the OpenGL context backend: GLFW (hidden window) when a display is available, EGL on headless machines
+    with a GPU and OSMesa (software rendering, when libOSMesa is installed) otherwise. PYOPENGL_PLATFORM overrides the
+    configured backend.
+    """
+    backend = os.environ.get("PYOPENGL_PLATFORM") or OPENGL_CONTEXT_BACKEND
+    if backend in VALID_OPENGL_BACKENDS:
+        return backend
+
+    if platform.system() != "Linux" or os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"):
+        return "glfw"
+    has_gpu = glob.glob("/dev/dri/renderD*") or os.path.exists("/dev/nvidia0")
+    if has_gpu and ctypes.util.find_library("EGL"):
+        return "egl"
+    if ctypes.util.find_library("OSMesa"):
+        return "osmesa"
+    # Nothing that works without a display, GLFW fails with a clear error once a context is created
+    return "glfw"
+
+
+_opengl_backend: Optional[str] = None
+
+
+def configure_opengl_platform():
+    """
+    Resolves the backend and points PyOpenGL to it. PyOpenGL binds its function pointers to a platform on the first
+    import of OpenGL, so this has to run before any module importing OpenGL is loaded (only the OpenGL reader does).
+    """
+    global _opengl_backend
+    if _opengl_backend is None:
+        _opengl_backend = get_opengl_backend()
+        if _opengl_backend != "glfw":
+            if "OpenGL.GL" in sys.modules and os.environ.get("PYOPENGL_PLATFORM") != _opengl_backend:
+                log_vid.warning(f"OpenGL was imported before the {_opengl_backend} platform was selected")
+            os.environ["PYOPENGL_PLATFORM"] = _opengl_backend
+    return _opengl_backend
+
+
+class OffscreenContext(ABC):
+    """
+    OpenGL context with a default framebuffer of width x height that is never shown.
+    """
+    backend = ""
+
+    @abstractmethod
+    def release(self):
+        pass
+
+
+class GlfwContext(OffscreenContext):
+    backend = "glfw"
+
+    def __init__(self, width, height):
+        import glfw
+        self.glfw = glfw
+
+        # Initialize off-screen GLFW context
+        if not glfw.init():
+            raise RuntimeError("Could not initialize GLFW")
+
+        # Create invisible window
+        glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
+        self.window = glfw.create_window(width, height, "Offscreen", None, None)
+        if not self.window:
+            glfw.terminate()
+            raise RuntimeError("Failed to create GLFW window")
+        glfw.make_context_current(self.window)
+
+    def release(self):
+        self.glfw.destroy_window(self.window)
+        self.glfw.terminate()
+
+
+class EglContext(OffscreenContext):
+    backend = "egl"
+
+    def __init__(self, width, height):
+        from OpenGL import EGL
+        self.egl = EGL
+
+        self.display = self._get_display()
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("Could not initialize EGL")
+
+        config_attributes = to_egl_attributes([
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+            EGL.EGL_DEPTH_SIZE, 24,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE
+        ])
+        config = EGL.EGLConfig()
+        num_configs = EGL.EGLint()
+        if not EGL.eglChooseConfig(self.display, config_attributes, ctypes.pointer(config), 1, ctypes.pointer(num_configs)) or num_configs.value == 0:
+            raise RuntimeError("No EGL config with pbuffer and desktop OpenGL support found")
+
+        surface_attributes = to_egl_attributes([EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE])
+        self.surface = EGL.eglCreatePbufferSurface(self.display, config, surface_attributes)
+        if self.surface == EGL.EGL_NO_SURFACE:
+            EGL.eglTerminate(self.display)
+            raise RuntimeError("Failed to create EGL pbuffer surface")
+
+        # Desktop OpenGL (compatibility profile) for the GLSL 1.20 projection shader (see projection.py), not OpenGL ES
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, None)
+        if not EGL.eglMakeCurrent(self.display, self.surface, self.surface, self.context):
+            raise RuntimeError("Could not make the EGL context current")
+        from OpenGL.GL import GL_RENDERER, glGetString
+        log_vid.info(f"Created EGL {major.value}.{minor.value} context on {glGetString(GL_RENDERER).decode()}")
+
+    def _get_display(self):
+        EGL = self.egl
+        # Without a display server the default display is not available, use the first GPU device directly
+        try:
+            from OpenGL.EGL.EXT.device_enumeration import eglQueryDevicesEXT
+            from OpenGL.EGL.EXT.platform_base import eglGetPlatformDisplayEXT
+            from OpenGL.EGL.EXT.platform_device import EGL_PLATFORM_DEVICE_EXT
+            from OpenGL.raw.EGL._types import EGLDeviceEXT
+
+            devices = (EGLDeviceEXT * 8)()
+            num_devices = EGL.EGLint()
+            if eglQueryDevicesEXT(8, devices, ctypes.pointer(num_devices)) and num_devices.value > 0:
+                display = eglGetPlatformDisplayEXT(EGL_PLATFORM_DEVICE_EXT, devices[0], None)
+                if display != EGL.EGL_NO_DISPLAY:
+                    return display
+        except Exception as e:
+            log_vid.debug(f"EGL device enumeration not available, using the default display: {e}")
+
+        return EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+
+    def release(self):
+        EGL = self.egl
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroySurface(self.display, self.surface)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglTerminate(self.display)
+
+
+class OsMesaContext(OffscreenContext):
+    backend = "osmesa"
+
+    def __init__(self, width, height):
+        from OpenGL import arrays, osmesa
+        from OpenGL.GL import GL_RENDERER, GL_UNSIGNED_BYTE, glGetString
+        self.osmesa = osmesa
+
+        self.context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        if not self.context:
+            raise RuntimeError("Could not create OSMesa context")
+
+        # OSMesa renders into a client side buffer
+        self.buffer = arrays.GLubyteArray.zeros((height, width, 4))
+        if not osmesa.OSMesaMakeCurrent(self.context, self.buffer, GL_UNSIGNED_BYTE, width, height):
+            raise RuntimeError("Could not make the OSMesa context current")
+        log_vid.info(f"Created OSMesa (software) context: {glGetString(GL_RENDERER).decode()}")
+
+    def release(self):
+        self.osmesa.OSMesaDestroyContext(self.context)
+        self.buffer = None
+
+
+def to_egl_attributes(attributes):
+    from OpenGL import EGL
+    return (EGL.EGLint * len(attributes))(*attributes)
+
+
+def create_offscreen_context(width, height) -> OffscreenContext:
+    contexts = {"glfw": GlfwContext, "egl": EglContext, "osmesa": OsMesaContext}
+    backend = configure_opengl_platform()
+    log_vid.info(f"Creating OpenGL context ({backend})")
+    return contexts[backend](width, height)
@@ -0,0 +1,88 @@
+import ctypes
+from typing import List
+
+import numpy as np
+from script_generator.video.opengl import context  # noqa: F401, selects the PyOpenGL platform and has to be imported before OpenGL
+from OpenGL.GL import *
+
+
+class UploadBuffers:
+    """
+    Round-robin pixel unpack buffers. The frames are copied into a buffer and the texture update is sourced from it, so
+    the driver transfers them to the GPU asynchronously instead of blocking on the call. When batching, the frames are
+    stacked vertically in a single texture (frames_per_texture tiles).
+    """
+
+    def __init__(self, count, frames_per_texture=1):
+        self.buffers = list(np.atleast_1d(glGenBuffers(count)))
+        self.index = 0
+        self.frames_per_texture = frames_per_texture
+        self.texture_size = None
+
+    def upload(self, frames: List[np.ndarray], texture_id):
+        frames = [np.ascontiguousarray(frame) for frame in frames]
+        h, w = frames[0].shape[:2]
+        size = sum(frame.nbytes for frame in frames)
+        buffer = self.buffers[self.index]
+        self.index = (self.index + 1) % len(self.buffers)
+
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, buffer)
+        # Orphan the previous storage so the driver doesn't have to wait for a transfer still using it
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, size, None, GL_STREAM_DRAW)
+        address = ctypes.cast(glMapBuffer(GL_PIXEL_UNPACK_BUFFER, GL_WRITE_ONLY), ctypes.c_void_p).value
+        offset = 0
+        for frame in frames:
+            ctypes.memmove(address + offset, frame.ctypes.data, frame.nbytes)
+            offset += frame.nbytes
+        glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+
+        glBindTexture(GL_TEXTURE_2D, texture_id)
+        if self.texture_size != (w, h):
+            # Only (re)allocate the texture storage when the frame size changes
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, w, h * self.frames_per_texture, 0, GL_RGB, GL_UNSIGNED_BYTE, None)
+            self.texture_size = (w, h)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, w, h * len(frames), GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def delete(self):
+        glDeleteBuffers(len(self.buffers), self.buffers)
+
+
+class ReadbackBuffers:
+    """
+    Round-robin pixel pack buffers. start() queues the readback of the current framebuffer and returns immediately,
+    finish() maps the buffer once the GPU is done with it (a few frames later) into a new array.
+    """
+
+    def __init__(self, count, width, height):
+        self.buffers = list(np.atleast_1d(glGenBuffers(count)))
+        self.index = 0
+        self.width = width
+        self.height = height
+        self.size = width * height * 3
+        for buffer in self.buffers:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    def start(self) -> int:
+        buffer_index = self.index
+        self.index = (self.index + 1) % len(self.buffers)
+
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[buffer_index])
+        glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        return buffer_index
+
+    def finish(self, buffer_index) -> np.ndarray:
+        frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[buffer_index])
+        address = ctypes.cast(glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY), ctypes.c_void_p).value
+        ctypes.memmove(frame.ctypes.data, address, self.size)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        return frame
+
+    def delete(self):
+        glDeleteBuffers(len(self.buffers), self.buffers)
@@ -0,0 +1,138 @@
+import numpy as np
+from script_generator.video.opengl import context  # noqa: F401, selects the PyOpenGL platform and has to be imported before OpenGL
+from OpenGL.GL import *
+
+from script_generator.constants import VR_TO_2D_PITCH
+
+# GLSL 1.20 runs on every context backend (including the legacy 2.1 context on macOS)
+VERTEX_SHADER = """
+#version 120
+varying vec2 position;
+
+void main() {
+    position = gl_Vertex.xy;
+    gl_Position = vec4(gl_Vertex.xy, 0.0, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+uniform sampler2D frame;
+uniform bool fisheye;
+uniform vec2 input_fov;     // radians
+uniform float output_range; // stereographic range, tan(d_fov / 4) scaled to the horizontal
+uniform mat3 rotation;
+uniform float tile;         // index of the frame in the vertically stacked texture
+uniform float tiles;
+uniform float half_texel;   // half a texel of a single frame, keeps the lookup inside its tile
+varying vec2 position;
+
+void main() {
+    // Stereographic output with y pointing down like the image rows. The readback is bottom-up so the top of the image
+    // is rendered at the bottom of the viewport and the frame doesn't have to be flipped afterwards
+    vec2 xy = position * output_range;
+    float r = length(xy);
+    float theta = 2.0 * atan(r);
+    vec3 ray = r > 0.0 ? vec3(xy / r * sin(theta), cos(theta)) : vec3(0.0, 0.0, 1.0);
+    ray = rotation * ray;
+
+    vec2 uv;
+    if (fisheye) {
+        // Equidistant fisheye, the distance from the center is proportional to the angle with the optical axis
+        float h = length(ray.xy);
+        vec2 direction = h > 0.0 ? ray.xy / h : vec2(0.0);
+        uv = 0.5 + direction * atan(h, ray.z) / input_fov;
+
+        // Outside the lens
+        if (any(lessThan(uv, vec2(0.0))) || any(greaterThan(uv, vec2(1.0)))) {
+            gl_FragColor = vec4(0.0, 0.0, 0.0, 1.0);
+            return;
+        }
+    } else {
+        // (Half) equirectangular, rays outside the fov repeat the edge like the v360 filter does
+        uv = clamp(0.5 + vec2(atan(ray.x, ray.z), asin(clamp(ray.y, -1.0, 1.0))) / input_fov, 0.0, 1.0);
+    }
+
+    uv.y = (tile + clamp(uv.y, half_texel, 1.0 - half_texel)) / tiles;
+    gl_FragColor = texture2D(frame, uv);
+}
+"""
+
+FULLSCREEN_QUAD = np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype=np.float32)
+
+
+def get_output_range(d_fov, width, height):
+    """
+    Stereographic output range for a diagonal fov, matches ffmpeg's v360 filter so the OpenGL and the FFmpeg reader
+    produce the same view.
+    """
+    return float(np.tan(np.radians(min(d_fov, 359)) / 4) * width / np.hypot(width, height))
+
+
+def get_rotation_matrix(pitch):
+    angle = np.radians(pitch)
+    return np.array([
+        [1, 0, 0],
+        [0, np.cos(angle), -np.sin(angle)],
+        [0, np.sin(angle), np.cos(angle)],
+    ], dtype=np.float32)
+
+
+def compile_shader(source, shader_type):
+    shader = glCreateShader(shader_type)
+    glShaderSource(shader, source)
+    glCompileShader(shader)
+    if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+        raise RuntimeError(f"Could not compile projection shader: {glGetShaderInfoLog(shader)}")
+    return shader
+
+
+class ProjectionShader:
+    """
+    Projects (half) equirectangular and fisheye frames to a flat (stereographic) view per pixel on the GPU, replaces the
+    v360 filter of the FFmpeg reader.
+    """
+
+    def __init__(self, video, width, height, pitch=VR_TO_2D_PITCH, d_fov=None):
+        vertex_shader = compile_shader(VERTEX_SHADER, GL_VERTEX_SHADER)
+        fragment_shader = compile_shader(FRAGMENT_SHADER, GL_FRAGMENT_SHADER)
+        self.program = glCreateProgram()
+        glAttachShader(self.program, vertex_shader)
+        glAttachShader(self.program, fragment_shader)
+        glLinkProgram(self.program)
+        if not glGetProgramiv(self.program, GL_LINK_STATUS):
+            raise RuntimeError(f"Could not link projection shader: {glGetProgramInfoLog(self.program)}")
+        glDeleteShader(vertex_shader)
+        glDeleteShader(fragment_shader)
+
+        # Same parameters as the v360 filter of the FFmpeg reader (see get_vr_video_filters)
+        input_fov = np.radians(video.fov)
+        d_fov = d_fov or video.fov
+
+        glUseProgram(self.program)
+        glUniform1i(self._location("frame"), 0)
+        glUniform1i(self._location("fisheye"), int(video.is_fisheye))
+        glUniform2f(self._location("input_fov"), input_fov, input_fov)
+        glUniform1f(self._location("output_range"), get_output_range(d_fov, width, height))
+        glUniformMatrix3fv(self._location("rotation"), 1, GL_TRUE, get_rotation_matrix(pitch))
+        self.tile_location = self._location("tile")
+        self.tiles_location = self._location("tiles")
+        self.half_texel_location = self._location("half_texel")
+
+    def _location(self, name):
+        return glGetUniformLocation(self.program, name)
+
+    def set_frames(self, tiles, frame_height):
+        glUniform1f(self.tiles_location, tiles)
+        glUniform1f(self.half_texel_location, 0.5 / frame_height)
+
+    def draw(self, tile):
+        glUniform1f(self.tile_location, tile)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, FULLSCREEN_QUAD)
+        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+    def delete(self):
+        glUseProgram(0)
+        glDeleteProgram(self.program)
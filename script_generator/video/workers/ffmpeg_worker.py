@@ -28,7 +28,7 @@ class VideoWorker(AbstractTaskProcessor):
         current_frame = self.state.frame_start
 
         try:
-            while self.read_frames:
+            while self.read_frames and not self.is_run_stopped():
                 in_bytes = self.process.stdout.read(frame_size)
                 if not in_bytes:
                     if current_frame == self.state.frame_start:
@@ -39,6 +39,7 @@ class VideoWorker(AbstractTaskProcessor):
                         log_vid.info("FFMPEG received last frame")
                     break
 
+                self.frames_received += 1
                 task = AnalyzeFrameTask(frame_pos=current_frame)
                 frame = np.frombuffer(in_bytes, np.uint8).reshape([height, width, 3])
 
@@ -1,97 +1,131 @@
-import glfw
-import numpy as np
-from OpenGL.GL import *
-from OpenGL.GLU import *
+import threading
+from collections import deque
 
-from script_generator.constants import RENDER_RESOLUTION, VR_TO_2D_PITCH
+from script_generator.video.opengl.context import configure_opengl_platform, create_offscreen_context
+
+# Before the first import of OpenGL, this module is only loaded when the OpenGL reader is used
+configure_opengl_platform()
+from OpenGL.GL import *  # noqa: E402
+
+from script_generator.constants import OPENGL_BATCH_SIZE, OPENGL_PBO_COUNT, RENDER_RESOLUTION
+from script_generator.debug.logger import log_vid
 from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor, TaskProcessorTypes
-from script_generator.video.opengl.helpers import create_180_dome, render_dome
+from script_generator.video.opengl.helpers import create_tile_framebuffer, delete_tile_framebuffer
+from script_generator.video.opengl.pixel_buffers import ReadbackBuffers, UploadBuffers
+from script_generator.video.opengl.projection import ProjectionShader
 
 
 class VrTo2DWorker(AbstractTaskProcessor):
     process_type = TaskProcessorTypes.OPENGL
 
+    def __init__(self, *args, batch_size=OPENGL_BATCH_SIZE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_size = batch_size
+        self.batch = []  # Tasks waiting for a full batch
+        self.in_flight = deque()  # (tasks, readback buffer index), batches rendered but not read back yet
+        self.upload = None
+        self.readback = None
+        self.texture_id = None
+        self.projection = None
+
     def task_logic(self):
 
-        # Initialize off-screen GLFW context
-        if not glfw.init():
-            raise RuntimeError("Could not initialize GLFW")
+        # Off-screen context: hidden GLFW window, or EGL / OSMesa on headless machines
+        context = create_offscreen_context(RENDER_RESOLUTION, RENDER_RESOLUTION)
 
-        # Create invisible window
-        glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
-        window = glfw.create_window(RENDER_RESOLUTION, RENDER_RESOLUTION, "Offscreen", None, None)
-        if not window:
-            glfw.terminate()
-            raise RuntimeError("Failed to create GLFW window")
-        glfw.make_context_current(window)
+        # Batches are rendered as vertically stacked tiles into an offscreen framebuffer, a single frame uses the default one
+        max_tiles = min(glGetIntegerv(GL_MAX_RENDERBUFFER_SIZE), glGetIntegerv(GL_MAX_TEXTURE_SIZE), glGetIntegerv(GL_MAX_VIEWPORT_DIMS)[1]) // RENDER_RESOLUTION
+        if self.batch_size > max_tiles:
+            log_vid.warning(f"OpenGL batch size {self.batch_size} exceeds the framebuffer limit of this GPU, using {max_tiles}")
+            self.batch_size = max_tiles
+        self.batch_size = max(1, self.batch_size)
+        framebuffer = create_tile_framebuffer(RENDER_RESOLUTION, RENDER_RESOLUTION * self.batch_size) if self.batch_size > 1 else None
 
         # OpenGL config
-        glEnable(GL_TEXTURE_2D)
         glClearColor(0.0, 0.0, 0.0, 1.0)
-        glEnable(GL_DEPTH_TEST)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
 
-        # Projection matrix setup
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
-        gluPerspective(90, 1.0, 0.1, 100.0)
-        glMatrixMode(GL_MODELVIEW)
-        glLoadIdentity()
-
-        dome_vertices, dome_tex_coords, dome_indices = create_180_dome()
+        # Per pixel (half) equirectangular / fisheye lookup, same view as the v360 filter of the FFmpeg reader
+        self.projection = ProjectionShader(self.state.video_info, RENDER_RESOLUTION, RENDER_RESOLUTION)
 
         # Create texture ID
-        texture_id = glGenTextures(1)
-
-        # Create a display list for the dome geometry
-        dome_display_list = glGenLists(1)
-        glNewList(dome_display_list, GL_COMPILE)
-        render_dome(dome_vertices, dome_tex_coords, dome_indices, None)
-        glEndList()
-
-        # Render to off-screen buffer
-        glViewport(0, 0, RENDER_RESOLUTION, RENDER_RESOLUTION)
-        glLoadIdentity()
-        # the 3th parameter will zoom in and out to increase / decrease the FOV
-        gluLookAt(0, 0, 0.5, 0, 0, -1, 0, 1, 0)
-        glRotatef(0, 0, 1, 0)
-        glRotatef(-(VR_TO_2D_PITCH + 90), 1, 0, 0)
-
-        glBindTexture(GL_TEXTURE_2D, texture_id)
+        self.texture_id = glGenTextures(1)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.texture_id)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+
+        # Batch N is uploaded and drawn while the readbacks of the previous batches are still in flight
+        self.upload = UploadBuffers(OPENGL_PBO_COUNT, frames_per_texture=self.batch_size)
+        self.readback = ReadbackBuffers(OPENGL_PBO_COUNT, RENDER_RESOLUTION, RENDER_RESOLUTION * self.batch_size)
 
         for task in self.get_task():
             task.start(str(self.process_type))
+            self.batch.append(task)
+            if len(self.batch) >= self.batch_size:
+                self.render_batch()
 
-            # Upload to texture
-            h, w, _ = task.preprocessed_frame.shape
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, w, h, 0, GL_RGB, GL_UNSIGNED_BYTE, task.preprocessed_frame)
+        # Frames still waiting or in flight when the run was stopped
+        for task in self.batch:
+            self.drop_task(task, "the run was stopped")
+        while self.in_flight:
+            for task in self.in_flight.popleft()[0]:
+                self.drop_task(task, "the run was stopped")
 
-            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-            glBindTexture(GL_TEXTURE_2D, texture_id)
-            glCallList(dome_display_list)
-
-            # Read pixels
-            pixels = glReadPixels(0, 0, RENDER_RESOLUTION, RENDER_RESOLUTION, GL_RGB, GL_UNSIGNED_BYTE)
-            rendered_frame = np.frombuffer(pixels, dtype=np.uint8).reshape(
-                RENDER_RESOLUTION, RENDER_RESOLUTION, 3
-            )
-            rendered_frame = np.flipud(rendered_frame)
-
-            # Store result
-            task.rendered_frame = rendered_frame
+        # Cleanup
+        self.upload.delete()
+        self.readback.delete()
+        if framebuffer:
+            delete_tile_framebuffer(*framebuffer)
+        self.projection.delete()
+        glDeleteTextures([self.texture_id])
+        context.release()
+
+    def render_batch(self):
+        tasks, self.batch = self.batch, []
+
+        # Upload to texture (one tile per frame)
+        frame_height = tasks[0].preprocessed_frame.shape[0]
+        self.upload.upload([task.preprocessed_frame for task in tasks], self.texture_id)
+        for task in tasks:
             task.preprocessed_frame = None
 
+        glClear(GL_COLOR_BUFFER_BIT)
+        glBindTexture(GL_TEXTURE_2D, self.texture_id)
+        self.projection.set_frames(self.batch_size, frame_height)
+        for tile in range(len(tasks)):
+            # Every tile samples its own frame from the stacked texture
+            glViewport(0, tile * RENDER_RESOLUTION, RENDER_RESOLUTION, RENDER_RESOLUTION)
+            self.projection.draw(tile)
+
+        # Queue the readback of all tiles, the oldest batch in flight is collected once all buffers are in use
+        self.in_flight.append((tasks, self.readback.start()))
+        if len(self.in_flight) >= OPENGL_PBO_COUNT:
+            self.finish_rendered_batch()
+
+    def finish_rendered_batch(self):
+        tasks, buffer_index = self.in_flight.popleft()
+
+        # A single transfer for the whole batch, every task gets a (zero-copy) view on its tile
+        tiles = self.readback.finish(buffer_index).reshape(self.batch_size, RENDER_RESOLUTION, RENDER_RESOLUTION, 3)
+        for tile, task in enumerate(tasks):
+            task.rendered_frame = tiles[tile]
             task.end(str(self.process_type))
 
             # Debug
             # output_path = os.path.join(DEBUG_PATH, f"frame_{task.id:05d}.png")
-            # imageio.imwrite(output_path, rendered_frame)
+            # imageio.imwrite(output_path, task.rendered_frame)
 
             self.finish_task(task)
 
-        # Cleanup
-        glDeleteLists(dome_display_list, 1)
-        glDeleteTextures([texture_id])
-        glfw.destroy_window(window)
-        glfw.terminate()
+    def on_last_item(self):
+        # Render the last partial batch and drain the batches in flight before the sentinel is passed on, only the
+        # render thread owns the GL context
+        if threading.current_thread() is self:
+            if self.batch:
+                self.render_batch()
+            while self.in_flight:
+                self.finish_rendered_batch()
@@ -0,0 +1,155 @@
+import queue
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from script_generator.benchmark.stage_benchmark import BenchmarkTask
+from script_generator.object_detection.util.inference import InputBatchBuffer
+from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor
+from script_generator.video.analyse_frame_task import AnalyzeFrameTask
+
+
+class BatchingWorker(AbstractTaskProcessor):
+    process_type = "batching"
+
+    def __init__(self, *args, max_size, max_wait, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.batches = []
+        self.arrived = []
+
+    def task_logic(self):
+        for tasks in self.get_task_batches(self.max_size, self.max_wait, on_task=lambda task: self.arrived.append(task.frame_pos)):
+            self.batches.append([task.frame_pos for task in tasks])
+            for task in tasks:
+                self.finish_task(task)
+
+
+def create_worker(max_size, max_wait):
+    state = SimpleNamespace(profile_stages=False, analyze_task=BenchmarkTask())
+    return BatchingWorker(state=state, input_queue=queue.Queue(), output_queue=queue.Queue(), max_size=max_size, max_wait=max_wait)
+
+
+def drain(output_queue):
+    items = []
+    while not output_queue.empty():
+        task = output_queue.get_nowait()
+        items.append(task.frame_pos if task is not None else None)
+    return items
+
+
+def test_batches_flush_when_full():
+    worker = create_worker(max_size=4, max_wait=10)
+    for frame_pos in range(8):
+        worker.input_queue.put(AnalyzeFrameTask(frame_pos=frame_pos))
+    worker.input_queue.put(None)
+
+    start = time.perf_counter()
+    worker.task_logic()
+
+    assert time.perf_counter() - start < 1  # Full batches never wait for max_wait
+    assert worker.batches == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert worker.arrived == list(range(8))
+
+
+def test_last_partial_batch_before_sentinel():
+    worker = create_worker(max_size=4, max_wait=10)
+    for frame_pos in range(10):
+        worker.input_queue.put(AnalyzeFrameTask(frame_pos=frame_pos))
+    worker.input_queue.put(None)
+
+    worker.task_logic()
+
+    assert worker.batches == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    # The sentinel is passed on after the frames of the last batch
+    assert drain(worker.output_queue) == [*range(10), None]
+    assert worker.frames_received == worker.frames_emitted == 10
+
+
+def test_batches_flush_after_max_wait():
+    worker = create_worker(max_size=8, max_wait=0.05)
+    for frame_pos in range(3):
+        worker.input_queue.put(AnalyzeFrameTask(frame_pos=frame_pos))
+    worker.start()
+
+    # The decoder is slow, the partial batch is flushed without the sentinel
+    flushed = [worker.output_queue.get(timeout=2).frame_pos for _ in range(3)]
+    assert flushed == [0, 1, 2]
+
+    worker.input_queue.put(AnalyzeFrameTask(frame_pos=3))
+    worker.input_queue.put(None)
+    worker.join(timeout=5)
+    worker.check_exception()
+
+    assert not worker.is_alive()
+    assert worker.batches == [[0, 1, 2], [3]]
+    assert drain(worker.output_queue) == [3, None]
+
+
+def test_batch_size_is_read_for_every_batch():
+    worker = create_worker(max_size=lambda: 2 if worker.batches else 4, max_wait=10)  # Drops once the model ran
+    for frame_pos in range(8):
+        worker.input_queue.put(AnalyzeFrameTask(frame_pos=frame_pos))
+    worker.input_queue.put(None)
+
+    worker.task_logic()
+
+    assert worker.batches == [[0, 1, 2, 3], [4, 5], [6, 7]]
+
+
+def create_frame(value):
+    frame = np.empty((2, 2, 3), dtype=np.uint8)
+    frame[..., 0], frame[..., 1], frame[..., 2] = value, value + 1, value + 2  # BGR
+    return frame
+
+
+def frame_values(batch):
+    """Blue value of every slot, identifies the written frame."""
+    return [round(float(slot[2, 0, 0]) * 255) for slot in batch]
+
+
+def test_input_batch_buffer_write():
+    buffer = InputBatchBuffer(2, height=2, width=2)
+    buffer.write(create_frame(100))
+
+    slot = buffer.tensor[0].numpy()
+    np.testing.assert_allclose(slot[:, 0, 0], np.array([102, 101, 100]) / 255, rtol=1e-6)  # RGB
+    assert buffer.size == 1
+    assert not buffer.tensor[1].any()
+
+
+def test_input_batch_buffer_batch_offsets():
+    buffer = InputBatchBuffer(4, height=2, width=2)
+    for value in (10, 20, 30, 40):
+        buffer.write(create_frame(value))
+
+    assert frame_values(buffer.batch(2)) == [10, 20]
+    # Within the capacity the slots are returned in place
+    batch = buffer.batch(2, offset=2)
+    assert frame_values(batch) == [30, 40]
+    assert batch.data_ptr() == buffer.tensor[2].data_ptr()
+
+
+def test_input_batch_buffer_batch_compacts_past_capacity():
+    buffer = InputBatchBuffer(4, height=2, width=2)
+    for value in (10, 20, 30, 40):
+        buffer.write(create_frame(value))
+
+    # Static batches of 3: the second one would run past the end, the frame from the offset on is moved to the front
+    assert frame_values(buffer.batch(3)) == [10, 20, 30]
+    batch = buffer.batch(3, offset=3)
+    assert len(batch) == 3
+    assert batch.data_ptr() == buffer.tensor.data_ptr()
+    assert frame_values(batch[:1]) == [40]
+
+
+if __name__ == "__main__":
+    test_batches_flush_when_full()
+    test_last_partial_batch_before_sentinel()
+    test_batches_flush_after_max_wait()
+    test_batch_size_is_read_for_every_batch()
+    test_input_batch_buffer_write()
+    test_input_batch_buffer_batch_offsets()
+    test_input_batch_buffer_batch_compacts_past_capacity()
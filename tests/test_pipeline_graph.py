@@ -0,0 +1,152 @@
+import queue
+from types import SimpleNamespace
+
+from script_generator.benchmark.stage_benchmark import BenchmarkTask
+from script_generator.tasks.data_classes.pipeline_graph import BroadcastQueue, PipelineGraph
+from script_generator.tasks.data_classes.result_sink import ResultSink
+from script_generator.tasks.workers.abstract_task_processor import AbstractTaskProcessor
+from script_generator.tasks.workers.frame_join_worker import FrameJoinWorker
+from script_generator.video.analyse_frame_task import AnalyzeFrameTask
+
+FRAMES = 50
+
+
+def create_state():
+    return SimpleNamespace(profile_stages=False, analyze_task=BenchmarkTask())
+
+
+class SourceWorker(AbstractTaskProcessor):
+    process_type = "source"
+
+    def task_logic(self):
+        for frame_pos in range(FRAMES):
+            self.finish_task(AnalyzeFrameTask(frame_pos=frame_pos))
+        self.state.analyze_task.end(self.process_type)
+        self.finish_task(None)
+
+
+class BranchA(AbstractTaskProcessor):
+    process_type = "branch_a"
+
+    def task_logic(self):
+        for task in self.get_task():
+            task.duration(self.process_type, 1.0)
+            self.finish_task(task)
+
+
+class BranchB(BranchA):
+    process_type = "branch_b"
+
+
+def test_add_stage_requires_earlier_producer():
+    graph = PipelineGraph(create_state())
+    try:
+        graph.add_stage("a", BranchA, inputs=["frames"], outputs=["a"])
+    except ValueError as e:
+        assert "frames" in str(e)
+    else:
+        raise AssertionError("Reading a channel nobody produces must fail")
+
+
+def test_build_rejects_channel_without_consumers():
+    graph = PipelineGraph(create_state()).add_stage("source", SourceWorker, outputs=["frames"])
+    try:
+        graph.build()
+    except ValueError as e:
+        assert "frames" in str(e)
+    else:
+        raise AssertionError("A channel without consumers must fail the build")
+
+
+def test_build_rejects_stage_without_output():
+    graph = (
+        PipelineGraph(create_state())
+        .add_stage("source", SourceWorker, outputs=["frames"])
+        .add_stage("a", BranchA, inputs=["frames"])
+    )
+    try:
+        graph.build()
+    except ValueError as e:
+        assert "'a'" in str(e)
+    else:
+        raise AssertionError("A stage without output channel must fail the build")
+
+
+def test_add_stage_after_build():
+    graph = PipelineGraph(create_state()).add_channel("frames", ResultSink()).add_stage("source", SourceWorker, outputs=["frames"]).build()
+    try:
+        graph.add_stage("a", BranchA, inputs=["frames"], outputs=["a"])
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("Stages cannot be added once the graph is built")
+
+
+def test_fan_out_and_join():
+    sink = ResultSink()
+    graph = (
+        PipelineGraph(create_state())
+        .add_channel("results", sink)
+        .add_stage("source", SourceWorker, outputs=["frames"])
+        .add_stage("a", BranchA, inputs=["frames"], outputs=["a"])
+        .add_stage("b", BranchB, inputs=["frames"], outputs=["b"])
+        .add_stage("merge", BranchA, inputs=["a", "b"], outputs=["results"])
+        .build()
+    )
+
+    assert [stage.name for stage in graph.stages] == ["source", "a", "b", "merge_join", "merge"]
+    assert isinstance(graph.channels["frames"], BroadcastQueue)
+    assert isinstance(graph.get_worker("merge_join"), FrameJoinWorker)
+
+    graph.start()
+    graph.join(timeout=30)
+    graph.check_exceptions()
+
+    assert not any(worker.is_alive() for worker in graph.workers)
+    assert sink.frame_count == FRAMES
+    durations = sink.get_durations()
+    # Every frame went through both branches, the join passed each on once
+    assert durations["branch_a_duration"]["task_count"] == FRAMES
+    assert durations["branch_b_duration"]["task_count"] == FRAMES
+    assert graph.get_worker("merge_join").frames_emitted == FRAMES
+
+
+def test_broadcast_gives_up_on_stalled_consumer_once_stopped():
+    first, stalled = queue.Queue(), queue.Queue(maxsize=1)
+    stalled.put("full")
+    broadcast = BroadcastQueue([first, stalled], is_stopped=lambda: True)
+
+    broadcast.put("task")  # Returns after a single timeout instead of waiting for the stalled consumer
+    assert first.get_nowait() == "task"
+    assert stalled.qsize() == 1
+
+
+def test_frame_join_worker_joins_by_frame_pos():
+    join_queue, output_queue = queue.Queue(), queue.Queue()
+    tasks = {frame_pos: AnalyzeFrameTask(frame_pos=frame_pos) for frame_pos in range(4)}
+    # The branches finish the frames in a different order, frame 3 never leaves branch 1
+    for branch, frame_pos in [(0, 0), (0, 1), (1, 1), (0, 2), (0, 3), (1, 0), (1, 2)]:
+        join_queue.put((branch, tasks[frame_pos]))
+    join_queue.put((0, None))
+    join_queue.put((1, None))
+
+    worker = FrameJoinWorker(state=create_state(), input_queue=join_queue, output_queue=output_queue, branches=2)
+    worker.task_logic()
+
+    joined = []
+    while (task := output_queue.get_nowait()) is not None:
+        joined.append(task.frame_pos)
+    assert joined == [1, 0, 2]
+    assert worker.frames_received == 4
+    assert worker.frames_emitted == 3
+    assert worker.frames_dropped == 1
+
+
+if __name__ == "__main__":
+    test_add_stage_requires_earlier_producer()
+    test_build_rejects_channel_without_consumers()
+    test_build_rejects_stage_without_output()
+    test_add_stage_after_build()
+    test_fan_out_and_join()
+    test_broadcast_gives_up_on_stalled_consumer_once_stopped()
+    test_frame_join_worker_joins_by_frame_pos()
@@ -0,0 +1,64 @@
+import gc
+import threading
+import weakref
+
+from script_generator.tasks.data_classes.result_sink import ResultSink
+from script_generator.video.analyse_frame_task import AnalyzeFrameTask
+
+
+def create_task(frame_pos, **durations):
+    task = AnalyzeFrameTask(frame_pos=frame_pos)
+    task.profile.update({f"{stage}_duration": duration for stage, duration in durations.items()})
+    task.profile["yolo_start"] = 1000.0  # Only the durations are aggregated
+    return task
+
+
+def test_result_sink_aggregates_durations():
+    sink = ResultSink()
+    sink.put(create_task(0, yolo=0.5, tracking=0.25))
+    sink.put(create_task(1, yolo=1.5))
+    sink.put(None)  # Sentinel
+
+    assert sink.frame_count == 2
+    assert sink.qsize() == 2
+    assert sink.get_durations() == {
+        "yolo_duration": {"total_time": 2.0, "task_count": 2},
+        "tracking_duration": {"total_time": 0.25, "task_count": 1},
+    }
+
+
+def test_result_sink_does_not_retain_tasks():
+    sink = ResultSink()
+    task = create_task(0, yolo=1.0)
+    task_ref = weakref.ref(task)
+    sink.put(task)
+    del task
+    gc.collect()
+    assert task_ref() is None
+
+    durations = sink.get_durations()
+    durations["yolo_duration"]["total_time"] = 0.0  # A copy, the running totals are not affected
+    assert sink.get_durations()["yolo_duration"]["total_time"] == 1.0
+
+
+def test_result_sink_concurrent_puts():
+    sink = ResultSink()
+
+    def produce():
+        for i in range(1000):
+            sink.put(create_task(i, yolo=0.001))
+
+    threads = [threading.Thread(target=produce) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sink.frame_count == 4000
+    assert sink.get_durations()["yolo_duration"]["task_count"] == 4000
+
+
+if __name__ == "__main__":
+    test_result_sink_aggregates_durations()
+    test_result_sink_does_not_retain_tasks()
+    test_result_sink_concurrent_puts()
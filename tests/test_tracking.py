@@ -0,0 +1,161 @@
+import msgpack
+import numpy as np
+
+from script_generator.object_detection.util.tracking import (
+    DETECTION_RECORD_DTYPE, TRACKED_RECORD_DTYPE, RecordBuffer, create_tracker, quantize_detections, to_detection_array,
+    to_detection_records, to_record_lists, to_tracked_array, to_tracked_records, track_detection_records, update_tracker,
+    xyxy_to_xywh
+)
+
+FRAMES = 120
+
+
+def create_detections(seed=0):
+    """
+    Two objects drifting over the frame with jittery boxes and confidences, x1, y1, x2, y2, conf, cls per frame.
+    Some frames have no detections.
+    """
+    rng = np.random.default_rng(seed)
+    centers = np.array([[200.0, 300.0], [400.0, 350.0]])
+    detections = []
+    for frame_pos in range(FRAMES):
+        centers += rng.normal(0, 3, centers.shape)
+        if frame_pos % 25 == 24:
+            detections.append(np.zeros((0, 6), dtype=np.float32))
+            continue
+        frame = []
+        for (x, y), cls, size in zip(centers, (0, 4), (80, 40)):
+            w, h = size + rng.normal(0, 2, 2)
+            frame.append([x - w / 2, y - h / 2, x + w / 2, y + h / 2, rng.uniform(0.3, 0.95), cls])
+        detections.append(np.array(frame, dtype=np.float32))
+    return detections
+
+
+def run_pipeline(detections, reused_frames=()):
+    """
+    Tracks the detections like the tracker worker and records them like the post process worker, returns the raw
+    detections and raw YOLO records as they are stored (msgpack).
+    """
+    tracker = create_tracker()
+    detection_records, tracked_records = [], []
+    previous_detections, previous_tracks = None, None
+    for frame_pos, frame in enumerate(detections):
+        if frame_pos in reused_frames and previous_detections is not None:
+            frame, tracks = previous_detections, previous_tracks
+        else:
+            frame = quantize_detections(frame)
+            tracks = update_tracker(tracker, frame)
+        previous_detections, previous_tracks = frame, tracks
+        detection_records.extend(to_detection_records(frame_pos, frame))
+        tracked_records.extend(to_tracked_records(frame_pos, tracks))
+
+    def store(records):
+        return msgpack.unpackb(msgpack.packb(records))
+
+    return store(detection_records), store(tracked_records)
+
+
+def test_retracking_reproduces_the_pipeline():
+    detection_records, tracked_records = run_pipeline(create_detections())
+
+    assert len({record[-1] for record in tracked_records}) >= 2
+    assert track_detection_records(detection_records) == tracked_records
+
+
+def test_retracking_with_reused_frames():
+    reused_frames = set(range(10, FRAMES, 7))
+    detection_records, tracked_records = run_pipeline(create_detections(seed=1), reused_frames)
+
+    assert track_detection_records(detection_records, reused_frames=reused_frames) == tracked_records
+
+
+def test_quantize_detections():
+    detections = np.array([[10.123456, 20.987654, 30.5, 40.004999, 0.876543, 3]], dtype=np.float32)
+    quantized = quantize_detections(detections)
+
+    assert quantized.dtype == np.float32
+    np.testing.assert_allclose(quantized[0], [10.12, 20.99, 30.5, 40.0, 0.877, 3], atol=1e-6)
+    # Stored and re-read detections are quantized already
+    np.testing.assert_array_equal(quantize_detections(quantized), quantized)
+    assert quantize_detections([]).shape == (0, 6)
+
+
+def to_tracked_records_per_track(frame_pos, tracks):
+    """
+    Conversion of the post process worker before the records were built per batch.
+    """
+    records = []
+    xywh = xyxy_to_xywh(tracks[:, :4]).astype(np.int32)
+    for (x, y, w, h), track in zip(xywh.tolist(), tracks.tolist()):
+        records.append([frame_pos, int(track[6]), round(track[5], 1), x - w // 2, y - h // 2, x + w // 2, y + h // 2, int(track[4])])
+    return records
+
+
+def create_tracks(seed=0):
+    """
+    Tracks (x1, y1, x2, y2, track id, conf, cls) of a few frames, including odd box sizes and a frame without tracks.
+    """
+    rng = np.random.default_rng(seed)
+    tracks = []
+    for count in (3, 0, 1, 5):
+        boxes = rng.uniform(0, 640, (count, 2))
+        sizes = rng.uniform(1, 200, (count, 2))
+        track = np.column_stack([boxes, boxes + sizes, rng.integers(1, 20, count), rng.uniform(0, 1, count), rng.integers(0, 10, count)])
+        tracks.append(track.astype(np.float32))
+    return tracks
+
+
+def test_to_tracked_array_matches_per_track_conversion():
+    frame_positions = [100, 101, 102, 103]
+    tracks = create_tracks()
+
+    expected = [record for frame_pos, track in zip(frame_positions, tracks) for record in to_tracked_records_per_track(frame_pos, track)]
+    records = to_tracked_array(frame_positions, tracks)
+
+    assert records.dtype == TRACKED_RECORD_DTYPE
+    assert to_record_lists(records) == expected
+    assert to_tracked_records(102, tracks[2]) == to_tracked_records_per_track(102, tracks[2])
+    assert len(to_tracked_array([], [])) == 0
+
+
+def test_to_detection_array_matches_per_detection_conversion():
+    frame_positions = [5, 6, 7]
+    detections = [quantize_detections(frame) for frame in create_detections()[22:25]]
+
+    expected = [
+        [frame_pos, int(d[5]), float(d[4]), float(d[0]), float(d[1]), float(d[2]), float(d[3])]
+        for frame_pos, frame in zip(frame_positions, detections) for d in frame
+    ]
+    records = to_detection_array(frame_positions, detections)
+
+    assert records.dtype == DETECTION_RECORD_DTYPE
+    assert to_record_lists(records) == expected
+
+
+def test_record_buffer_growth():
+    buffer = RecordBuffer(TRACKED_RECORD_DTYPE, capacity=4)
+    tracks = create_tracks(seed=1)
+    expected = []
+    for frame_pos in range(10):
+        track = tracks[frame_pos % len(tracks)]
+        buffer.append(to_tracked_array([frame_pos], [track]))
+        expected.extend(to_tracked_records_per_track(frame_pos, track))
+
+    assert len(buffer) == len(expected) == 21
+    assert len(buffer.data) == 36  # 4 -> 9 (fits the batch of 5) -> 18 -> 36, doubled when full
+    assert buffer.to_list() == expected
+
+    # A batch larger than twice the capacity grows the buffer to fit it at once
+    buffer = RecordBuffer(DETECTION_RECORD_DTYPE, capacity=2)
+    buffer.append(np.zeros(7, dtype=DETECTION_RECORD_DTYPE))
+    assert len(buffer) == len(buffer.data) == 7
+    assert len(RecordBuffer(DETECTION_RECORD_DTYPE).to_list()) == 0
+
+
+if __name__ == "__main__":
+    test_retracking_reproduces_the_pipeline()
+    test_retracking_with_reused_frames()
+    test_quantize_detections()
+    test_to_tracked_array_matches_per_track_conversion()
+    test_to_detection_array_matches_per_detection_conversion()
+    test_record_buffer_growth()